@@ -3,7 +3,7 @@
 """
 import time
 import asyncio
-from typing import Dict, Any, Optional
+from typing import Any, Awaitable, Dict, List, Optional
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Request, HTTPException
 from app.models.schemas import (
     PerceptionBatchRequest, PerceptionBatchResponse,
@@ -11,68 +11,34 @@ from app.models.schemas import (
     WSMessage
 )
 from app.services.yolo_service import YOLOService
+from app.services.yolo_batcher import YOLOBatcher, InferenceOverloaded
 from app.services.amap_service import AmapService
+from app.services.route_cache import route_cache
 from app.services.llm_service import LLMService
 from app.services.tts_service import TTSService
 from app.core.session_manager import session_manager
 from app.core.websocket_manager import websocket_manager
+from app.core.navigation_engine import NavigationEngine, build_route_cache
+from app.core.nav_scheduler import NavTickScheduler
+from config.settings import settings
 from app.models.schemas import NavState
 
 
 router = APIRouter()
 yolo_service = YOLOService()
+yolo_batcher = YOLOBatcher(
+    yolo_service,
+    max_batch=settings.YOLO_MAX_BATCH,
+    max_wait_ms=settings.YOLO_MAX_WAIT_MS,
+    max_queue=settings.YOLO_MAX_QUEUE,
+)
+yolo_detector = yolo_batcher if settings.YOLO_MICRO_BATCH else yolo_service
+session_manager.on_navigation_end(yolo_service.dedup.forget)
 amap_service = AmapService()
 llm_service = LLMService()
 tts_service = TTSService()
-
-def _parse_polyline_points(polyline: str) -> list[dict]:
-    out: list[dict] = []
-    if not isinstance(polyline, str) or not polyline.strip():
-        return out
-    for seg in polyline.split(";"):
-        seg = seg.strip()
-        if not seg or "," not in seg:
-            continue
-        try:
-            lng_s, lat_s = seg.split(",", 1)
-            out.append({"lat": float(lat_s), "lng": float(lng_s)})
-        except Exception:
-            continue
-    return out
-
-def _haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
-    import math
-    R = 6371000.0
-    phi1 = math.radians(lat1)
-    phi2 = math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dl = math.radians(lng2 - lng1)
-    a = (math.sin(dphi/2)**2 +
-         math.cos(phi1)*math.cos(phi2)*(math.sin(dl/2)**2))
-    c = 2*math.atan2(math.sqrt(a), math.sqrt(1-a))
-    return R * c
-
-def _remaining_distance_along(points: list[dict], start_idx: int) -> int:
-    if not points or start_idx >= len(points) - 1:
-        return 0
-    total = 0.0
-    for i in range(start_idx, len(points) - 1):
-        p1, p2 = points[i], points[i+1]
-        total += _haversine_m(p1["lat"], p1["lng"], p2["lat"], p2["lng"])
-    return int(total)
-
-def _find_nearest_idx(points: list[dict], loc: dict) -> int:
-    if not points or not loc:
-        return 0
-    best_i = 0
-    best_d = float("inf")
-    lat, lng = float(loc["lat"]), float(loc["lng"])
-    for i, p in enumerate(points):
-        d = _haversine_m(lat, lng, p["lat"], p["lng"])
-        if d < best_d:
-            best_d = d
-            best_i = i
-    return best_i
+nav_engine = NavigationEngine(tts_service, event_driven=(settings.NAV_ENGINE_MODE != "batch"))
+nav_scheduler = NavTickScheduler(nav_engine, interval=settings.NAV_TICK_INTERVAL_MS / 1000.0)
 
 
 def now_ms() -> int:
@@ -143,264 +109,270 @@ def dump_obj(o):
     except Exception:
         return {"_repr": repr(o)}
     
-def _downsample_points(points: list[dict], max_n: int = 80) -> list[dict]:
-    if not points or len(points) <= max_n:
-        return points
-    step = max(1, len(points) // max_n)
-    out = points[::step]
-    if out[-1] != points[-1]:
-        out.append(points[-1])
-    return out
-
-def _min_dist_to_points(loc: dict, pts: list[dict]) -> float:
-    if not pts:
-        return float("inf")
-    best = float("inf")
-    for p in pts:
-        d = _haversine_m(float(loc["lat"]), float(loc["lng"]), p["lat"], p["lng"])
-        if d < best:
-            best = d
-    return best
-
-def _build_step_points(steps: list[dict], max_points_per_step: int = 60) -> list[list[dict]]:
-    step_pts: list[list[dict]] = []
-    for st in steps or []:
-        pl = (st.get("polyline") or "").strip()
-        pts = _parse_polyline_points(pl) if pl else []
-        pts = _downsample_points(pts, max_points_per_step)
-        step_pts.append(pts)
-    return step_pts
-
-def _pick_step_index_by_polyline(loc: dict, step_points: list[list[dict]]) -> int:
-    # 找“loc 最近的 step”
-    best_i = -1
-    best_d = float("inf")
-    for i, pts in enumerate(step_points):
-        if not pts:
-            continue
-        d = _min_dist_to_points(loc, pts)
-        if d < best_d:
-            best_d = d
-            best_i = i
-    return best_i
-
-async def nav_instruction_loop(nav_session_id: str) -> None:
-    print(f"[LOOP][START] navSessionId={nav_session_id}")
-
-    # 先确认 WS 已连上（否则直接退出）
-    hello_text = "导航已启动，我会根据您的位置持续播报指引。"
-    hello_audio = await tts_service.text_to_speech(text=hello_text, session_id=nav_session_id)
-    ok0 = await websocket_manager.send_message(
-        nav_session_id=nav_session_id,
-        message_type="NAV_INSTRUCTION",
-        data={
-            "text": hello_text,
-            "audioUrl": hello_audio,
-            "remainingDistance": 0,
-            "remainingTime": 0,
-        },
+MAX_PERCEPTION_FRAMES = 3
+MULTIPART_OVERHEAD_BYTES = 64 * 1024  # multipart 分隔符、分段头与文本字段的余量
+
+
+class BodyTooLarge(ValueError):
+    """请求体超过帧数 × 单帧上限（由路由转成 413）"""
+
+
+def split_length_prefixed(body: bytes, max_frames: int = MAX_PERCEPTION_FRAMES, max_frame_bytes: int = 0) -> list[memoryview]:
+    """
+    解析 [uint32 大端长度][图片字节] 重复拼接的请求体，返回指向原缓冲区的 memoryview（不复制）
+
+    Raises:
+        ValueError: 长度字段越界、帧数或单帧大小超限
+    """
+    view = memoryview(body)
+    frames: list[memoryview] = []
+    pos = 0
+    while pos < len(view):
+        if len(view) - pos < 4:
+            raise ValueError("truncated length prefix")
+        size = int.from_bytes(view[pos:pos + 4], "big")
+        pos += 4
+        if size == 0 or pos + size > len(view):
+            raise ValueError(f"invalid frame length {size}")
+        if max_frame_bytes and size > max_frame_bytes:
+            raise ValueError(f"frame too large ({size} bytes)")
+        frames.append(view[pos:pos + size])
+        pos += size
+        if len(frames) > max_frames:
+            raise ValueError(f"at most {max_frames} frames")
+    if not frames:
+        raise ValueError("no frames")
+    return frames
+
+
+def _check_content_length(req: Request, max_bytes: int) -> Optional[int]:
+    """在读取请求体之前按 Content-Length 拒绝超限请求；没有该头时返回 None"""
+    header = req.headers.get("content-length")
+    if header is None:
+        return None
+    try:
+        length = int(header)
+    except ValueError:
+        raise ValueError("invalid Content-Length")
+    if max_bytes and length > max_bytes:
+        raise BodyTooLarge(f"body too large ({length} bytes, max {max_bytes})")
+    return length
+
+
+async def _read_body_limited(req: Request, max_bytes: int) -> bytearray:
+    """
+    分块读取请求体，超过 max_bytes 立即停止（覆盖没有 Content-Length 的分块上传）。
+    直接返回累积的 bytearray，帧切片指向它，不再整体复制一次
+    """
+    body = bytearray()
+    async for chunk in req.stream():
+        body += chunk
+        if max_bytes and len(body) > max_bytes:
+            raise BodyTooLarge(f"body too large (max {max_bytes} bytes)")
+    return body
+
+
+async def _read_binary_perception(req: Request) -> tuple[str, Dict[str, float], list[Any]]:
+    """解析二进制感知上传，返回 (navSessionId, location, 帧字节列表)"""
+    content_type = req.headers.get("content-type", "")
+    limit = settings.PERCEPTION_MAX_FRAME_BYTES
+    max_body = MAX_PERCEPTION_FRAMES * (4 + limit) if limit else 0
+
+    if content_type.startswith("multipart/form-data"):
+        max_body = max_body and max_body + MULTIPART_OVERHEAD_BYTES
+        if _check_content_length(req, max_body) is None and max_body:
+            # 表单解析直接消费请求流，无法中途截断，只接受声明了长度的上传
+            raise HTTPException(status_code=411, detail="Content-Length is required")
+        form = await req.form()
+        fields = form
+        frames = []
+        for part in form.getlist("images"):
+            if isinstance(part, str):
+                raise ValueError("images must be file parts")
+            data = await part.read()
+            if not data:
+                raise ValueError("empty frame")
+            if limit and len(data) > limit:
+                raise ValueError(f"frame too large ({len(data)} bytes)")
+            frames.append(data)
+        if not frames:
+            raise ValueError("no frames")
+        if len(frames) > MAX_PERCEPTION_FRAMES:
+            raise ValueError(f"at most {MAX_PERCEPTION_FRAMES} frames")
+    elif content_type.startswith("application/octet-stream"):
+        fields = req.query_params
+        _check_content_length(req, max_body)
+        body = await _read_body_limited(req, max_body)
+        frames = split_length_prefixed(body, max_frame_bytes=limit)
+    else:
+        raise ValueError("unsupported content type")
+
+    nav_session_id = fields.get("navSessionId")
+    if not nav_session_id:
+        raise ValueError("navSessionId is required")
+    try:
+        location = {"lat": float(fields.get("lat")), "lng": float(fields.get("lng"))}
+    except (TypeError, ValueError):
+        raise ValueError("lat/lng are required")
+    return nav_session_id, location, frames
+
+
+@router.post("/perception/batch", response_model=PerceptionBatchResponse)
+async def process_perception_batch(request: PerceptionBatchRequest):
+    print("[perception] HIT navSessionId=", request.navSessionId, "imgCount=", len(request.images))
+    return await _run_perception(
+        request.navSessionId, request.location, yolo_detector.detect_batch(request.images, session_id=request.navSessionId)
     )
-    if not ok0:
-        print(f"[LOOP][ABORT] no ws connection for {nav_session_id}")
-        return
-
-    last_step_idx: int = -1
-    last_sent_text: str = ""
-    last_loc_seen_at: int = 0
-    tts_cache: Dict[str, str] = {}
+
+
+@router.post("/perception/frames", response_model=PerceptionBatchResponse)
+async def process_perception_frames(req: Request):
+    """
+    二进制感知上传（省去 base64 膨胀与 JSON 解析）：
+      - multipart/form-data: 字段 userId / navSessionId / lat / lng / timestamp，文件字段 images（最多3个）
+      - application/octet-stream: 元数据放查询参数，请求体为 [uint32 大端长度][JPEG] 重复拼接
+    """
     try:
-        while True:
-            await asyncio.sleep(1.0)
+        nav_session_id, location, frames = await _read_binary_perception(req)
+    except BodyTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    print("[perception] HIT navSessionId=", nav_session_id, "imgCount=", len(frames), "binary")
+    return await _run_perception(nav_session_id, location, yolo_detector.detect_frames(frames, session_id=nav_session_id))
 
-            nav = session_manager.get_navigation(nav_session_id)
-            if nav is None:
-                print(f"[LOOP][STOP] session missing navSessionId={nav_session_id}")
-                return
 
-            if nav.state in [NavState.ARRIVED, NavState.CANCELLED]:
-                print(f"[LOOP][STOP] state={nav.state} navSessionId={nav_session_id}")
-                return
+_background_tasks: set[asyncio.Task] = set()
 
-            route_data = nav.routeData or {}
-            active = route_data.get("activeRoute") if isinstance(route_data, dict) else None
-            if not isinstance(active, dict):
-                await websocket_manager.send_message(
-                    nav_session_id=nav_session_id,
-                    message_type="NAV_INSTRUCTION",
-                    data={
-                        "text": "路线数据尚未准备好，请稍候。",
-                        "audioUrl": None,
-                        "remainingDistance": 0,
-                        "remainingTime": 0,
-                    },
-                )
-                continue
 
-            total_dist = int(active.get("distance", 0) or 0)
-            steps = active.get("steps") or []
-            polyline = (active.get("polyline") or active.get("polylineStr") or "").strip()
-            points = _parse_polyline_points(polyline)
+def _spawn(coro) -> asyncio.Task:
+    """后台任务：持有引用直到完成，避免被回收"""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
 
-            if not isinstance(nav.currentLocation, dict) or "lat" not in nav.currentLocation or "lng" not in nav.currentLocation:
-                if now_ms() - last_loc_seen_at > 4000:
-                    last_loc_seen_at = now_ms()
-                    await websocket_manager.send_message(
-                        nav_session_id=nav_session_id,
-                        message_type="NAV_INSTRUCTION",
-                        data={
-                            "text": "我还没收到您的定位，请打开定位权限并保持在室外。",
-                            "audioUrl": None,
-                            "remainingDistance": total_dist,
-                            "remainingTime": int(total_dist / 1.2) if total_dist > 0 else 0,
-                        },
-                    )
-                continue
 
-            loc = nav.currentLocation
+async def _stage_result(task: Optional[asyncio.Task], deadline: float, stage: str, nav_session_id: str) -> Any:
+    """在截止时间前等待阶段结果；超时或失败返回 None，任务本身继续在后台完成"""
+    if task is None:
+        return None
+    try:
+        timeout = max(0.0, deadline - asyncio.get_running_loop().time())
+        return await asyncio.wait_for(asyncio.shield(task), timeout)
+    except asyncio.TimeoutError:
+        print(f"[perception][DEADLINE] stage={stage} navSessionId={nav_session_id}")
+    except Exception as e:
+        print(f"[perception][ERROR] stage={stage} navSessionId={nav_session_id} err={e}")
+    return None
 
-            if points:
-                near_idx = _find_nearest_idx(points, loc)
-                remaining = _remaining_distance_along(points, near_idx)
-            else:
-                remaining = total_dist
 
-            remaining_time = int(remaining / 1.2)
+async def _finish_perception(
+    nav_session_id: str,
+    nav: Any,
+    warning: Optional[Dict[str, Any]],
+    guidance_task: asyncio.Task,
+    tts_task: Optional[asyncio.Task]
+) -> None:
+    """
+    非关键阶段（后台）：先推送文字提醒，语音合成完成后补发 OBSTACLE_AUDIO，
+    指路建议与语音地址完成后写回会话。不阻塞 HTTP 响应。
+    """
+    if warning is not None:
+        try:
+            await websocket_manager.send_message(nav_session_id, "OBSTACLE_WARNING", warning)
+        except Exception:
+            pass
 
-            if remaining <= 15:
-                session_manager.update_navigation_state(nav_session_id, NavState.ARRIVED)
+    if tts_task is not None:
+        audio_url = await _stage_result(tts_task, float("inf"), "tts", nav_session_id)
+        if nav is not None:
+            nav.lastWarningAudioUrl = audio_url
+        if audio_url and warning is not None:
+            try:
                 await websocket_manager.send_message(
-                    nav_session_id=nav_session_id,
-                    message_type="NAV_INSTRUCTION",
-                    data={
-                        "text": "已到达目的地。导航结束。",
-                        "audioUrl": None,
-                        "remainingDistance": 0,
-                        "remainingTime": 0,
-                    },
+                    nav_session_id, "OBSTACLE_AUDIO", {"text": warning["text"], "audioUrl": audio_url}
                 )
-                return
-
-            cache = (route_data.get("_cache") or {}) if isinstance(route_data, dict) else {}
-            step_points = cache.get("stepPoints") or []
-            route_points = cache.get("routePoints") or []
-
-            if not step_points:
-                step_points = _build_step_points(steps, max_points_per_step=60)
-
-            step_idx = _pick_step_index_by_polyline(loc, step_points)
-
-            if route_points:
-                near_idx = _find_nearest_idx(route_points, loc)
-                remaining = _remaining_distance_along(route_points, near_idx)
-            else:
-                if points:
-                    near_idx = _find_nearest_idx(points, loc)
-                    remaining = _remaining_distance_along(points, near_idx)
-                else:
-                    remaining = total_dist
-
-            text = ""
-            if 0 <= step_idx < len(steps):
-                text = (steps[step_idx].get("instruction") or "").strip()
-
-            if not text:
-                text = "请继续沿路线前进。"
-
-            if step_idx != last_step_idx or text != last_sent_text:
-                last_step_idx = step_idx
-                last_sent_text = text
-                audio_url: Optional[str] = None
-                try:
-                    if text in tts_cache:
-                        audio_url = tts_cache[text]
-                    else:
-                        audio_url = await tts_service.text_to_speech(text=text, session_id=nav_session_id)
-                        if audio_url:
-                            tts_cache[text] = audio_url
-                except Exception:
-                    audio_url = None
-                ok = await websocket_manager.send_message(
-                    nav_session_id=nav_session_id,
-                    message_type="NAV_INSTRUCTION",
-                    data={
-                        "text": text,
-                        "audioUrl": audio_url,
-                        "remainingDistance": int(remaining),
-                        "remainingTime": int(remaining_time),
-                    },
-                )
-                if not ok:
-                    print(f"[LOOP][ABORT] disconnected navSessionId={nav_session_id}")
-                    return
+            except Exception:
+                pass
 
-    except asyncio.CancelledError:
-        print(f"[LOOP][CANCEL] navSessionId={nav_session_id}")
-        return
-    except Exception as e:
-        print(f"[LOOP][ERROR] navSessionId={nav_session_id} err={e}")
-        return
+    ai_guidance = await _stage_result(guidance_task, float("inf"), "guidance", nav_session_id)
+    if nav is not None:
+        nav.lastAiGuidance = ai_guidance or ""
+        nav.updatedAt = now_ms()
 
-@router.post("/perception/batch", response_model=PerceptionBatchResponse)
-async def process_perception_batch(request: PerceptionBatchRequest):
-    print("[perception] HIT navSessionId=", request.navSessionId, "imgCount=", len(request.images))
 
+async def _run_perception(nav_session_id: str, location: Dict[str, float], detection: Awaitable[List[Dict]]) -> PerceptionBatchResponse:
+    """
+    检测之后的分阶段流程：
+      1. 关键路径：障碍物整合、安全等级、障碍物跟踪、会话更新，随即推送文字提醒
+      2. 并行：LLM指路与提醒语音合成，各自有截止时间；
+         超时不影响响应（对应字段为空），任务在后台完成后写回会话并补发语音
+    """
     try:
         # YOLO检测
-        detection_results = await yolo_service.detect_batch(request.images)
+        detection_results = await detection
+    except InferenceOverloaded as e:
+        print(f"[perception][SHED] navSessionId={nav_session_id} {e}")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    try:
+        loop = asyncio.get_running_loop()
         # 整合障碍物信息
         obstacles = yolo_service.aggregate_obstacles(detection_results)
         # 评估安全等级
         safety_level = yolo_service.calculate_safety_level(obstacles)
-        # LLM生成指路建议
-        ai_guidance = await llm_service.generate_guidance(
-            obstacles=obstacles,
-            location=request.location
-        )
+        road_condition = yolo_service.describe_road_condition(obstacles)
+
+        nav = session_manager.get_navigation(nav_session_id)
 
-        # TTS生成提醒
-        audio_url = None
-        warning_text = ""
-        if obstacles:
-            warning_text = yolo_service.generate_warning_text(obstacles)
-            audio_url = await tts_service.text_to_speech(
-                text=warning_text,
-                session_id=request.navSessionId
-            )
-
-        nav = None
+        # 障碍物跟踪：同一障碍物只在首次出现 / 明显接近时提醒
+        alerts = obstacles
+        if settings.NAV_OBSTACLE_TRACKING and nav is not None:
+            tracker = session_manager.get_obstacle_tracker(nav_session_id)
+            alerts = tracker.update(yolo_service.observe(detection_results))
+        warning_text = yolo_service.generate_warning_text(alerts) if alerts else ""
+
+        # LLM指路与TTS提醒并行，截止时间从此刻起算
+        guidance_deadline = loop.time() + settings.PERCEPTION_GUIDANCE_TIMEOUT_MS / 1000
+        tts_deadline = loop.time() + settings.PERCEPTION_TTS_TIMEOUT_MS / 1000
+        guidance_task = _spawn(llm_service.generate_guidance(obstacles=obstacles, location=location))
+        tts_task = None
+        if warning_text:
+            tts_task = _spawn(tts_service.text_to_speech(text=warning_text, session_id=nav_session_id))
+
+        last_obstacles = [dump_obj(o) for o in (obstacles or [])]
         try:
-            nav = session_manager.get_navigation(request.navSessionId)
             if nav is not None:
                 nav.lastPerceptionAt = now_ms()
                 nav.lastSafetyLevel = int(safety_level)
-                nav.lastRoadCondition = yolo_service.describe_road_condition(obstacles)
-                nav.lastAiGuidance = ai_guidance or ""
-                nav.lastObstacles = [dump_obj(o) for o in (obstacles or [])]
+                nav.lastRoadCondition = road_condition
+                nav.lastObstacles = last_obstacles
 
-                if obstacles:
+                if alerts:
                     nav.lastWarningText = warning_text
-                    nav.lastWarningAudioUrl = audio_url
+                    nav.lastWarningAudioUrl = None
 
                 nav.updatedAt = now_ms()
+                nav_engine.on_perception(nav_session_id)
         except Exception:
             pass
 
-        if obstacles:
-            try:
-                await websocket_manager.send_message(
-                    nav_session_id=request.navSessionId,
-                    message_type="OBSTACLE_WARNING",
-                    data={
-                        "text": warning_text,
-                        "audioUrl": audio_url,
-                        "safetyLevel": int(safety_level),
-                        "obstacles": (nav.lastObstacles if (nav is not None and nav.lastObstacles) else []),
-                    },
-                )
-            except Exception:
-                pass
+        warning = None
+        if alerts:
+            warning = {
+                "text": warning_text,
+                "audioUrl": None,
+                "safetyLevel": int(safety_level),
+                "obstacles": last_obstacles,
+            }
+        _spawn(_finish_perception(nav_session_id, nav, warning, guidance_task, tts_task))
+
+        ai_guidance = await _stage_result(guidance_task, guidance_deadline, "guidance", nav_session_id)
+        audio_url = await _stage_result(tts_task, tts_deadline, "tts", nav_session_id)
 
-        road_condition = yolo_service.describe_road_condition(obstacles)
         return PerceptionBatchResponse(
             success=True,
             obstacles=obstacles,
@@ -412,6 +384,18 @@ async def process_perception_batch(request: PerceptionBatchRequest):
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/perception/stats")
+async def perception_stats():
+    trackers = list(session_manager.obstacle_trackers.values())
+    tracking = {k: sum(t.stats()[k] for t in trackers) for k in ("tracks", "updates", "observations", "alerts")}
+    return {
+        "microBatch": settings.YOLO_MICRO_BATCH,
+        **yolo_batcher.stats(),
+        "dedup": yolo_service.dedup.stats(),
+        "tracking": {"enabled": settings.NAV_OBSTACLE_TRACKING, "sessions": len(trackers), **tracking},
+    }
     
 
 @router.post("/start", response_model=NavStartResponse)
@@ -449,22 +433,15 @@ async def start_navigation(request: NavStartRequest, req: Request):
             # 存 routeId
             nav_session.routeId = active_route.get("routeId")
 
-            steps = active_route.get("steps") or []
-            step_points = _build_step_points(steps, max_points_per_step=60)
-
-            polyline = (active_route.get("polyline") or active_route.get("polylineStr") or "").strip()
-            route_points_raw = _parse_polyline_points(polyline)
-            route_points = _downsample_points(route_points_raw, max_n=800)
-
+            route_cache = build_route_cache(active_route)
             nav_session.routeData = {
                 "activeRoute": active_route,
                 "routes": routes,
-                "_cache": {
-                    "stepPoints": step_points,
-                    "routePoints": route_points,
-                }
+                "_cache": route_cache,
             }
             nav_session.updatedAt = now_ms()
+            nav_engine.prefetch_audio(nav_session.navSessionId, active_route, route_cache)
+            nav_engine.on_route_change(nav_session.navSessionId)
 
 
         message = f"已为您规划{len(routes)}条路线，请选择一条开始导航"
@@ -487,6 +464,15 @@ async def start_navigation(request: NavStartRequest, req: Request):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/route-cache/stats")
+async def route_cache_stats():
+    return route_cache.stats()
+
+
+@router.get("/scheduler/stats")
+async def scheduler_stats():
+    return {"mode": settings.NAV_ENGINE_MODE, **nav_scheduler.stats()}
+
 @router.websocket("/stream")
 async def navigation_stream(websocket: WebSocket, navSessionId: str):
     """
@@ -497,8 +483,6 @@ async def navigation_stream(websocket: WebSocket, navSessionId: str):
     print(f"[WS][ENTER] stream handler NEW_CODE navSessionId={navSessionId}")
     await websocket_manager.connect(websocket, navSessionId)
 
-    nav_task: Optional[asyncio.Task] = None
-
     try:
         await websocket_manager.send_message(
             nav_session_id=navSessionId,
@@ -506,16 +490,7 @@ async def navigation_stream(websocket: WebSocket, navSessionId: str):
             data={"message": "导航已开始"},
         )
 
-        nav_task = asyncio.create_task(nav_instruction_loop(navSessionId))
-        def _on_done(t: asyncio.Task) -> None:
-            try:
-                exc = t.exception()
-                print(f"[WS][TASK_DONE] navSessionId={navSessionId} exc={exc}")
-            except asyncio.CancelledError:
-                print(f"[WS][TASK_DONE] navSessionId={navSessionId} cancelled")
-
-        nav_task.add_done_callback(_on_done)
-        print(f"[WS][TASK_START] navSessionId={navSessionId} task={nav_task}")
+        nav_engine.attach(navSessionId)
         while True:
             try:
                 data: Dict[str, Any] = await asyncio.wait_for(websocket.receive_json(), timeout=30.0)
@@ -541,6 +516,7 @@ async def navigation_stream(websocket: WebSocket, navSessionId: str):
                                 "lng": float(location["lng"]),
                             }
                             nav.updatedAt = now_ms()
+                            nav_engine.on_location_update(navSessionId)
                     continue
 
             except asyncio.TimeoutError:
@@ -558,6 +534,5 @@ async def navigation_stream(websocket: WebSocket, navSessionId: str):
         websocket_manager.disconnect(navSessionId)
 
     finally:
-        if nav_task is not None:
-            nav_task.cancel()
+        nav_engine.detach(navSessionId)
         websocket_manager.disconnect(navSessionId)
\ No newline at end of file
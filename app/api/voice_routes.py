@@ -1,10 +1,12 @@
 """
 语音交互API路由
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from app.models.schemas import VoiceTextRequest, VoiceTextResponse
 from app.services.llm_service import LLMService
 from app.services.tts_service import TTSService
+from app.services.tts_cache import tts_cache
 from app.core.session_manager import session_manager
 from config.settings import settings
 import time
@@ -62,4 +64,29 @@ async def process_voice_text(request: VoiceTextRequest):
 
     except Exception as e:
         print("[voice/text][ERR] ", str(e))
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/tts/stream")
+async def stream_tts(
+    text: str = Query(..., min_length=1, description="要合成的文本"),
+    sessionId: str = Query("", description="会话ID（仅用于日志）")
+):
+    """
+    流式TTS：边合成边返回音频（Content-Type 取决于当前后端，edge 为 audio/mpeg，
+    azure / local 为 audio/wav），首个音频分片到达即开始播放。
+    合成结果同时写入缓存，之后同样的文本直接从缓存读出。
+    """
+    if tts_service.mock_mode:
+        raise HTTPException(status_code=404, detail="mock mode has no audio stream")
+    return StreamingResponse(
+        tts_service.stream_speech(text, sessionId),
+        media_type=tts_service.backend.media_type,
+        headers={"Cache-Control": "no-store"},
+    )
+
+
+@router.get("/tts/stats")
+async def tts_cache_stats():
+    """TTS 音频缓存统计（命中 / 未命中 / 淘汰 / 占用）"""
+    return tts_cache.stats()
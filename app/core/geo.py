@@ -0,0 +1,176 @@
+"""
+地理计算内核
+
+所有路线几何函数的统一实现：优先使用 NumPy 批量计算，未安装 NumPy 时回退到纯 Python。
+坐标数组可以是 list / array('d') / np.ndarray。
+"""
+from array import array
+from typing import Optional, Sequence, Tuple
+import math
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+
+EARTH_RADIUS_M = 6371000.0
+_DEG = math.radians(1.0)
+
+
+def to_array(values: Sequence[float]):
+    """转换为紧凑 float64 数组"""
+    if np is not None:
+        return np.asarray(values, dtype=np.float64)
+    return array("d", values)
+
+
+def haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = math.radians(lat2 - lat1)
+    dl = math.radians(lng2 - lng1)
+    a = (math.sin(dphi / 2) ** 2 +
+         math.cos(phi1) * math.cos(phi2) * (math.sin(dl / 2) ** 2))
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    return EARTH_RADIUS_M * c
+
+
+def _haversine_np(lat1, lng1, lat2, lng2):
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    dphi = phi2 - phi1
+    dl = np.radians(lng2 - lng1)
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def haversine_many(lat: float, lng: float, lats: Sequence[float], lngs: Sequence[float]):
+    """一个点到多个点的距离（米）"""
+    if np is not None:
+        return _haversine_np(lat, lng, np.asarray(lats, dtype=np.float64), np.asarray(lngs, dtype=np.float64))
+    return array("d", (haversine_m(lat, lng, la, ln) for la, ln in zip(lats, lngs)))
+
+
+def segment_lengths(lats: Sequence[float], lngs: Sequence[float]):
+    """折线各段长度（米），长度 n-1"""
+    n = len(lats)
+    if np is not None:
+        la = np.asarray(lats, dtype=np.float64)
+        ln = np.asarray(lngs, dtype=np.float64)
+        if n < 2:
+            return np.zeros(0, dtype=np.float64)
+        return _haversine_np(la[:-1], ln[:-1], la[1:], ln[1:])
+    return array("d", (
+        haversine_m(lats[i], lngs[i], lats[i + 1], lngs[i + 1]) for i in range(n - 1)
+    ))
+
+
+def cumulative_lengths(lats: Sequence[float], lngs: Sequence[float]):
+    """累计沿线距离，cum[i] = 起点到顶点 i 的距离（米），长度 n"""
+    seg = segment_lengths(lats, lngs)
+    if np is not None:
+        out = np.zeros(len(lats), dtype=np.float64)
+        if len(seg):
+            np.cumsum(seg, out=out[1:])
+        return out
+    out = array("d", bytes(8 * len(lats)))
+    acc = 0.0
+    for i, d in enumerate(seg, 1):
+        acc += d
+        out[i] = acc
+    return out
+
+
+def remaining_lengths(lats: Sequence[float], lngs: Sequence[float]):
+    """后缀和，rem[i] = 顶点 i 到终点的沿线距离（米），长度 n"""
+    cum = cumulative_lengths(lats, lngs)
+    if not len(cum):
+        return cum
+    total = cum[-1]
+    if np is not None:
+        return total - cum
+    return array("d", (total - c for c in cum))
+
+
+def local_xy(lats: Sequence[float], lngs: Sequence[float], lat0: float, lng0: float) -> Tuple:
+    """
+    等距圆柱投影到以 (lat0, lng0) 为原点的局部平面（米）
+    城市尺度内误差很小，用于比较远近和线段投影
+    """
+    kx = _DEG * EARTH_RADIUS_M * math.cos(math.radians(lat0))
+    ky = _DEG * EARTH_RADIUS_M
+    if np is not None:
+        xs = (np.asarray(lngs, dtype=np.float64) - lng0) * kx
+        ys = (np.asarray(lats, dtype=np.float64) - lat0) * ky
+        return xs, ys
+    return (array("d", ((ln - lng0) * kx for ln in lngs)),
+            array("d", ((la - lat0) * ky for la in lats)))
+
+
+def project_to_segments(px: float, py: float, xs, ys, lo: int = 0, hi: Optional[int] = None) -> Tuple[float, int, float]:
+    """
+    把 (px, py) 投影到第 lo..hi-1 段（顶点 i -> i+1）
+    返回 (距离平方, 段下标, 段内比例t)，没有可用线段时段下标为 -1
+    """
+    n_seg = len(xs) - 1
+    hi = n_seg if hi is None else min(n_seg, hi)
+    lo = max(0, lo)
+    if lo >= hi:
+        return float("inf"), -1, 0.0
+
+    if np is not None:
+        ax = xs[lo:hi]
+        ay = ys[lo:hi]
+        vx = xs[lo + 1:hi + 1] - ax
+        vy = ys[lo + 1:hi + 1] - ay
+        wx = px - ax
+        wy = py - ay
+        vv = vx * vx + vy * vy
+        t = np.divide(wx * vx + wy * vy, vv, out=np.zeros_like(vv), where=vv > 0)
+        np.clip(t, 0.0, 1.0, out=t)
+        dx = wx - t * vx
+        dy = wy - t * vy
+        d = dx * dx + dy * dy
+        k = int(np.argmin(d))
+        return float(d[k]), lo + k, float(t[k])
+
+    best_d = float("inf")
+    best_i = -1
+    best_t = 0.0
+    for i in range(lo, hi):
+        ax, ay = xs[i], ys[i]
+        vx = xs[i + 1] - ax
+        vy = ys[i + 1] - ay
+        wx = px - ax
+        wy = py - ay
+        vv = vx * vx + vy * vy
+        t = (wx * vx + wy * vy) / vv if vv > 0 else 0.0
+        if t < 0.0:
+            t = 0.0
+        elif t > 1.0:
+            t = 1.0
+        dx = wx - t * vx
+        dy = wy - t * vy
+        d = dx * dx + dy * dy
+        if d < best_d:
+            best_d = d
+            best_i = i
+            best_t = t
+    return best_d, best_i, best_t
+
+
+def point_to_polyline(lat: float, lng: float, lats: Sequence[float], lngs: Sequence[float]) -> Tuple[float, int, float]:
+    """
+    点到折线的最短距离
+
+    Returns:
+        (距离米, 段下标, 段内比例t)；只有一个顶点时段下标为 0、t 为 0；空折线距离为 inf
+    """
+    n = len(lats)
+    if n == 0:
+        return float("inf"), -1, 0.0
+    if n == 1:
+        return haversine_m(lat, lng, lats[0], lngs[0]), 0, 0.0
+    xs, ys = local_xy(lats, lngs, lat, lng)
+    d2, seg, t = project_to_segments(0.0, 0.0, xs, ys)
+    return math.sqrt(d2), seg, t
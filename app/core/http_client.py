@@ -0,0 +1,67 @@
+"""
+共享的异步 HTTP 客户端
+
+所有外部 HTTP 调用（高德等）复用同一个 httpx.AsyncClient：连接池 + keep-alive，
+安装了 h2 时启用 HTTP/2。在 lifespan 中创建、关闭；未经 lifespan 启动
+（脚本、测试）时首次使用再按需创建，用完须在同一个事件循环内 close()。
+"""
+from typing import Optional
+import asyncio
+
+import httpx
+
+from config.settings import settings
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class HTTPClient:
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _create(self) -> httpx.AsyncClient:
+        http2 = settings.HTTP2 and _http2_available()
+        limits = httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+        )
+        self._loop = asyncio.get_running_loop()
+        print(f"[HTTP] client created http2={http2} maxConnections={settings.HTTP_MAX_CONNECTIONS}")
+        return httpx.AsyncClient(
+            http2=http2,
+            limits=limits,
+            timeout=httpx.Timeout(settings.HTTP_TIMEOUT),
+        )
+
+    async def start(self) -> None:
+        if self._client is None:
+            self._client = self._create()
+
+    async def close(self) -> None:
+        client, self._client = self._client, None
+        if client is not None:
+            await client.aclose()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """
+        当前事件循环上的客户端。连接池绑定创建它的事件循环，换了循环时旧客户端
+        无法再关闭：直接报错，而不是悄悄重建、泄漏旧连接池
+        """
+        if self._client is None:
+            self._client = self._create()
+        elif self._loop is not asyncio.get_running_loop():
+            raise RuntimeError("HTTPClient is bound to another event loop; close() it before that loop ends")
+        return self._client
+
+
+http_client = HTTPClient()
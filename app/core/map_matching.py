@@ -0,0 +1,160 @@
+"""
+地图匹配：把 GPS 定位投影到路线线段上，并维护单调前进的进度游标
+"""
+from typing import Dict, List, Optional, Tuple
+from config.settings import settings
+from app.core.route_geometry import RouteGeometry
+from app.core.geo import np
+import math
+
+
+class MatchResult:
+
+    __slots__ = ("seg_idx", "t", "distance", "remaining", "windowed")
+
+    def __init__(self, seg_idx: int, t: float, distance: float, remaining: float, windowed: bool):
+        self.seg_idx = seg_idx
+        self.t = t
+        self.distance = distance  # 定位到路线的垂直距离（米）
+        self.remaining = remaining  # 剩余沿线距离（米）
+        self.windowed = windowed  # 是否在游标窗口内命中
+
+
+class MapMatcher:
+    """
+    单个导航会话的地图匹配器
+
+    每次定位只在游标之后 window 个线段内搜索；窗口内最近点偏离超过
+    max_offset 时（偏航 / 跳点 / 首次定位）才回退全量搜索。
+    """
+
+    def __init__(
+        self,
+        geometry: RouteGeometry,
+        window: Optional[int] = None,
+        max_offset: Optional[float] = None
+    ):
+        self.geometry = geometry
+        self.window = window or settings.NAV_MATCH_WINDOW
+        self.max_offset = float(max_offset or settings.NAV_DEVIATION_THRESHOLD)
+        self.cursor: int = -1
+
+    def reset(self) -> None:
+        self.cursor = -1
+
+    def match(self, loc: Optional[Dict[str, float]]) -> Optional[MatchResult]:
+        geo = self.geometry
+        if not loc or len(geo) < 2:
+            return None
+
+        px, py = geo.to_local(float(loc["lat"]), float(loc["lng"]))
+        if self.cursor >= 0:
+            d2, seg, t = geo.project_range(px, py, self.cursor, self.cursor + self.window)
+            if d2 <= self.max_offset * self.max_offset:
+                return self._accept(seg, t, d2, True)
+        return self._match_full(px, py)
+
+    def _match_full(self, px: float, py: float) -> Optional[MatchResult]:
+        geo = self.geometry
+        n_seg = len(geo) - 1
+        limit2 = self.max_offset * self.max_offset
+
+        # 先找游标之后（避免回环路线吸附到已走过的一段），再退到整条路线
+        start = max(0, self.cursor)
+        d2, seg, t = geo.project_range(px, py, start, n_seg)
+        if d2 > limit2 and start > 0:
+            d2_all, seg_all, t_all = geo.project_range(px, py, 0, n_seg)
+            if d2_all < d2:
+                d2, seg, t = d2_all, seg_all, t_all
+
+        if seg < 0:
+            return None
+        return self._accept(seg, t, d2, False)
+
+    def _accept(self, seg: int, t: float, d2: float, windowed: bool) -> MatchResult:
+        self.cursor = seg
+        return MatchResult(
+            seg_idx=seg,
+            t=t,
+            distance=math.sqrt(d2),
+            remaining=self.geometry.remaining_at(seg, t),
+            windowed=windowed,
+        )
+
+
+def batch_match(items: List[Tuple[MapMatcher, Dict[str, float]]]) -> List[Optional[MatchResult]]:
+    """
+    一次匹配多个会话
+
+    所有会话的游标窗口线段拼接成一组数组，做一次向量化投影，
+    再按会话分组取最近段；窗口未命中的会话逐个回退全量搜索。
+    未安装 NumPy 时逐个调用 MapMatcher.match。
+    """
+    results: List[Optional[MatchResult]] = [None] * len(items)
+    if np is None:
+        for i, (matcher, loc) in enumerate(items):
+            results[i] = matcher.match(loc)
+        return results
+
+    owners: List[int] = []
+    lows: List[int] = []
+    points: List[Tuple[float, float]] = []
+    ax, ay, bx, by, lengths = [], [], [], [], []
+
+    for i, (matcher, loc) in enumerate(items):
+        geo = matcher.geometry
+        if not loc or len(geo) < 2:
+            continue
+        px, py = geo.to_local(float(loc["lat"]), float(loc["lng"]))
+        lo = matcher.cursor
+        hi = min(len(geo) - 1, lo + matcher.window)
+        if lo < 0 or lo >= hi:
+            results[i] = matcher._match_full(px, py)
+            continue
+        owners.append(i)
+        lows.append(lo)
+        points.append((px, py))
+        ax.append(geo.xs[lo:hi])
+        ay.append(geo.ys[lo:hi])
+        bx.append(geo.xs[lo + 1:hi + 1])
+        by.append(geo.ys[lo + 1:hi + 1])
+        lengths.append(hi - lo)
+
+    if not owners:
+        return results
+
+    counts = np.asarray(lengths)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    pts = np.asarray(points, dtype=np.float64)
+    px = np.repeat(pts[:, 0], counts)
+    py = np.repeat(pts[:, 1], counts)
+
+    ax = np.concatenate(ax)
+    ay = np.concatenate(ay)
+    vx = np.concatenate(bx) - ax
+    vy = np.concatenate(by) - ay
+    wx = px - ax
+    wy = py - ay
+    vv = vx * vx + vy * vy
+    t = np.divide(wx * vx + wy * vy, vv, out=np.zeros_like(vv), where=vv > 0)
+    np.clip(t, 0.0, 1.0, out=t)
+    dx = wx - t * vx
+    dy = wy - t * vy
+    d = dx * dx + dy * dy
+
+    # 每组第一个最小值的位置
+    mins = np.minimum.reduceat(d, starts)
+    group = np.repeat(np.arange(len(owners)), counts)
+    hit = np.flatnonzero(d == mins[group])
+    _, first = np.unique(group[hit], return_index=True)
+    best = hit[first]
+
+    for g, k in enumerate(best.tolist()):
+        i = owners[g]
+        matcher = items[i][0]
+        d2 = float(d[k])
+        if d2 <= matcher.max_offset * matcher.max_offset:
+            results[i] = matcher._accept(lows[g] + (k - int(starts[g])), float(t[k]), d2, True)
+        else:
+            results[i] = matcher._match_full(float(pts[g, 0]), float(pts[g, 1]))
+    return results
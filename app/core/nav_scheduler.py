@@ -0,0 +1,127 @@
+"""
+批量导航调度器
+
+一个协程按固定周期处理所有导航中的会话：收集最新定位，一次向量化匹配，
+再通过导航引擎把 NAV_INSTRUCTION 推送出去。替代每个连接一个轮询任务。
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from app.core.session_manager import session_manager
+from app.core.map_matching import MapMatcher, batch_match
+from app.core.navigation_engine import NavigationEngine, build_route_cache
+from app.models.schemas import NavState
+import asyncio
+import time
+
+
+class NavTickScheduler:
+
+    def __init__(self, engine: NavigationEngine, interval: float = 1.0):
+        self.engine = engine
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        # 每个会话上一次参与匹配的定位对象（定位更新时整个 dict 会被替换）
+        self._last_loc: Dict[str, Any] = {}
+
+        self.ticks = 0
+        # tick: 收集 + 批量匹配 + 分发（调度器自身的开销）；drain: 等待推送（WebSocket / TTS）
+        self.last_tick_ms = 0.0
+        self.max_tick_ms = 0.0
+        self.avg_tick_ms = 0.0
+        self.last_drain_ms = 0.0
+        self.max_drain_ms = 0.0
+        self.avg_drain_ms = 0.0
+        self.last_sessions = 0
+        self.last_matched = 0
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            print(f"[SCHED][START] interval={self.interval}s")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "intervalMs": int(self.interval * 1000),
+            "ticks": self.ticks,
+            "lastTickMs": round(self.last_tick_ms, 3),
+            "avgTickMs": round(self.avg_tick_ms, 3),
+            "maxTickMs": round(self.max_tick_ms, 3),
+            "lastDrainMs": round(self.last_drain_ms, 3),
+            "avgDrainMs": round(self.avg_drain_ms, 3),
+            "maxDrainMs": round(self.max_drain_ms, 3),
+            "lastSessions": self.last_sessions,
+            "lastMatched": self.last_matched,
+        }
+
+    async def _run(self) -> None:
+        while True:
+            t0 = time.perf_counter()
+            try:
+                await self.tick()
+            except Exception as e:
+                print(f"[SCHED][ERROR] err={e}")
+            elapsed = time.perf_counter() - t0
+            await asyncio.sleep(max(0.0, self.interval - elapsed))
+
+    def _collect(self) -> List[Tuple[str, MapMatcher, Dict[str, float]]]:
+        batch: List[Tuple[str, MapMatcher, Dict[str, float]]] = []
+        for sid, nav in list(session_manager.navigation_sessions.items()):
+            if sid not in self.engine.sessions or nav.state != NavState.NAVIGATING:
+                continue
+            loc = nav.currentLocation
+            if not isinstance(loc, dict) or "lat" not in loc or "lng" not in loc:
+                continue  # 无定位的提醒由引擎的时间轮负责
+            if self._last_loc.get(sid) is loc:
+                continue  # 定位未更新，结果不会变化
+            route_data = nav.routeData if isinstance(nav.routeData, dict) else None
+            active = route_data.get("activeRoute") if route_data else None
+            if not isinstance(active, dict):
+                continue
+            cache = route_data.get("_cache")
+            if not isinstance(cache, dict) or "matcher" not in cache or "stepIndex" not in cache:
+                cache = build_route_cache(active)
+                route_data["_cache"] = cache
+            self._last_loc[sid] = loc
+            batch.append((sid, cache["matcher"], loc))
+        return batch
+
+    async def tick(self) -> None:
+        t0 = time.perf_counter()
+
+        for sid in [s for s in self._last_loc if s not in self.engine.sessions]:
+            del self._last_loc[sid]
+
+        batch = self._collect()
+        results = batch_match([(m, loc) for _, m, loc in batch]) if batch else []
+
+        tasks = []
+        for (sid, _, _), matched in zip(batch, results):
+            task = self.engine.trigger(sid, matched)
+            if task is not None:
+                tasks.append(task)
+
+        t1 = time.perf_counter()
+        dt = (t1 - t0) * 1000
+        self.ticks += 1
+        self.last_tick_ms = dt
+        self.max_tick_ms = max(self.max_tick_ms, dt)
+        self.avg_tick_ms = dt if self.ticks == 1 else self.avg_tick_ms * 0.9 + dt * 0.1
+        self.last_sessions = len(self.engine.sessions)
+        self.last_matched = len(batch)
+
+        if tasks:
+            # 推送（含 TTS）最多等一个周期，慢的会话在后台继续，不拖住下一个 tick
+            await asyncio.wait(tasks, timeout=self.interval)
+        dt = (time.perf_counter() - t1) * 1000
+        self.last_drain_ms = dt
+        self.max_drain_ms = max(self.max_drain_ms, dt)
+        self.avg_drain_ms = dt if self.ticks == 1 else self.avg_drain_ms * 0.9 + dt * 0.1
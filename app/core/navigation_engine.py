@@ -0,0 +1,328 @@
+"""
+事件驱动导航引擎
+
+只在会话收到定位更新、路线变更或感知结果时重新计算指引；
+"尚未收到定位" 等提醒由时间轮统一调度，空闲会话不占用任何唤醒。
+"""
+from typing import Any, Callable, Dict, List, Optional, Set
+from app.core.session_manager import session_manager
+from app.core.websocket_manager import websocket_manager
+from app.core.route_geometry import RouteGeometry
+from app.core.map_matching import MapMatcher, MatchResult
+from app.core.spatial_index import StepSegmentIndex
+from app.models.schemas import NavState
+import asyncio
+import math
+import time
+
+
+HELLO_TEXT = "导航已启动，我会根据您的位置持续播报指引。"
+ARRIVED_TEXT = "已到达目的地。导航结束。"
+NO_LOCATION_TEXT = "我还没收到您的定位，请打开定位权限并保持在室外。"
+ROUTE_NOT_READY_TEXT = "路线数据尚未准备好，请稍候。"
+DEFAULT_STEP_TEXT = "请继续沿路线前进。"
+
+REMINDER_INTERVAL = 4.0  # 秒
+ARRIVAL_DISTANCE = 15  # 米
+WALK_SPEED = 1.2  # 米/秒
+
+
+def build_route_cache(route: Dict[str, Any]) -> Dict[str, Any]:
+    """为一条路线构建导航期间复用的几何缓存"""
+    polyline = (route.get("polyline") or route.get("polylineStr") or "").strip()
+    geometry = RouteGeometry.from_polyline(polyline)
+    return {
+        "geometry": geometry,
+        "matcher": MapMatcher(geometry),
+        "stepIndex": StepSegmentIndex.from_steps(route.get("steps") or []),
+        "audioUrls": {},  # 预合成完成的 文本 -> 音频URL
+    }
+
+
+class TimerWheel:
+    """
+    哈希时间轮
+
+    定时任务按到期 tick 落入槽位，驱动协程每个 tick 只处理一个槽；
+    没有待触发任务时驱动协程自动退出，下次 schedule 时再启动。
+    """
+
+    def __init__(self, tick: float = 0.5, slots: int = 128):
+        self.tick = tick
+        self.slots: List[Dict[str, list]] = [{} for _ in range(slots)]
+        self._pos = 0
+        self._where: Dict[str, int] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def schedule(self, key: str, delay: float, callback: Callable[[], None]) -> None:
+        """delay 秒后调用 callback；同一 key 重复调度会覆盖之前的任务"""
+        self.cancel(key)
+        n = len(self.slots)
+        ticks = max(1, math.ceil(delay / self.tick))
+        slot = (self._pos + ticks) % n
+        self.slots[slot][key] = [(ticks - 1) // n, callback]
+        self._where[key] = slot
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def cancel(self, key: str) -> None:
+        slot = self._where.pop(key, None)
+        if slot is not None:
+            self.slots[slot].pop(key, None)
+
+    async def _run(self) -> None:
+        try:
+            while self._where:
+                await asyncio.sleep(self.tick)
+                self._pos = (self._pos + 1) % len(self.slots)
+                bucket = self.slots[self._pos]
+                due: List[Callable[[], None]] = []
+                for key, entry in list(bucket.items()):
+                    if entry[0] > 0:
+                        entry[0] -= 1
+                        continue
+                    del bucket[key]
+                    self._where.pop(key, None)
+                    due.append(entry[1])
+                for cb in due:
+                    try:
+                        cb()
+                    except Exception as e:
+                        print(f"[TIMER][ERROR] err={e}")
+        finally:
+            self._task = None
+
+
+class _Guidance:
+    """单个会话的播报状态"""
+
+    __slots__ = ("greeted", "last_step_idx", "last_sent_text", "running", "dirty", "matched", "last_reminder_at")
+
+    def __init__(self):
+        self.greeted = False
+        self.matched: Optional[MatchResult] = None
+        self.last_step_idx = -1
+        self.last_sent_text = ""
+        self.running = False
+        self.dirty = False
+        self.last_reminder_at = -math.inf
+
+
+class NavigationEngine:
+    """
+    event_driven=True 时定位更新立即触发计算；
+    False 时由 NavTickScheduler 按固定周期批量匹配后调用 trigger。
+    """
+
+    def __init__(self, tts_service: Any, event_driven: bool = True):
+        self.tts_service = tts_service
+        self.event_driven = event_driven
+        self.wheel = TimerWheel()
+        self.sessions: Dict[str, _Guidance] = {}
+        # 事件循环只弱引用任务：持有引用直到完成，避免计算中途被回收、指引丢失
+        self._tasks: Set[asyncio.Task] = set()
+
+    def attach(self, nav_session_id: str) -> None:
+        """WebSocket 连接建立后开始为该会话播报"""
+        self.sessions[nav_session_id] = _Guidance()
+        print(f"[ENGINE][ATTACH] navSessionId={nav_session_id}")
+        self.trigger(nav_session_id)
+
+    def detach(self, nav_session_id: str) -> None:
+        self.wheel.cancel(nav_session_id)
+        if self.sessions.pop(nav_session_id, None) is not None:
+            print(f"[ENGINE][DETACH] navSessionId={nav_session_id}")
+
+    def on_location_update(self, nav_session_id: str) -> None:
+        if self.event_driven:
+            self.trigger(nav_session_id)
+
+    def on_route_change(self, nav_session_id: str) -> None:
+        g = self.sessions.get(nav_session_id)
+        if g is not None:
+            g.last_step_idx = -1
+            g.last_sent_text = ""
+        self.trigger(nav_session_id)
+
+    def on_perception(self, nav_session_id: str) -> None:
+        self.trigger(nav_session_id)
+
+    def prefetch_audio(self, nav_session_id: str, route: Dict[str, Any],
+                       cache: Dict[str, Any], **kwargs: Any) -> asyncio.Task:
+        """
+        路线确定后在后台预合成该路线会用到的全部播报，结果写入 cache["audioUrls"]。
+        开场白和第一步排在最前，尽量赶在连接建立前就绪。
+        """
+        texts = [HELLO_TEXT]
+        texts += [(st.get("instruction") or "").strip() for st in route.get("steps") or []]
+        texts += [DEFAULT_STEP_TEXT, ARRIVED_TEXT, NO_LOCATION_TEXT]
+        audio_urls = cache.setdefault("audioUrls", {})
+        task = asyncio.create_task(self.tts_service.prefetch(texts, nav_session_id, audio_urls, **kwargs))
+        cache["prefetchTask"] = task  # 持有引用，避免任务被回收
+        return task
+
+    def _prefetched(self, nav_session_id: str, text: str) -> Optional[str]:
+        """
+        预合成的音频URL。经 TTS 缓存查找：确认文件仍在并刷新访问记录，
+        已被淘汰 / 压缩清理时返回 None，不会推送失效的地址
+        """
+        nav = session_manager.get_navigation(nav_session_id)
+        route_data = nav.routeData if nav is not None else None
+        cache = route_data.get("_cache") if isinstance(route_data, dict) else None
+        if not isinstance(cache, dict) or text not in (cache.get("audioUrls") or {}):
+            return None
+        return self.tts_service.cached_url(text)
+
+    async def _speak(self, nav_session_id: str, text: str) -> Optional[str]:
+        """优先使用预合成的音频，未就绪或已被淘汰时再现场合成"""
+        url = self._prefetched(nav_session_id, text)
+        if url:
+            return url
+        return await self.tts_service.text_to_speech(text=text, session_id=nav_session_id)
+
+    def trigger(self, nav_session_id: str, matched: Optional[MatchResult] = None) -> Optional[asyncio.Task]:
+        """
+        请求重新计算指引。计算进行中再次触发时只标记 dirty，
+        当前计算结束后基于最新状态再算一次（合并突发的定位更新）。
+
+        matched: 调度器已批量算好的匹配结果，本次计算直接使用
+        """
+        g = self.sessions.get(nav_session_id)
+        if g is None:
+            return None
+        g.dirty = True
+        if matched is not None:
+            g.matched = matched
+        if g.running:
+            return None
+        g.running = True
+        task = asyncio.create_task(self._drain(nav_session_id, g))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _drain(self, nav_session_id: str, g: _Guidance) -> None:
+        try:
+            while g.dirty and self.sessions.get(nav_session_id) is g:
+                g.dirty = False
+                matched, g.matched = g.matched, None
+                if not await self._evaluate(nav_session_id, g, matched):
+                    self.detach(nav_session_id)
+                    return
+        except Exception as e:
+            print(f"[ENGINE][ERROR] navSessionId={nav_session_id} err={e}")
+        finally:
+            g.running = False
+
+    async def _send(self, nav_session_id: str, text: str, audio_url: Optional[str],
+                    remaining: int, remaining_time: int) -> bool:
+        return await websocket_manager.send_message(
+            nav_session_id=nav_session_id,
+            message_type="NAV_INSTRUCTION",
+            data={
+                "text": text,
+                "audioUrl": audio_url,
+                "remainingDistance": int(remaining),
+                "remainingTime": int(remaining_time),
+            },
+        )
+
+    def _remind_later(self, nav_session_id: str, delay: Optional[float] = None) -> None:
+        delay = REMINDER_INTERVAL if delay is None else delay
+        self.wheel.schedule(nav_session_id, delay, lambda: self.trigger(nav_session_id))
+
+    def _reminder_due(self, nav_session_id: str, g: _Guidance) -> bool:
+        """
+        提醒类消息节流：每个会话至多每 REMINDER_INTERVAL 秒一次。
+        未到间隔时只把时间轮顺延到下次可提醒的时刻，返回 False
+        """
+        now = time.monotonic()
+        wait = g.last_reminder_at + REMINDER_INTERVAL - now
+        if wait > 0:
+            self._remind_later(nav_session_id, wait)
+            return False
+        g.last_reminder_at = now
+        self._remind_later(nav_session_id)
+        return True
+
+    async def _evaluate(self, nav_session_id: str, g: _Guidance,
+                        matched: Optional[MatchResult] = None) -> bool:
+        """计算并推送一次指引，返回 False 表示该会话应停止"""
+        if not g.greeted:
+            g.greeted = True
+            hello_audio = await self._speak(nav_session_id, HELLO_TEXT)
+            if not await self._send(nav_session_id, HELLO_TEXT, hello_audio, 0, 0):
+                print(f"[ENGINE][ABORT] no ws connection for {nav_session_id}")
+                return False
+
+        nav = session_manager.get_navigation(nav_session_id)
+        if nav is None:
+            print(f"[ENGINE][STOP] session missing navSessionId={nav_session_id}")
+            return False
+
+        if nav.state in [NavState.ARRIVED, NavState.CANCELLED]:
+            print(f"[ENGINE][STOP] state={nav.state} navSessionId={nav_session_id}")
+            return False
+
+        route_data = nav.routeData or {}
+        active = route_data.get("activeRoute") if isinstance(route_data, dict) else None
+        if not isinstance(active, dict):
+            if not self._reminder_due(nav_session_id, g):
+                return True
+            return await self._send(nav_session_id, ROUTE_NOT_READY_TEXT, None, 0, 0)
+
+        total_dist = int(active.get("distance", 0) or 0)
+        steps = active.get("steps") or []
+
+        loc = nav.currentLocation
+        if not isinstance(loc, dict) or "lat" not in loc or "lng" not in loc:
+            if not self._reminder_due(nav_session_id, g):
+                return True
+            return await self._send(
+                nav_session_id, NO_LOCATION_TEXT, self._prefetched(nav_session_id, NO_LOCATION_TEXT),
+                total_dist, int(total_dist / WALK_SPEED) if total_dist > 0 else 0
+            )
+        self.wheel.cancel(nav_session_id)
+
+        cache = route_data.get("_cache")
+        if not isinstance(cache, dict) or "matcher" not in cache or "stepIndex" not in cache:
+            cache = build_route_cache(active)
+            route_data["_cache"] = cache
+
+        if matched is None:
+            matched = cache["matcher"].match(loc)
+        remaining = int(matched.remaining) if matched is not None else total_dist
+        remaining_time = int(remaining / WALK_SPEED)
+
+        if remaining <= ARRIVAL_DISTANCE:
+            session_manager.update_navigation_state(nav_session_id, NavState.ARRIVED)
+            await self._send(nav_session_id, ARRIVED_TEXT, self._prefetched(nav_session_id, ARRIVED_TEXT), 0, 0)
+            return False
+
+        step_idx = cache["stepIndex"].nearest_step(loc)
+
+        text = ""
+        if 0 <= step_idx < len(steps):
+            text = (steps[step_idx].get("instruction") or "").strip()
+        if not text:
+            text = DEFAULT_STEP_TEXT
+
+        if step_idx == g.last_step_idx and text == g.last_sent_text:
+            return True
+
+        g.last_step_idx = step_idx
+        g.last_sent_text = text
+        audio_url: Optional[str] = None
+        try:
+            audio_url = await self._speak(nav_session_id, text)
+        except Exception:
+            audio_url = None
+
+        if not await self._send(nav_session_id, text, audio_url, remaining, remaining_time):
+            print(f"[ENGINE][ABORT] disconnected navSessionId={nav_session_id}")
+            return False
+        return True
@@ -0,0 +1,163 @@
+"""
+障碍物时序跟踪（每个导航会话一个跟踪器）
+
+把连续感知批次中的检测结果关联成轨迹：同类型检测按 IoU 关联，IoU 不足时
+退回归一化中心点距离；同一帧内一条轨迹只关联一个检测，相邻的同类障碍物
+不会合并成一条。距离做指数平滑并估计接近速度。只有新出现的轨迹、
+或自上次提醒以来又接近了 approach_m 米的轨迹才触发提醒，
+同一个路沿不会每个批次都重复推送 / 合成语音。
+"""
+from typing import Any, Dict, List, Optional, Set, Tuple
+import itertools
+import time
+
+from app.models.schemas import ObstacleInfo
+
+
+Observation = Tuple[ObstacleInfo, List[float]]  # (障碍物, 归一化 bbox)
+
+
+def iou(a: List[float], b: List[float]) -> float:
+    ix = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def _center(b: List[float]) -> Tuple[float, float]:
+    return (b[0] + b[2]) / 2, (b[1] + b[3]) / 2
+
+
+class Track:
+
+    __slots__ = (
+        "id", "type", "bbox", "distance", "velocity", "direction", "confidence",
+        "hits", "first_seen", "last_seen", "warned_distance"
+    )
+
+    def __init__(self, track_id: int, obs: ObstacleInfo, bbox: List[float], now: float):
+        self.id = track_id
+        self.type = obs.type
+        self.bbox = bbox
+        self.distance = obs.distance
+        self.velocity = 0.0  # 米/秒，负数表示在接近
+        self.direction = obs.direction
+        self.confidence = obs.confidence
+        self.hits = 1
+        self.first_seen = now
+        self.last_seen = now
+        self.warned_distance: Optional[float] = None
+
+    def to_obstacle(self) -> ObstacleInfo:
+        return ObstacleInfo(
+            type=self.type,
+            distance=round(self.distance, 1),
+            direction=self.direction,
+            confidence=self.confidence
+        )
+
+
+class ObstacleTracker:
+
+    def __init__(
+        self,
+        iou_threshold: float = 0.3,
+        center_threshold: float = 0.15,
+        max_age_ms: float = 3000,
+        approach_m: float = 1.0,
+        smoothing: float = 0.5
+    ):
+        self.iou_threshold = iou_threshold
+        self.center_threshold = center_threshold
+        self.max_age = max_age_ms / 1000
+        self.approach_m = approach_m
+        self.alpha = smoothing
+
+        self.tracks: Dict[int, Track] = {}
+        self._ids = itertools.count(1)
+        self.last_update = time.monotonic()
+
+        self.updates = 0
+        self.observations = 0
+        self.alerts = 0
+
+    def update(self, frames: List[List[Observation]], now: Optional[float] = None) -> List[ObstacleInfo]:
+        """
+        用一个感知批次（每帧一组检测结果）更新轨迹。同一帧里的检测是不同的障碍物，
+        各自关联不同的轨迹；同一批次的不同帧拍的是同一场景，可以关联到同一条轨迹。
+
+        Returns:
+            需要提醒的障碍物（新轨迹 / 明显接近的轨迹），按距离升序
+        """
+        now = time.monotonic() if now is None else now
+        self.last_update = time.monotonic()
+        self.updates += 1
+        self.observations += sum(len(observations) for observations in frames)
+        for tid in [tid for tid, t in self.tracks.items() if now - t.last_seen > self.max_age]:
+            del self.tracks[tid]
+
+        touched: Dict[int, Track] = {}
+        for observations in frames:
+            matched: Set[int] = set()
+            for obs, bbox in sorted(observations, key=lambda o: -o[0].confidence):
+                track = self._associate(obs.type, bbox, matched)
+                if track is None:
+                    track = Track(next(self._ids), obs, bbox, now)
+                    self.tracks[track.id] = track
+                else:
+                    self._observe(track, obs, bbox, now)
+                matched.add(track.id)
+                touched[track.id] = track
+
+        alerts: List[Track] = []
+        for track in touched.values():
+            if track.warned_distance is None or (
+                track.velocity < 0 and track.warned_distance - track.distance >= self.approach_m
+            ):
+                track.warned_distance = track.distance
+                alerts.append(track)
+        self.alerts += len(alerts)
+        return [t.to_obstacle() for t in sorted(alerts, key=lambda t: t.distance)]
+
+    def _associate(self, obstacle_type: str, bbox: List[float], exclude: Set[int]) -> Optional[Track]:
+        best, best_iou = None, self.iou_threshold
+        nearest, nearest_d = None, self.center_threshold
+        cx, cy = _center(bbox)
+        for track in self.tracks.values():
+            if track.type != obstacle_type or track.id in exclude:
+                continue
+            overlap = iou(track.bbox, bbox)
+            if overlap >= best_iou:
+                best, best_iou = track, overlap
+            tx, ty = _center(track.bbox)
+            d = ((tx - cx) ** 2 + (ty - cy) ** 2) ** 0.5
+            if d <= nearest_d:
+                nearest, nearest_d = track, d
+        return best or nearest
+
+    def _observe(self, track: Track, obs: ObstacleInfo, bbox: List[float], now: float) -> None:
+        distance = self.alpha * obs.distance + (1 - self.alpha) * track.distance
+        dt = now - track.last_seen
+        if dt > 0:  # 同一批次内的多帧只平滑距离，不参与速度估计
+            v = (distance - track.distance) / dt
+            track.velocity = self.alpha * v + (1 - self.alpha) * track.velocity
+        track.distance = distance
+        track.bbox = bbox
+        track.direction = obs.direction
+        track.confidence = max(obs.confidence, track.confidence * 0.9)
+        track.hits += 1
+        track.last_seen = now
+
+    def idle(self, now: Optional[float] = None) -> bool:
+        """超过 max_age 没有收到感知批次：轨迹已全部过期，跟踪器可以丢弃"""
+        now = time.monotonic() if now is None else now
+        return now - self.last_update > self.max_age
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tracks": len(self.tracks),
+            "updates": self.updates,
+            "observations": self.observations,
+            "alerts": self.alerts,
+        }
@@ -0,0 +1,75 @@
+"""
+路线几何预编译
+"""
+from typing import Dict, List
+from app.core import geo
+
+
+def parse_polyline(polyline: str) -> List[Dict[str, float]]:
+    """解析 "lng,lat;lng,lat;..." 轨迹串"""
+    out: List[Dict[str, float]] = []
+    if not isinstance(polyline, str) or not polyline.strip():
+        return out
+    for seg in polyline.split(";"):
+        seg = seg.strip()
+        if not seg or "," not in seg:
+            continue
+        try:
+            lng_s, lat_s = seg.split(",", 1)
+            out.append({"lat": float(lat_s), "lng": float(lng_s)})
+        except Exception:
+            continue
+    return out
+
+
+class RouteGeometry:
+    """
+    一条路线的预编译几何（导航开始时构建一次，每个 tick 复用）
+
+    - lats / lngs: 顶点坐标（紧凑 double 数组）
+    - xs / ys: 以首点为原点的局部平面坐标（米），用于快速求最近点
+    - seg_len: 第 i 段（顶点 i -> i+1）的长度（米）
+    - remaining: 后缀和，remaining[i] = 从顶点 i 到终点的沿线距离（米）
+    """
+
+    __slots__ = ("lats", "lngs", "xs", "ys", "seg_len", "remaining", "_lat0", "_lng0")
+
+    def __init__(self, points: List[Dict[str, float]]):
+        self.lats = geo.to_array([float(p["lat"]) for p in points])
+        self.lngs = geo.to_array([float(p["lng"]) for p in points])
+
+        n = len(self.lats)
+        self._lat0 = float(self.lats[0]) if n else 0.0
+        self._lng0 = float(self.lngs[0]) if n else 0.0
+
+        self.xs, self.ys = geo.local_xy(self.lats, self.lngs, self._lat0, self._lng0)
+        self.seg_len = geo.segment_lengths(self.lats, self.lngs)
+        self.remaining = geo.remaining_lengths(self.lats, self.lngs)
+
+    @classmethod
+    def from_polyline(cls, polyline: str) -> "RouteGeometry":
+        return cls(parse_polyline(polyline))
+
+    def __len__(self) -> int:
+        return len(self.lats)
+
+    @property
+    def total_length(self) -> float:
+        return float(self.remaining[0]) if len(self.remaining) else 0.0
+
+    def to_local(self, lat: float, lng: float) -> tuple:
+        xs, ys = geo.local_xy((lat,), (lng,), self._lat0, self._lng0)
+        return float(xs[0]), float(ys[0])
+
+    def project_range(self, px: float, py: float, lo: int, hi: int) -> tuple:
+        """
+        把局部坐标 (px, py) 投影到第 lo..hi-1 段上，返回 (距离平方, 段下标, 段内比例t)
+        没有可用线段时段下标为 -1
+        """
+        return geo.project_to_segments(px, py, self.xs, self.ys, lo, hi)
+
+    def remaining_at(self, seg_idx: int, t: float) -> float:
+        """从第 seg_idx 段内比例 t 处到终点的沿线距离，O(1)"""
+        if seg_idx < 0 or seg_idx >= len(self.seg_len):
+            return 0.0
+        return float(self.remaining[seg_idx + 1] + (1.0 - t) * self.seg_len[seg_idx])
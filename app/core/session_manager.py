@@ -1,15 +1,29 @@
 """
 会话管理器
 """
-from typing import Dict, Optional
+from typing import Callable, Dict, List, Optional
 from app.models.schemas import NavigationSession, ConversationSession, NavState
+from app.core.obstacle_tracker import ObstacleTracker
+from config.settings import settings
 import time
 
 
+# 障碍物轨迹的最长保留时间：未显式配置时取感知上传间隔的 3 倍，
+# 慢速客户端偶尔迟到 / 丢一两次上传，同一障碍物也不会因轨迹过期而重复提醒
+OBSTACLE_MAX_AGE_MS = settings.NAV_OBSTACLE_MAX_AGE_MS or 3 * settings.PERCEPTION_UPLOAD_INTERVAL_MS
+
+
 class SessionManager:
     def __init__(self):
         self.conversation_sessions: Dict[str, ConversationSession] = {}
         self.navigation_sessions: Dict[str, NavigationSession] = {}
+        self.obstacle_trackers: Dict[str, ObstacleTracker] = {}
+        self._end_listeners: List[Callable[[str], None]] = []
+        self._last_tracker_sweep = -float("inf")
+
+    def on_navigation_end(self, callback: Callable[[str], None]) -> None:
+        """注册导航结束（到达 / 取消）回调，用于释放按会话保存的其他状态（如帧去重缓存）"""
+        self._end_listeners.append(callback)
     
     def create_conversation(
         self,
@@ -49,18 +63,45 @@ class SessionManager:
             updatedAt=int(time.time() * 1000)
         )
         self.navigation_sessions[nav_session_id] = session
+        self.obstacle_trackers.pop(nav_session_id, None)
         return session
     
     def get_navigation(self, nav_session_id: str) -> Optional[NavigationSession]:
 
         return self.navigation_sessions.get(nav_session_id)
     
+    def get_obstacle_tracker(self, nav_session_id: str) -> ObstacleTracker:
+        """
+        导航会话的障碍物跟踪器（与 lastObstacles 并列保存，按需创建）。
+        正常结束的导航在 update_navigation_state 中释放；客户端断开、未结束导航的
+        跟踪器在这里清理，每 max_age 最多扫描一次
+        """
+        now = time.monotonic()
+        if now - self._last_tracker_sweep >= OBSTACLE_MAX_AGE_MS / 1000:
+            self._last_tracker_sweep = now
+            for sid in [sid for sid, t in self.obstacle_trackers.items() if sid != nav_session_id and t.idle(now)]:
+                del self.obstacle_trackers[sid]
+
+        tracker = self.obstacle_trackers.get(nav_session_id)
+        if tracker is None:
+            tracker = ObstacleTracker(
+                max_age_ms=OBSTACLE_MAX_AGE_MS,
+                approach_m=settings.NAV_OBSTACLE_APPROACH_M
+            )
+            self.obstacle_trackers[nav_session_id] = tracker
+        return tracker
+
     def update_navigation_state(
         self,
         nav_session_id: str,
         state: NavState
     ) -> bool:
 
+        if state in (NavState.ARRIVED, NavState.CANCELLED):
+            self.obstacle_trackers.pop(nav_session_id, None)
+            for callback in self._end_listeners:
+                callback(nav_session_id)
+
         session = self.navigation_sessions.get(nav_session_id)
         if session:
             session.state = state
@@ -72,5 +113,6 @@ class SessionManager:
 
         self.conversation_sessions.clear()
         self.navigation_sessions.clear()
+        self.obstacle_trackers.clear()
 
 session_manager = SessionManager()
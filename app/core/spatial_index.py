@@ -0,0 +1,163 @@
+"""
+路线 step 线段的空间索引（网格哈希）
+"""
+from typing import Dict, List, Optional, Tuple
+from app.core import geo
+from app.core.route_geometry import parse_polyline
+import math
+
+
+class StepSegmentIndex:
+    """
+    把每个 step 的轨迹线段按包围盒放入固定边长的网格，每条路线构建一次。
+
+    查询时从定位所在格子按环向外扩展，已找到的最近距离不大于未扫描环的
+    下界时即停止，只需检查附近少量线段。
+    """
+
+    def __init__(self, step_points: List[List[Dict[str, float]]], cell_size: float = 25.0):
+        self.cell_size = float(cell_size)
+        self.n_steps = len(step_points)
+        self.cells: Dict[Tuple[int, int], List[int]] = {}
+
+        # 线段表：seg_step[k] 所属 step，seg_xy[k] = (ax, ay, bx, by)
+        self.seg_step: List[int] = []
+        self.seg_xy: List[Tuple[float, float, float, float]] = []
+
+        first = next((pts[0] for pts in step_points if pts), None)
+        self._lat0 = float(first["lat"]) if first else 0.0
+        self._lng0 = float(first["lng"]) if first else 0.0
+
+        for step_idx, pts in enumerate(step_points):
+            if not pts:
+                continue
+            xs, ys = geo.local_xy(
+                [p["lat"] for p in pts], [p["lng"] for p in pts], self._lat0, self._lng0
+            )
+            if len(pts) == 1:
+                self._insert(step_idx, xs[0], ys[0], xs[0], ys[0])
+                continue
+            for i in range(len(pts) - 1):
+                self._insert(step_idx, xs[i], ys[i], xs[i + 1], ys[i + 1])
+
+        if self.cells:
+            self._ix_min = min(k[0] for k in self.cells)
+            self._ix_max = max(k[0] for k in self.cells)
+            self._iy_min = min(k[1] for k in self.cells)
+            self._iy_max = max(k[1] for k in self.cells)
+
+    @classmethod
+    def from_steps(cls, steps: List[Dict], cell_size: float = 25.0) -> "StepSegmentIndex":
+        step_points = [parse_polyline((st.get("polyline") or "").strip()) for st in steps or []]
+        return cls(step_points, cell_size=cell_size)
+
+    def __len__(self) -> int:
+        return len(self.seg_xy)
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        return int(math.floor(x / self.cell_size)), int(math.floor(y / self.cell_size))
+
+    def _insert(self, step_idx: int, ax: float, ay: float, bx: float, by: float) -> None:
+        # 长线段切成不超过一个格子边长的小段，避免斜向长段的包围盒占满大片格子
+        pieces = int(math.hypot(bx - ax, by - ay) // self.cell_size) + 1
+        if pieces > 1:
+            for j in range(pieces):
+                t0 = j / pieces
+                t1 = (j + 1) / pieces
+                self._insert_piece(
+                    step_idx,
+                    ax + (bx - ax) * t0, ay + (by - ay) * t0,
+                    ax + (bx - ax) * t1, ay + (by - ay) * t1,
+                )
+            return
+        self._insert_piece(step_idx, ax, ay, bx, by)
+
+    def _insert_piece(self, step_idx: int, ax: float, ay: float, bx: float, by: float) -> None:
+        k = len(self.seg_xy)
+        self.seg_step.append(step_idx)
+        self.seg_xy.append((float(ax), float(ay), float(bx), float(by)))
+
+        cx0, cy0 = self._cell(min(ax, bx), min(ay, by))
+        cx1, cy1 = self._cell(max(ax, bx), max(ay, by))
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                self.cells.setdefault((cx, cy), []).append(k)
+
+    @staticmethod
+    def _seg_dist2(px: float, py: float, seg: Tuple[float, float, float, float]) -> float:
+        ax, ay, bx, by = seg
+        vx = bx - ax
+        vy = by - ay
+        wx = px - ax
+        wy = py - ay
+        vv = vx * vx + vy * vy
+        t = (wx * vx + wy * vy) / vv if vv > 0 else 0.0
+        t = 0.0 if t < 0.0 else (1.0 if t > 1.0 else t)
+        dx = wx - t * vx
+        dy = wy - t * vy
+        return dx * dx + dy * dy
+
+    def nearest(self, loc: Optional[Dict[str, float]]) -> Tuple[int, float]:
+        """
+        离 loc 最近的 step
+
+        Returns:
+            (step 下标, 距离米)；没有任何 step 轨迹时返回 (-1, inf)
+        """
+        if not loc or not self.cells:
+            return -1, float("inf")
+
+        xs, ys = geo.local_xy((float(loc["lat"]),), (float(loc["lng"]),), self._lat0, self._lng0)
+        px, py = float(xs[0]), float(ys[0])
+        cx, cy = self._cell(px, py)
+
+        # 定位在网格范围外时，之前的环必然为空，直接从范围边界开始
+        gx = max(self._ix_min - cx, 0, cx - self._ix_max)
+        gy = max(self._iy_min - cy, 0, cy - self._iy_max)
+        r = max(gx, gy)
+        # 扫完所有非空格子所需的最大环数
+        max_ring = max(
+            abs(cx - self._ix_min), abs(cx - self._ix_max),
+            abs(cy - self._iy_min), abs(cy - self._iy_max),
+        )
+
+        best_d2 = float("inf")
+        best_key = (float("inf"), -1)
+        seen = set()
+        while r <= max_ring:
+            for cell in self._ring(cx, cy, r):
+                for k in self.cells.get(cell, ()):
+                    if k in seen:
+                        continue
+                    seen.add(k)
+                    d2 = self._seg_dist2(px, py, self.seg_xy[k])
+                    key = (d2, self.seg_step[k])
+                    if key < best_key:
+                        best_key = key
+                        best_d2 = d2
+            # 第 r+1 环及以外的线段距离至少为 r * cell_size
+            bound = r * self.cell_size
+            if best_d2 <= bound * bound:
+                break
+            r += 1
+
+        return best_key[1], math.sqrt(best_d2)
+
+    def nearest_step(self, loc: Optional[Dict[str, float]]) -> int:
+        return self.nearest(loc)[0]
+
+    def _ring(self, cx: int, cy: int, r: int):
+        """第 r 环上落在网格范围内的格子"""
+        if r == 0:
+            yield (cx, cy)
+            return
+        x_lo, x_hi = max(cx - r, self._ix_min), min(cx + r, self._ix_max)
+        y_lo, y_hi = max(cy - r + 1, self._iy_min), min(cy + r - 1, self._iy_max)
+        for y in (cy - r, cy + r):
+            if self._iy_min <= y <= self._iy_max:
+                for x in range(x_lo, x_hi + 1):
+                    yield (x, y)
+        for x in (cx - r, cx + r):
+            if self._ix_min <= x <= self._ix_max:
+                for y in range(y_lo, y_hi + 1):
+                    yield (x, y)
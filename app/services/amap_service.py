@@ -3,9 +3,10 @@
 """
 from typing import Dict, List, Optional, Any
 from config.settings import settings
-import requests
-import math
-import asyncio
+from app.core import geo
+from app.core.http_client import http_client
+from app.services.route_cache import route_cache
+import httpx
 
 class AmapService:
     
@@ -31,7 +32,19 @@ class AmapService:
         """
         if self.mock_mode:
             return self._mock_routes(origin, destination)
-        
+
+        # 同一网格内的起终点共用缓存结果，并发请求只发一次上游请求
+        routes = await route_cache.get_or_fetch(
+            origin, destination, lambda: self._fetch_walking_route(origin, destination)
+        )
+        return routes if routes is not None else self._mock_routes(origin, destination)
+
+    async def _fetch_walking_route(
+        self,
+        origin: Dict[str, float],
+        destination: Dict[str, float]
+    ) -> Optional[List[Dict]]:
+        """请求高德步行规划；失败返回 None（不写缓存，由调用方回退到模拟路线）"""
         try:
             url = f"{self.base_url}/direction/walking"
             params = {
@@ -41,18 +54,20 @@ class AmapService:
                 "show_fields": "polyline,steps",
             }
             
-            response = requests.get(url, params=params, timeout=10)
+            response = await http_client.client.get(
+                url, params=params, timeout=httpx.Timeout(settings.AMAP_ROUTE_TIMEOUT, connect=3.0)
+            )
             data = response.json()
             
             if data.get("status") == "1":
                 return self._parse_routes(data, origin, destination)
             else:
                 print(f"高德API错误: {data.get('info')}")
-                return self._mock_routes(origin, destination)
+                return None
                 
         except Exception as e:
             print(f"高德API调用失败: {e}")
-            return self._mock_routes(origin, destination)
+            return None
     
     async def search_poi_text(
         self,
@@ -92,13 +107,12 @@ class AmapService:
             params["city"] = city.strip()
             params["citylimit"] = "true"
 
-        def _do_req() -> Dict[str, Any]:
-            r = requests.get(url, params=params, timeout=10)
-            r.raise_for_status()
-            return r.json()
-
         try:
-            data = await asyncio.to_thread(_do_req)
+            r = await http_client.client.get(
+                url, params=params, timeout=httpx.Timeout(settings.AMAP_POI_TIMEOUT, connect=3.0)
+            )
+            r.raise_for_status()
+            data = r.json()
         except Exception as e:
             return {"success": False, "error": f"amap poi request failed: {e}"}
 
@@ -280,19 +294,7 @@ class AmapService:
         lat2: float, lng2: float
     ) -> float:
 
-        R = 6371000  # 地球半径（米）
-        
-        phi1 = math.radians(lat1)
-        phi2 = math.radians(lat2)
-        delta_phi = math.radians(lat2 - lat1)
-        delta_lambda = math.radians(lng2 - lng1)
-        
-        a = (math.sin(delta_phi / 2) ** 2 +
-             math.cos(phi1) * math.cos(phi2) *
-             math.sin(delta_lambda / 2) ** 2)
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-        
-        return R * c
+        return geo.haversine_m(lat1, lng1, lat2, lng2)
     
     def check_deviation(
         self,
@@ -301,28 +303,33 @@ class AmapService:
         threshold: int = None
     ) -> Dict:
         """
-        检查是否偏离路线
+        检查是否偏离路线（按点到折线的垂直距离计算）
         
         Returns:
             {
                 "deviated": bool,
                 "distance": float,  # 偏离距离（米）
-                "nearest_point": {...}
+                "nearest_point": {...}  # 路线上离当前位置最近的点
             }
         """
         threshold = threshold or settings.NAV_DEVIATION_THRESHOLD
 
-        min_distance = float('inf')
-        nearest_point = None
-        
-        for point in route_points:
-            dist = self._haversine_distance(
-                current_location["lat"], current_location["lng"],
-                point["lat"], point["lng"]
-            )
-            if dist < min_distance:
-                min_distance = dist
-                nearest_point = point
+        if not route_points:
+            return {"deviated": True, "distance": float('inf'), "nearest_point": None}
+
+        lats = [p["lat"] for p in route_points]
+        lngs = [p["lng"] for p in route_points]
+        min_distance, seg, t = geo.point_to_polyline(
+            current_location["lat"], current_location["lng"], lats, lngs
+        )
+
+        if len(route_points) == 1:
+            nearest_point = route_points[0]
+        else:
+            nearest_point = {
+                "lat": lats[seg] + (lats[seg + 1] - lats[seg]) * t,
+                "lng": lngs[seg] + (lngs[seg + 1] - lngs[seg]) * t,
+            }
         
         return {
             "deviated": min_distance > threshold,
@@ -0,0 +1,150 @@
+"""
+感知帧去重（dHash 感知哈希）
+
+用户静止或慢速移动时，同一会话连续上传的帧几乎相同。每帧在解码线程里顺带算出
+64 位 dHash；与本会话最近推理过的帧（或同一请求中排在前面的帧）汉明距离
+不超过阈值时直接复用那一帧的检测结果，跳过模型推理。
+
+缓存结果只保留 ttl 毫秒，保证画面中移动的障碍物不会因复用而长时间"看不见"。
+缓存的是检测框行（几十字节），不是模型的 Results（带整帧原图）；不再上传的会话
+在之后任意会话的请求中按 ttl 清理，导航结束时由 SessionManager 调用 forget。
+"""
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+import time
+
+from PIL import Image
+
+
+HASH_SIZE = 8
+
+
+def dhash(image: Image.Image) -> int:
+    """差值哈希：灰度缩放到 9x8，逐行比较相邻像素得到 64 位整数"""
+    small = image.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.BILINEAR)
+    px = small.tobytes()
+    value = 0
+    for row in range(HASH_SIZE):
+        base = row * (HASH_SIZE + 1)
+        for col in range(HASH_SIZE):
+            value = (value << 1) | (px[base + col] > px[base + col + 1])
+    return value
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class FrameDeduper:
+    """按会话保存最近推理过的 (哈希, 检测结果, 时间)，命中时复用检测结果"""
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        threshold: int = 5,
+        ttl_ms: float = 2000,
+        history: int = 8,
+        max_sessions: int = 1024
+    ):
+        self.enabled = enabled
+        self.threshold = max(0, threshold)
+        self.ttl = max(0.0, ttl_ms) / 1000
+        self.history = max(1, history)
+        self.max_sessions = max(1, max_sessions)
+
+        self._sessions: "OrderedDict[str, Deque[Tuple[int, Any, float]]]" = OrderedDict()
+        self._last_sweep = 0.0
+
+        self.lookups = 0
+        self.hits = 0
+        self.batch_hits = 0
+
+    async def run(
+        self,
+        session_id: Optional[str],
+        hashes: List[Optional[int]],
+        frames: List[Any],
+        infer: Callable[[List[Any]], Awaitable[List[Any]]]
+    ) -> List[Any]:
+        """
+        对命中的帧复用缓存结果，其余帧交给 infer 推理；返回与 frames 一一对应的检测结果
+        """
+        if not self.enabled or not session_id or not frames:
+            return await infer(frames)
+
+        now = time.monotonic()
+        self._sweep(now)
+        recent = self._recent(session_id, now)
+        detections: List[Any] = [None] * len(frames)
+        same_as: Dict[int, int] = {}
+        todo: List[int] = []
+
+        for i, h in enumerate(hashes):
+            self.lookups += 1
+            if h is None:
+                todo.append(i)
+                continue
+            cached = next((det for ch, det, _ in reversed(recent) if hamming(ch, h) <= self.threshold), None)
+            if cached is not None:
+                self.hits += 1
+                detections[i] = cached
+                continue
+            j = next((k for k in todo if hashes[k] is not None and hamming(hashes[k], h) <= self.threshold), None)
+            if j is not None:
+                self.batch_hits += 1
+                same_as[i] = j
+                continue
+            todo.append(i)
+
+        if todo:
+            fresh = await infer([frames[i] for i in todo])
+            for i, det in zip(todo, fresh):
+                detections[i] = det
+                if det is not None and hashes[i] is not None:
+                    recent.append((hashes[i], det, now))
+        for i, j in same_as.items():
+            detections[i] = detections[j]
+        return detections
+
+    def _recent(self, session_id: str, now: float) -> Deque[Tuple[int, Any, float]]:
+        recent = self._sessions.get(session_id)
+        if recent is None:
+            recent = deque(maxlen=self.history)
+            self._sessions[session_id] = recent
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        else:
+            self._sessions.move_to_end(session_id)
+        while recent and now - recent[0][2] > self.ttl:
+            recent.popleft()
+        return recent
+
+    def _sweep(self, now: float) -> None:
+        """
+        清理整个缓存中已过期的会话；每 ttl 最多执行一次。会话按最近访问排序，
+        从最久未访问的一端弹出，遇到仍有未过期结果的会话即停止
+        """
+        if now - self._last_sweep < self.ttl:
+            return
+        self._last_sweep = now
+        while self._sessions:
+            session_id, recent = next(iter(self._sessions.items()))
+            if recent and now - recent[-1][2] <= self.ttl:
+                break
+            del self._sessions[session_id]
+
+    def forget(self, session_id: str) -> None:
+        self._sessions.pop(session_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        skipped = self.hits + self.batch_hits
+        return {
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            "ttlMs": self.ttl * 1000,
+            "sessions": len(self._sessions),
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "batchHits": self.batch_hits,
+            "hitRate": round(skipped / self.lookups, 4) if self.lookups else 0.0,
+        }
@@ -0,0 +1,208 @@
+"""
+步行路线规划结果缓存
+
+起终点按 ROUTE_CACHE_GRID_M 米的网格量化后作为键，同一网格内的起终点共用一次
+高德请求结果。本地为带 TTL 的 LRU；ROUTE_CACHE_REDIS=True 时再加一层 Redis
+（复用 REDIS_* 配置），多进程 / 重启后也能命中。同一个键的并发请求只发一次上游请求
+（LLM 工具调用与随后的 /nav/start 常在几秒内规划同一条路线）。
+
+缓存中的路线会被下游修改（routeId、预合成音频等），读写都做深拷贝。
+"""
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import copy
+import json
+import math
+import time
+
+from config.settings import settings
+
+
+METERS_PER_DEG_LAT = 111320.0
+
+Routes = List[Dict[str, Any]]
+
+
+def quantize(lat: float, lng: float, grid_m: float) -> Tuple[int, int]:
+    """经纬度 -> 网格下标；经度方向的格宽按所在纬度行的余弦修正，格子近似 grid_m 见方"""
+    dlat = grid_m / METERS_PER_DEG_LAT
+    row = math.floor(lat / dlat)
+    cos_lat = max(0.01, math.cos(math.radians((row + 0.5) * dlat)))
+    dlng = grid_m / (METERS_PER_DEG_LAT * cos_lat)
+    return row, math.floor(lng / dlng)
+
+
+class RouteCache:
+
+    def __init__(
+        self,
+        grid_m: float = 10,
+        ttl: float = 600,
+        max_entries: int = 1000,
+        redis_client: Any = None
+    ):
+        self.grid_m = max(0.1, grid_m)
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self.redis = redis_client
+
+        self._entries: "OrderedDict[str, Tuple[float, Routes]]" = OrderedDict()
+        self._inflight: Dict[str, "asyncio.Future[Optional[Routes]]"] = {}
+
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.joins = 0
+        self.redis_errors = 0
+
+    def make_key(self, origin: Dict[str, float], destination: Dict[str, float]) -> str:
+        o = quantize(float(origin["lat"]), float(origin["lng"]), self.grid_m)
+        d = quantize(float(destination["lat"]), float(destination["lng"]), self.grid_m)
+        return f"route:walk:{self.grid_m:g}:{o[0]},{o[1]}:{d[0]},{d[1]}"
+
+    async def get_or_fetch(
+        self,
+        origin: Dict[str, float],
+        destination: Dict[str, float],
+        fetch: Callable[[], Awaitable[Optional[Routes]]]
+    ) -> Optional[Routes]:
+        """
+        命中缓存直接返回；否则调用 fetch（同一个键并发时只调用一次）。
+        fetch 返回 None 表示上游失败，不写缓存。
+        """
+        key = self.make_key(origin, destination)
+        routes = self.get(key)
+        if routes is None:
+            routes = await self._get_redis(key)
+        if routes is not None:
+            return routes
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.joins += 1
+            return copy.deepcopy(await asyncio.shield(pending))
+
+        self.misses += 1
+        future: "asyncio.Future[Optional[Routes]]" = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            routes = await fetch()
+            if routes:
+                self.put(key, routes)
+                await self._set_redis(key, routes)
+            future.set_result(copy.deepcopy(routes) if routes else None)
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # 没有其他等待者时避免 "exception was never retrieved"
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        return routes
+
+    def get(self, key: str) -> Optional[Routes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, routes = entry
+        if self.ttl > 0 and time.monotonic() >= expires_at:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return copy.deepcopy(routes)
+
+    def put(self, key: str, routes: Routes) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, copy.deepcopy(routes))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _get_redis(self, key: str) -> Optional[Routes]:
+        if self.redis is None:
+            return None
+        try:
+            raw = await self.redis.get(key)
+        except Exception as e:
+            self.redis_errors += 1
+            print(f"[ROUTE_CACHE][REDIS] get failed: {e}")
+            return None
+        if not raw:
+            return None
+        try:
+            routes = json.loads(raw)
+            if not isinstance(routes, list):
+                raise ValueError(f"unexpected type {type(routes).__name__}")
+        except (ValueError, TypeError) as e:
+            # 损坏 / 其他程序写入的值：删掉，按未命中处理，重新向上游请求
+            self.redis_errors += 1
+            print(f"[ROUTE_CACHE][REDIS] bad value for {key}: {e}")
+            try:
+                await self.redis.delete(key)
+            except Exception:
+                pass
+            return None
+        self.redis_hits += 1
+        self.put(key, routes)
+        return routes
+
+    async def _set_redis(self, key: str, routes: Routes) -> None:
+        if self.redis is None:
+            return
+        try:
+            await self.redis.set(key, json.dumps(routes, ensure_ascii=False), ex=max(1, int(self.ttl)))
+        except Exception as e:
+            self.redis_errors += 1
+            print(f"[ROUTE_CACHE][REDIS] set failed: {e}")
+
+    async def close(self) -> None:
+        if self.redis is not None:
+            try:
+                await self.redis.aclose()
+            except Exception:
+                pass
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.redis_hits + self.misses + self.joins
+        return {
+            "gridM": self.grid_m,
+            "ttl": self.ttl,
+            "entries": len(self._entries),
+            "maxEntries": self.max_entries,
+            "redis": self.redis is not None,
+            "hits": self.hits,
+            "redisHits": self.redis_hits,
+            "misses": self.misses,
+            "joins": self.joins,
+            "redisErrors": self.redis_errors,
+            "hitRate": round((lookups - self.misses) / lookups, 4) if lookups else 0.0,
+        }
+
+
+def _create_redis() -> Any:
+    if not settings.ROUTE_CACHE_REDIS:
+        return None
+    try:
+        import redis.asyncio as aioredis
+    except ImportError:
+        print("[ROUTE_CACHE] redis not installed, using local cache only")
+        return None
+    # 设置超时：Redis 挂起时请求失败并退回本地缓存，而不是一直阻塞路线规划
+    return aioredis.Redis(
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        db=settings.REDIS_DB,
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=settings.REDIS_CONNECT_TIMEOUT,
+    )
+
+
+route_cache = RouteCache(
+    grid_m=settings.ROUTE_CACHE_GRID_M,
+    ttl=settings.ROUTE_CACHE_TTL,
+    max_entries=settings.ROUTE_CACHE_MAX_ENTRIES,
+    redis_client=_create_redis(),
+)
@@ -0,0 +1,163 @@
+"""
+TTS合成后端
+
+每个后端只负责"把一段文本合成到指定文件"，缓存、去重和原子落盘由 TTSService 统一处理。
+新增提供方只需实现 TTSBackend 并在 get_backend 中注册，路由层无需改动。
+"""
+from typing import AsyncIterator, List, Optional, Tuple
+import asyncio
+import math
+import struct
+import wave
+
+
+MEDIA_TYPES = {".mp3": "audio/mpeg", ".wav": "audio/wav"}
+
+
+class TTSBackend:
+    """
+    后端协议
+
+    name:      参与缓存 key 计算，同一文本换后端会重新合成
+    ext:       输出文件扩展名
+    streaming: 是否支持 stream()，支持时流式接口可以边合成边转发
+    """
+
+    name = ""
+    ext = ".mp3"
+    streaming = False
+
+    def __init__(self, voice: str):
+        self.voice = voice
+
+    @property
+    def media_type(self) -> str:
+        """HTTP Content-Type，由输出扩展名决定"""
+        return MEDIA_TYPES.get(self.ext, "application/octet-stream")
+
+    async def synthesize(self, text: str, path: str) -> None:
+        """把 text 合成到 path，失败时抛出异常"""
+        if not self.streaming:
+            raise NotImplementedError
+        with open(path, "wb") as f:
+            async for chunk in self.stream(text):
+                f.write(chunk)
+
+    async def stream(self, text: str) -> AsyncIterator[bytes]:
+        """按到达顺序产出音频分片（仅 streaming 后端实现）"""
+        raise NotImplementedError
+        yield b""  # pragma: no cover
+
+    async def synthesize_many(
+        self,
+        jobs: List[Tuple[str, str]],
+        concurrency: int = 4
+    ) -> List[Optional[BaseException]]:
+        """
+        批量合成 [(text, path), ...]，限制并发数。
+
+        Returns:
+            与 jobs 一一对应，成功为 None，失败为异常对象
+        """
+        sem = asyncio.Semaphore(max(1, concurrency))
+
+        async def one(text: str, path: str) -> None:
+            async with sem:
+                await self.synthesize(text, path)
+
+        results = await asyncio.gather(*[one(t, p) for t, p in jobs], return_exceptions=True)
+        return [r if isinstance(r, BaseException) else None for r in results]
+
+
+class EdgeTTSBackend(TTSBackend):
+
+    name = "edge"
+    ext = ".mp3"
+    streaming = True
+
+    async def stream(self, text: str) -> AsyncIterator[bytes]:
+        import edge_tts
+
+        communicate = edge_tts.Communicate(text, self.voice)
+        async for message in communicate.stream():
+            if message["type"] == "audio":
+                yield message["data"]
+
+
+class AzureTTSBackend(TTSBackend):
+
+    name = "azure"
+    ext = ".wav"  # AudioOutputConfig(filename=...) 默认输出 RIFF/WAV
+
+    def __init__(self, voice: str, api_key: str, region: str):
+        super().__init__(voice)
+        self.api_key = api_key
+        self.region = region
+
+    async def synthesize(self, text: str, path: str) -> None:
+        # SDK 的 .get() 是阻塞调用，放到线程里避免卡住事件循环
+        await asyncio.to_thread(self._synthesize_blocking, text, path)
+
+    def _synthesize_blocking(self, text: str, path: str) -> None:
+        import azure.cognitiveservices.speech as speechsdk
+
+        speech_config = speechsdk.SpeechConfig(subscription=self.api_key, region=self.region)
+        speech_config.speech_synthesis_voice_name = self.voice
+        audio_config = speechsdk.audio.AudioOutputConfig(filename=path)
+        synthesizer = speechsdk.SpeechSynthesizer(speech_config=speech_config, audio_config=audio_config)
+
+        result = synthesizer.speak_text_async(text).get()
+        del synthesizer  # 释放输出文件句柄
+        if result.reason != speechsdk.ResultReason.SynthesizingAudioCompleted:
+            raise RuntimeError(f"Azure TTS未完成: {result.reason}")
+
+
+class LocalTTSBackend(TTSBackend):
+    """
+    离线后端：不访问网络，按文本长度写出时长接近真实播报的 WAV（16kHz 单声道 16bit）。
+    用于压测磁盘、缓存和 /audio 静态服务整条链路。
+    """
+
+    name = "local"
+    ext = ".wav"
+
+    SAMPLE_RATE = 16000
+    CHARS_PER_SECOND = 4.0  # 中文播报语速约每秒 4 字
+    MIN_SECONDS = 0.5
+
+    def __init__(self, voice: str):
+        super().__init__(voice)
+        self._second = self._tone(self.SAMPLE_RATE)
+
+    @staticmethod
+    def _tone(n: int, freq: float = 440.0, amp: int = 3000) -> bytes:
+        return b"".join(
+            struct.pack("<h", int(amp * math.sin(2 * math.pi * freq * i / LocalTTSBackend.SAMPLE_RATE)))
+            for i in range(n)
+        )
+
+    def duration(self, text: str) -> float:
+        return max(self.MIN_SECONDS, len(text.strip()) / self.CHARS_PER_SECOND)
+
+    async def synthesize(self, text: str, path: str) -> None:
+        await asyncio.to_thread(self._write_wav, text, path)
+
+    def _write_wav(self, text: str, path: str) -> None:
+        frames = int(self.duration(text) * self.SAMPLE_RATE)
+        full, rest = divmod(frames, self.SAMPLE_RATE)
+        with wave.open(path, "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(self.SAMPLE_RATE)
+            for _ in range(full):
+                w.writeframes(self._second)
+            w.writeframes(self._second[:rest * 2])
+
+
+def get_backend(provider: str, voice: str, api_key: str = "", region: str = "") -> TTSBackend:
+    """按 TTS_PROVIDER 创建后端，未知提供方默认使用 Edge"""
+    if provider == "azure":
+        return AzureTTSBackend(voice, api_key, region)
+    if provider == "local":
+        return LocalTTSBackend(voice)
+    return EdgeTTSBackend(voice)
@@ -0,0 +1,314 @@
+"""
+TTS音频缓存（进程内共享，按内容寻址）
+"""
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from config.settings import settings
+import asyncio
+import hashlib
+import os
+import re
+import time
+import unicodedata
+import uuid
+
+
+_KEY_FILE_RE = re.compile(r"^([0-9a-f]{40})(\.[a-z0-9]+)$")
+_AUDIO_EXTS = (".mp3", ".wav")
+_PART_MAX_AGE = 3600  # 秒，超过该时间的未完成临时文件视为残留
+
+
+class _Entry:
+
+    __slots__ = ("filename", "size", "last_access", "hits")
+
+    def __init__(self, filename: str, size: int, last_access: float):
+        self.filename = filename
+        self.size = size
+        self.last_access = last_access
+        self.hits = 0
+
+
+class TTSCache:
+    """
+    key = sha1(provider, voice, 规范化文本)，与会话无关。
+
+    音频按 key 前两位分片存放在 AUDIO_OUTPUT_DIR/<ab>/<key>.<ext>，内存中维护
+    LRU 索引。写入时超出字节数 / 文件数预算立即淘汰最久未访问的条目；
+    后台压缩任务定期淘汰超过最长闲置时间的条目并清理残留文件。
+    """
+
+    def __init__(
+        self,
+        root: str,
+        max_bytes: int = 0,
+        max_files: int = 0,
+        max_age: float = 0,
+        compact_interval: float = 300
+    ):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.max_age = max_age
+        self.compact_interval = compact_interval
+
+        self._index: "OrderedDict[str, _Entry]" = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.evicted_bytes = 0
+        self.compactions = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def load(self) -> int:
+        """
+        从磁盘恢复索引（按修改时间排序作为初始 LRU 顺序），返回恢复的条目数。
+        在 lifespan 启动时调用（线程中执行），导入模块本身不访问磁盘。
+        """
+        os.makedirs(self.root, exist_ok=True)
+        found: List[Tuple[float, str, str, int]] = []
+        try:
+            shards = [d for d in os.scandir(self.root) if d.is_dir() and len(d.name) == 2]
+        except OSError:
+            return 0
+        for d in shards:
+            try:
+                for f in os.scandir(d.path):
+                    m = _KEY_FILE_RE.match(f.name)
+                    if m and f.is_file():
+                        st = f.stat()
+                        found.append((st.st_mtime, m.group(1), f"{d.name}/{f.name}", st.st_size))
+            except OSError:
+                continue
+
+        # 从新到旧插到队头：最旧的在最前，最先被淘汰
+        found.sort(reverse=True)
+        loaded = 0
+        for mtime, key, filename, size in found:
+            if key in self._index:  # 启动前已写入的条目以内存为准
+                continue
+            self._index[key] = _Entry(filename, size, mtime)
+            self._index.move_to_end(key, last=False)
+            self.total_bytes += size
+            loaded += 1
+        return loaded
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        text = unicodedata.normalize("NFKC", text or "")
+        return " ".join(text.split())
+
+    @classmethod
+    def make_key(cls, provider: str, voice: str, text: str) -> str:
+        raw = f"{provider}\x00{voice}\x00{cls.normalize(text)}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def shard_filename(key: str, ext: str) -> str:
+        return f"{key[:2]}/{key}{ext}"
+
+    @staticmethod
+    def url_for(filename: str) -> str:
+        return f"/audio/{filename}"
+
+    def path_for(self, filename: str) -> str:
+        return os.path.join(self.root, *filename.split("/"))
+
+    def path_for_url(self, url: str) -> str:
+        return self.path_for(url[len("/audio/"):])
+
+    def _ensure_shard(self, filename: str) -> None:
+        os.makedirs(os.path.dirname(self.path_for(filename)), exist_ok=True)
+
+    def prepare(self, key: str, ext: str) -> Tuple[str, str]:
+        """为新条目分配 (文件名, 绝对路径)，并确保分片目录存在"""
+        filename = self.shard_filename(key, ext)
+        self._ensure_shard(filename)
+        return filename, os.path.abspath(self.path_for(filename))
+
+    @staticmethod
+    def temp_path(filepath: str) -> str:
+        """同目录下的唯一临时文件，写完后由 commit 原子替换为正式文件"""
+        return f"{filepath}.{uuid.uuid4().hex[:12]}.part"
+
+    def commit(self, key: str, filename: str, temp_path: str) -> str:
+        os.replace(temp_path, self.path_for(filename))
+        return self.put(key, filename)
+
+    @staticmethod
+    def discard(temp_path: str) -> None:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+
+    def get(self, key: str) -> Optional[str]:
+        """命中返回音频URL，并刷新访问记录"""
+        entry = self._index.get(key)
+        if entry is None or not os.path.exists(self.path_for(entry.filename)):
+            if entry is not None:
+                self._drop(key)
+            self.misses += 1
+            return None
+        entry.last_access = time.time()
+        entry.hits += 1
+        self._index.move_to_end(key)
+        self.hits += 1
+        return self.url_for(entry.filename)
+
+    def put(self, key: str, filename: str) -> str:
+        try:
+            size = os.path.getsize(self.path_for(filename))
+        except OSError:
+            size = 0
+        if key in self._index:
+            self._drop(key)
+        self._index[key] = _Entry(filename, size, time.time())
+        self.total_bytes += size
+        self.stores += 1
+        self._evict_over_budget(keep=key)
+        return self.url_for(filename)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def _drop(self, key: str) -> Optional[_Entry]:
+        entry = self._index.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= entry.size
+        return entry
+
+    def _evict(self, key: str, unlink: bool = True) -> Optional[str]:
+        """移出索引并返回文件路径；unlink=False 时由调用方负责删除文件"""
+        entry = self._drop(key)
+        if entry is None:
+            return None
+        path = self.path_for(entry.filename)
+        if unlink:
+            self._unlink_all([path])
+        self.evictions += 1
+        self.evicted_bytes += entry.size
+        return path
+
+    @staticmethod
+    def _unlink_all(paths: List[str]) -> None:
+        for path in paths:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    def _over_budget(self) -> bool:
+        if self.max_files and len(self._index) > self.max_files:
+            return True
+        if self.max_bytes and self.total_bytes > self.max_bytes:
+            return True
+        return False
+
+    def _evict_over_budget(self, keep: Optional[str] = None) -> None:
+        while self._over_budget() and self._index:
+            key = next(iter(self._index))
+            if key == keep:
+                break
+            self._evict(key)
+
+    def _select_victims(self) -> List[str]:
+        """把超龄与超预算的条目移出索引，返回待删除的文件路径"""
+        victims: List[str] = []
+        if self.max_age:
+            deadline = time.time() - self.max_age
+            while self._index:
+                key, entry = next(iter(self._index.items()))
+                if entry.last_access >= deadline:
+                    break
+                victims.append(self._evict(key, unlink=False))
+        while self._over_budget() and self._index:
+            victims.append(self._evict(next(iter(self._index)), unlink=False))
+        return victims
+
+    def compact(self) -> int:
+        """淘汰超龄与超预算的条目，清理残留文件，返回淘汰数量"""
+        victims = self._select_victims()
+        self._unlink_all(victims)
+        self._sweep_stale_files()
+        self.compactions += 1
+        return len(victims)
+
+    def _sweep_stale_files(self) -> None:
+        """删除超时的临时文件，以及根目录下旧版按会话命名的音频"""
+        now = time.time()
+        try:
+            entries = list(os.scandir(self.root))
+        except OSError:
+            return
+        for d in entries:
+            try:
+                if d.is_dir() and len(d.name) == 2:
+                    for f in os.scandir(d.path):
+                        if f.name.endswith(".part") and now - f.stat().st_mtime > _PART_MAX_AGE:
+                            os.unlink(f.path)
+                    continue
+                if not d.is_file():
+                    continue
+                age = now - d.stat().st_mtime
+                stale_part = d.name.endswith(".part") and age > _PART_MAX_AGE
+                legacy = d.name.endswith(_AUDIO_EXTS) and self.max_age and age > self.max_age
+                if stale_part or legacy:
+                    os.unlink(d.path)
+            except OSError:
+                continue
+
+    def start_compaction(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._compaction_loop())
+
+    async def stop_compaction(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _compaction_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.compact_interval)
+            try:
+                # 索引在事件循环内修改，磁盘删除与目录扫描放到线程里
+                victims = self._select_victims()
+                await asyncio.to_thread(self._unlink_all, victims)
+                await asyncio.to_thread(self._sweep_stale_files)
+                self.compactions += 1
+                n = len(victims)
+                if n:
+                    print(f"[TTS_CACHE] compacted evicted={n} files={len(self)} bytes={self.total_bytes}")
+            except Exception as e:
+                print(f"[TTS_CACHE] compaction failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "files": len(self._index),
+            "bytes": self.total_bytes,
+            "maxFiles": self.max_files,
+            "maxBytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "evictedBytes": self.evicted_bytes,
+            "compactions": self.compactions,
+        }
+
+
+tts_cache = TTSCache(
+    settings.AUDIO_OUTPUT_DIR,
+    max_bytes=settings.TTS_CACHE_MAX_MB * 1024 * 1024,
+    max_files=settings.TTS_CACHE_MAX_FILES,
+    max_age=settings.TTS_CACHE_MAX_AGE_HOURS * 3600,
+    compact_interval=settings.TTS_CACHE_COMPACT_INTERVAL,
+)
@@ -1,19 +1,33 @@
 """
 TTS语音合成服务
 """
-from typing import Optional
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, Optional
 from config.settings import settings
+from app.services.tts_cache import tts_cache
+from app.services.tts_backends import TTSBackend, get_backend
 import os
 import hashlib
 import asyncio
 
 
+_STREAM_READ_SIZE = 16 * 1024
+
+
 class TTSService:
 
+    # 正在合成的 key -> 任务；类级共享，多个 TTSService 实例之间同样去重
+    _inflight: Dict[str, "asyncio.Future[str]"] = {}
+
     def __init__(self):
         self.provider = settings.TTS_PROVIDER
         self.output_dir = settings.AUDIO_OUTPUT_DIR
-        self.mock_mode = settings.MOCK_MODE
+        # local 后端本身不依赖外部服务，模拟模式下也生成真实文件，便于压测
+        self.mock_mode = settings.MOCK_MODE and self.provider != "local"
+        self.voice = settings.TTS_VOICE
+        self.cache = tts_cache
+        self.backend: TTSBackend = get_backend(
+            self.provider, self.voice, settings.TTS_API_KEY, settings.TTS_REGION
+        )
 
         os.makedirs(self.output_dir, exist_ok=True)
     
@@ -35,91 +49,149 @@ class TTSService:
             return self._mock_audio_url(text)
         
         try:
-            if self.provider == "edge":
-                return await self._edge_tts(text, session_id)
-            elif self.provider == "azure":
-                return await self._azure_tts(text, session_id)
-            elif self.provider == "aliyun":
-                return await self._aliyun_tts(text, session_id)
-            else:
-                return await self._edge_tts(text, session_id)  # 默认使用Edge
+            key = self.cache.make_key(self.backend.name, self.voice, text)
+            cached = self.cache.get(key)
+            if cached:
+                return cached
+            return await self._single_flight(key, lambda: self._synthesize(key, text))
+        except ImportError as e:
+            print(f"TTS后端依赖未安装({self.backend.name}): {e}")
+            return self._mock_audio_url(text)
         except Exception as e:
-            print(f"TTS生成失败: {e}")
+            print(f"TTS生成失败({self.backend.name}): {e}")
             return self._mock_audio_url(text)
-    
-    async def _edge_tts(self, text: str, session_id: str) -> str:
-        try:
-            import edge_tts
 
-            filename = self._generate_filename(text, session_id)
-            filename = filename.replace('.wav', '.mp3')
+    def cached_url(self, text: str) -> Optional[str]:
+        """已缓存的音频URL（确认文件仍在并刷新访问记录），未缓存或已被淘汰时返回 None，不触发合成"""
+        if not text:
+            return None
+        if self.mock_mode:
+            return self._mock_audio_url(text)
+        return self.cache.get(self.cache.make_key(self.backend.name, self.voice, text))
 
-            filepath = os.path.abspath(os.path.join(self.output_dir, filename))
-            filepath = filepath.replace('\\', '/')
+    async def prefetch(
+        self,
+        texts: Iterable[str],
+        session_id: str,
+        out: Dict[str, str],
+        concurrency: int = settings.TTS_PREFETCH_CONCURRENCY
+    ) -> Dict[str, str]:
+        """
+        后台批量预合成，限制并发数；每条完成后立即写入 out[text]，
+        调用方可以在全部完成前就使用已就绪的部分。合成失败的文本不写入。
+        """
+        sem = asyncio.Semaphore(max(1, concurrency))
 
-            if os.path.exists(filepath):
-                print(f"使用缓存音频: {filename}")
-                return f"/audio/{filename}"
+        async def one(text: str) -> None:
+            async with sem:
+                url = await self.text_to_speech(text=text, session_id=session_id)
+            if url and (self.mock_mode or not self.is_fallback_url(url)):
+                out[text] = url
 
-            voice = "zh-CN-XiaoxiaoNeural"  # 可选: XiaoyiNeural, YunxiNeural
-            communicate = edge_tts.Communicate(text, voice)
+        pending = [t for t in dict.fromkeys(texts) if t and t not in out]
+        await asyncio.gather(*[one(t) for t in pending], return_exceptions=True)
+        return out
+
+    async def _single_flight(self, key: str, synthesize: Callable[[], Awaitable[str]]) -> str:
+        """
+        同一 key 的并发请求只触发一次合成，其余等待同一个任务。
+
+        用 shield 等待：某个调用方被取消不会中断其他人正在等的合成。
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._register(key, synthesize())
+        return await asyncio.shield(task)
+
+    def _register(self, key: str, coro: Awaitable[str]) -> "asyncio.Future[str]":
+        task = asyncio.ensure_future(coro)
+        self._inflight[key] = task
+
+        def _release(t, k=key):
+            if self._inflight.get(k) is t:
+                del self._inflight[k]
+
+        task.add_done_callback(_release)
+        return task
+
+    async def stream_speech(self, text: str, session_id: str) -> AsyncIterator[bytes]:
+        """
+        流式合成：后端支持时音频分片一到就转发给调用方，同时写入缓存文件。
+
+        已缓存或已有同 key 合成在进行时直接读缓存文件。合成在独立任务中进行，
+        客户端中途断开也会写完缓存并唤醒其他等待者。不支持流式的后端
+        退化为先合成再整段读出。
+        """
+        if not text or self.mock_mode:
+            return
+
+        if not self.backend.streaming:
+            url = await self.text_to_speech(text=text, session_id=session_id)
+            if url and not self.is_fallback_url(url):
+                async for chunk in self._read_audio(url):
+                    yield chunk
+            return
+
+        key = self.cache.make_key(self.backend.name, self.voice, text)
+        url = self.cache.get(key)
+        if url is None and key in self._inflight:
+            url = await asyncio.shield(self._inflight[key])
+        if url is not None:
+            async for chunk in self._read_audio(url):
+                yield chunk
+            return
+
+        queue: "asyncio.Queue[Optional[bytes]]" = asyncio.Queue()
+        task = self._register(key, self._synthesize(key, text, sink=queue))
+        print(f"[TTS][STREAM] key={key[:12]} session={session_id}")
+        while True:
+            chunk = await queue.get()
+            if chunk is None:
+                break
+            yield chunk
+        await asyncio.shield(task)  # 合成失败时抛出，让调用方中止响应
+
+    async def _read_audio(self, url: str) -> AsyncIterator[bytes]:
+        with open(self.cache.path_for_url(url), "rb") as f:
+            while True:
+                chunk = f.read(_STREAM_READ_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
+    async def _synthesize(self, key: str, text: str,
+                          sink: Optional["asyncio.Queue[Optional[bytes]]"] = None) -> str:
+        """
+        调用后端合成到缓存；传入 sink 时每个音频分片同时放入队列，结束时放入 None
+        （仅流式后端）
+        """
+        backend = self.backend
+        filename, filepath = self.cache.prepare(key, backend.ext)
+        # 先写临时文件再原子改名，/audio 永远不会读到写了一半的音频
+        temp_path = self.cache.temp_path(filepath).replace('\\', '/')
 
-            await communicate.save(filepath)
-            print(f"Edge TTS生成音频: {filename}")
-            
-            return f"/audio/{filename}"
-            
-        except ImportError:
-            print("edge-tts未安装，请运行: pip install edge-tts")
-            return self._mock_audio_url(text)
-        except Exception as e:
-            print(f"Edge TTS失败: {e}")
-            return self._mock_audio_url(text)
-    
-    async def _azure_tts(self, text: str, session_id: str) -> str:
         try:
-            import azure.cognitiveservices.speech as speechsdk
-            
-            speech_config = speechsdk.SpeechConfig(
-                subscription=settings.TTS_API_KEY,
-                region=settings.TTS_REGION
-            )
-            speech_config.speech_synthesis_voice_name = settings.TTS_VOICE
-
-            filename = self._generate_filename(text, session_id)
-            filepath = os.path.join(self.output_dir, filename)
-            
-            audio_config = speechsdk.audio.AudioOutputConfig(filename=filepath)
-            synthesizer = speechsdk.SpeechSynthesizer(
-                speech_config=speech_config,
-                audio_config=audio_config
-            )
-            
-            result = synthesizer.speak_text_async(text).get()
-            
-            if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
-                return f"/audio/{filename}"
+            if sink is not None:
+                with open(temp_path, "wb") as f:
+                    async for chunk in backend.stream(text):
+                        f.write(chunk)
+                        sink.put_nowait(chunk)
             else:
-                return self._mock_audio_url(text)
-                
-        except Exception as e:
-            print(f"Azure TTS失败: {e}")
-            return self._mock_audio_url(text)
-    
-    async def _aliyun_tts(self, text: str, session_id: str) -> str:
+                await backend.synthesize(text, temp_path)
+            url = self.cache.commit(key, filename, temp_path)
+        except BaseException:
+            self.cache.discard(temp_path)
+            raise
+        finally:
+            if sink is not None:
+                sink.put_nowait(None)
+        print(f"TTS生成音频({backend.name}): {filename}")
+        return url
 
-        # TODO: 实现阿里云TTS
-        return self._mock_audio_url(text)
-    
     @staticmethod
-    def _generate_filename(text: str, session_id: str) -> str:
-        import re
-        hash_obj = hashlib.md5(f"{text}{session_id}".encode())
-        filename = f"{hash_obj.hexdigest()}.mp3"
-        # Windows文件名不能包含特殊字符
-        filename = re.sub(r'[<>:"/\\|?*]', '_', filename)
-        return filename
-    
+    def is_fallback_url(url: str) -> bool:
+        return url.startswith("/audio/mock_")
+
     @staticmethod
     def _mock_audio_url(text: str) -> str:
         hash_obj = hashlib.md5(text.encode())
@@ -0,0 +1,241 @@
+"""
+YOLO推理后端
+
+YOLOService 只依赖 "model(frames, imgsz=, conf=, ...) -> [结果]" 这一调用约定，
+每个结果带 boxes.data（行格式 x1, y1, x2, y2, conf, cls，原图像素坐标）。
+
+- ultralytics: 原有 PyTorch 路径
+- onnx:        ONNX Runtime（可选 OpenVINO 执行器），不依赖 torch，导入和单帧延迟都更低
+
+导出 / 量化:
+    python -m app.services.yolo_backends export weights/yolov8n.pt [--int8]
+"""
+from typing import Any, List, Sequence, Tuple
+import os
+import sys
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+
+class _Boxes:
+
+    __slots__ = ("data",)
+
+    def __init__(self, data: Any):
+        self.data = data
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+
+class Detections:
+    """与 ultralytics Results 兼容的最小结果对象（只提供 boxes.data）"""
+
+    __slots__ = ("boxes",)
+
+    def __init__(self, data: Any):
+        self.boxes = _Boxes(data)
+
+
+def letterbox(frame: Any, size: Tuple[int, int]) -> Tuple[Any, float, Tuple[float, float]]:
+    """
+    等比缩放到 size=(h, w) 内并用灰边 (114) 填充。
+
+    Returns:
+        (填充后的图像, 缩放比例, (左填充, 上填充))
+    """
+    from PIL import Image
+
+    h, w = frame.shape[:2]
+    th, tw = size
+    r = min(th / h, tw / w)
+    nh, nw = int(round(h * r)), int(round(w * r))
+    if (nh, nw) != (h, w):
+        frame = np.asarray(Image.fromarray(frame).resize((nw, nh), Image.BILINEAR))
+    top = (th - nh) // 2
+    left = (tw - nw) // 2
+    out = np.full((th, tw, 3), 114, dtype=np.uint8)
+    out[top:top + nh, left:left + nw] = frame
+    return out, r, (float(left), float(top))
+
+
+def nms(boxes: Any, scores: Any, iou: float) -> List[int]:
+    """单类 NMS（xyxy），返回保留的下标，按分数降序"""
+    order = scores.argsort()[::-1]
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    keep: List[int] = []
+    while order.size:
+        i = int(order[0])
+        keep.append(i)
+        rest = order[1:]
+        xx1 = np.maximum(boxes[i, 0], boxes[rest, 0])
+        yy1 = np.maximum(boxes[i, 1], boxes[rest, 1])
+        xx2 = np.minimum(boxes[i, 2], boxes[rest, 2])
+        yy2 = np.minimum(boxes[i, 3], boxes[rest, 3])
+        inter = np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+        ov = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[ov <= iou]
+    return keep
+
+
+def decode_yolov8(
+    pred: Any,
+    conf: float,
+    iou: float,
+    scale: float,
+    pad: Tuple[float, float],
+    shape: Tuple[int, int],
+    max_det: int = 300
+) -> Any:
+    """
+    YOLOv8 单张输出 (4 + 类别数, 锚点数) -> N x 6 [x1, y1, x2, y2, conf, cls]，
+    已映射回原图坐标。不同类别分别做 NMS（与 ultralytics 默认一致）。
+    """
+    pred = pred.T
+    cls_scores = pred[:, 4:]
+    cls = cls_scores.argmax(axis=1)
+    scores = cls_scores[np.arange(len(cls)), cls]
+    mask = scores >= conf
+    if not mask.any():
+        return np.zeros((0, 6), dtype=np.float32)
+
+    xywh, scores, cls = pred[mask, :4], scores[mask], cls[mask]
+    boxes = np.empty_like(xywh)
+    boxes[:, 0] = xywh[:, 0] - xywh[:, 2] / 2
+    boxes[:, 1] = xywh[:, 1] - xywh[:, 3] / 2
+    boxes[:, 2] = xywh[:, 0] + xywh[:, 2] / 2
+    boxes[:, 3] = xywh[:, 1] + xywh[:, 3] / 2
+
+    # 类别偏移技巧：不同类别的框平移到互不重叠的区域后一次 NMS
+    offset = cls[:, None].astype(boxes.dtype) * 4096.0
+    keep = nms(boxes + offset, scores, iou)[:max_det]
+    boxes, scores, cls = boxes[keep], scores[keep], cls[keep]
+
+    boxes[:, [0, 2]] = (boxes[:, [0, 2]] - pad[0]) / scale
+    boxes[:, [1, 3]] = (boxes[:, [1, 3]] - pad[1]) / scale
+    h, w = shape
+    boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, w)
+    boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, h)
+    return np.concatenate(
+        [boxes, scores[:, None], cls[:, None].astype(boxes.dtype)], axis=1
+    ).astype(np.float32)
+
+
+class OnnxYOLOBackend:
+    """
+    ONNX Runtime 推理（输入 BGR uint8 帧，与 ultralytics 的 ndarray 约定一致）。
+
+    InferenceSession.run 是线程安全的，多个推理线程共享同一个会话。
+    模型为固定 batch=1 导出时逐帧调用，动态 batch 时整批一次调用。
+    """
+
+    thread_safe = True
+
+    def __init__(
+        self,
+        path: str,
+        threads: int = 0,
+        providers: Sequence[str] = ("CPUExecutionProvider",),
+        iou: float = 0.7,
+        session: Any = None
+    ):
+        self.path = path
+        self.iou = iou
+        if session is None:
+            session = self._create_session(path, threads, providers)
+        self.session = session
+
+        inp = session.get_inputs()[0]
+        self.input_name = inp.name
+        shape = list(inp.shape)
+        self.dynamic_batch = not isinstance(shape[0], int)
+        # 导出时固定了输入尺寸则以模型为准，否则使用调用方传入的 imgsz
+        self.fixed_hw = (shape[2], shape[3]) if all(isinstance(d, int) for d in shape[2:4]) else None
+
+    @staticmethod
+    def _create_session(path: str, threads: int, providers: Sequence[str]) -> Any:
+        import onnxruntime as ort
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        if threads > 0:
+            opts.intra_op_num_threads = threads
+            opts.inter_op_num_threads = 1
+        available = set(ort.get_available_providers())
+        chosen = [p for p in providers if p in available] or ["CPUExecutionProvider"]
+        print(f"[YOLO][ONNX] providers={chosen} threads={threads or 'default'} path={path}")
+        return ort.InferenceSession(path, sess_options=opts, providers=chosen)
+
+    def __call__(self, source: Any, imgsz: int = 640, conf: float = 0.25, **kwargs: Any) -> List[Detections]:
+        frames = source if isinstance(source, list) else [source]
+        frames = [np.asarray(f) for f in frames]
+        size = self.fixed_hw or (imgsz, imgsz)
+
+        blobs, metas = [], []
+        for frame in frames:
+            img, r, pad = letterbox(frame, size)
+            # BGR HWC uint8 -> RGB CHW float32 [0, 1]
+            blobs.append(img[:, :, ::-1].transpose(2, 0, 1))
+            metas.append((r, pad, frame.shape[:2]))
+        batch = np.ascontiguousarray(np.stack(blobs), dtype=np.float32) / 255.0
+
+        if self.dynamic_batch:
+            preds = self.session.run(None, {self.input_name: batch})[0]
+        else:
+            preds = np.concatenate(
+                [self.session.run(None, {self.input_name: batch[i:i + 1]})[0] for i in range(len(frames))]
+            )
+
+        return [
+            Detections(decode_yolov8(pred, conf, self.iou, r, pad, shape))
+            for pred, (r, pad, shape) in zip(preds, metas)
+        ]
+
+
+def create_backend(kind: str, settings: Any) -> Tuple[Any, bool]:
+    """
+    按 YOLO_BACKEND 创建推理后端
+
+    Returns:
+        (model, thread_safe)；thread_safe=False 时每个推理线程需要各自的实例
+    """
+    if kind == "onnx":
+        providers = [p.strip() for p in settings.YOLO_ONNX_PROVIDERS.split(",") if p.strip()]
+        model = OnnxYOLOBackend(
+            settings.YOLO_ONNX_PATH,
+            threads=settings.YOLO_ONNX_THREADS,
+            providers=providers,
+            iou=settings.YOLO_IOU,
+        )
+        return model, True
+
+    from ultralytics import YOLO
+    return YOLO(settings.YOLO_MODEL_PATH), False
+
+
+def export_onnx(pt_path: str, imgsz: int = 640, int8: bool = False) -> str:
+    """用 ultralytics 导出动态 batch 的 ONNX；int8=True 时再做一次动态 INT8 量化"""
+    from ultralytics import YOLO
+
+    out = YOLO(pt_path).export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True)
+    out = str(out)
+    if int8:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        q_path = os.path.splitext(out)[0] + ".int8.onnx"
+        quantize_dynamic(out, q_path, weight_type=QuantType.QUInt8)
+        out = q_path
+    print(f"exported: {out}")
+    return out
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if len(args) >= 2 and args[0] == "export":
+        export_onnx(args[1], int8="--int8" in args)
+    else:
+        print("usage: python -m app.services.yolo_backends export <weights.pt> [--int8]")
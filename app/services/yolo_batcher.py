@@ -0,0 +1,157 @@
+"""
+YOLO跨请求动态批处理
+
+并发的感知请求各自把解码好的帧放入同一个队列，后台协程按
+"凑满 max_batch 或等满 max_wait" 取出一批，一次模型调用后把结果
+分发回各请求的 future。排队帧数超过 max_queue 时直接拒绝新请求。
+推理在 YOLOService 的线程池中执行，同时在途的批次数不超过其工作线程数。
+"""
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+from app.services.yolo_service import YOLOService
+import asyncio
+import time
+
+
+class InferenceOverloaded(Exception):
+    """推理队列已满，请求被丢弃（由路由转成 503）"""
+
+
+class YOLOBatcher:
+
+    def __init__(
+        self,
+        service: YOLOService,
+        max_batch: int = 8,
+        max_wait_ms: float = 10,
+        max_queue: int = 64
+    ):
+        self.service = service
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.max_queue = max(self.max_batch, max_queue)
+
+        self._queue: Deque[Tuple[Any, "asyncio.Future[Any]"]] = deque()
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.batches = 0
+        self.frames = 0
+        self.shed_requests = 0
+        self.shed_frames = 0
+        self.max_batch_seen = 0
+        self.last_infer_ms = 0.0
+        self.avg_infer_ms = 0.0
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    async def detect_batch(self, images_base64: List[str], session_id: Optional[str] = None) -> List[Dict]:
+        """与 YOLOService.detect_batch 相同的输入输出，推理经由共享批处理队列"""
+        return await self._detect(images_base64, self.service._decode_image, session_id)
+
+    async def detect_frames(self, buffers: List[Any], session_id: Optional[str] = None) -> List[Dict]:
+        return await self._detect(buffers, self.service._decode_bytes, session_id)
+
+    async def _detect(self, items: List[Any], decoder: Callable, session_id: Optional[str] = None) -> List[Dict]:
+        service = self.service
+        if not await service.ensure_model_async():
+            return service._mock_detection(len(items))
+
+        frames, metas = await service.decode_async(items, decoder)
+        detections = await service.dedup.run(session_id, [m.dhash for m in metas], frames, self._enqueue)
+        return service._build_results(len(items), metas, detections)
+
+    async def _enqueue(self, frames: List[Any]) -> List[Any]:
+        """帧入共享队列并等待各自的检测结果；队列已满时整请求拒绝"""
+        if not frames:
+            return []
+        if len(self._queue) + len(frames) > self.max_queue:
+            self.shed_requests += 1
+            self.shed_frames += len(frames)
+            raise InferenceOverloaded(f"inference queue full ({len(self._queue)}/{self.max_queue})")
+
+        loop = asyncio.get_running_loop()
+        futures = [loop.create_future() for _ in frames]
+        self._queue.extend(zip(frames, futures))
+        self._notify()
+        return list(await asyncio.gather(*futures))
+
+    def _notify(self) -> None:
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+        else:
+            self._wake.set()
+
+    async def _run(self) -> None:
+        """队列为空且没有在途批次时退出，下次有帧入队再启动"""
+        loop = asyncio.get_running_loop()
+        running: Set[asyncio.Task] = set()
+        try:
+            while self._queue or running:
+                if not self._queue or len(running) >= self.service.workers:
+                    # 等一个批次完成空出推理线程，或有新帧入队
+                    self._wake.clear()
+                    waiter = asyncio.ensure_future(self._wake.wait())
+                    done, _ = await asyncio.wait(running | {waiter}, return_when=asyncio.FIRST_COMPLETED)
+                    waiter.cancel()
+                    running -= done
+                    continue
+
+                # 第一帧到达后最多再等 max_wait，凑满一批立即开始
+                deadline = loop.time() + self.max_wait
+                while len(self._queue) < self.max_batch:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    self._wake.clear()
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+
+                batch = []
+                while self._queue and len(batch) < self.max_batch:
+                    frame, fut = self._queue.popleft()
+                    if not fut.done():  # 调用方已取消的帧不再推理
+                        batch.append((frame, fut))
+                if batch:
+                    running.add(asyncio.create_task(self._run_batch(batch)))
+        finally:
+            self._task = None
+
+    async def _run_batch(self, batch: List[Tuple[Any, "asyncio.Future[Any]"]]) -> None:
+        t0 = time.perf_counter()
+        try:
+            detections = await self.service.infer_async([frame for frame, _ in batch])
+        except Exception as e:
+            print(f"[YOLO_BATCH][ERROR] size={len(batch)} err={e}")
+            detections = [None] * len(batch)
+        dt = (time.perf_counter() - t0) * 1000
+
+        for (_, fut), det in zip(batch, detections):
+            if not fut.done():
+                fut.set_result(det)
+
+        self.batches += 1
+        self.frames += len(batch)
+        self.max_batch_seen = max(self.max_batch_seen, len(batch))
+        self.last_infer_ms = dt
+        self.avg_infer_ms = dt if self.batches == 1 else self.avg_infer_ms * 0.9 + dt * 0.1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "maxBatch": self.max_batch,
+            "maxWaitMs": self.max_wait * 1000,
+            "maxQueue": self.max_queue,
+            "queueDepth": len(self._queue),
+            "batches": self.batches,
+            "frames": self.frames,
+            "avgBatchSize": round(self.frames / self.batches, 2) if self.batches else 0.0,
+            "maxBatchSeen": self.max_batch_seen,
+            "lastInferMs": round(self.last_infer_ms, 3),
+            "avgInferMs": round(self.avg_infer_ms, 3),
+            "shedRequests": self.shed_requests,
+            "shedFrames": self.shed_frames,
+        }
@@ -1,9 +1,11 @@
 """
 YOLO视觉识别服务
 """
-from typing import List, Dict
+from typing import Any, Callable, List, Dict, Optional, Tuple
 from config.settings import settings
 from app.models.schemas import ObstacleInfo
+from app.services.yolo_backends import create_backend
+from app.services.frame_dedup import FrameDeduper, dhash
 import base64
 import io
 import sys
@@ -12,8 +14,11 @@ try:
 except Exception:
     np = None
 from PIL import Image
-import tempfile
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import os
+import threading
+import time
 from pathlib import Path
 import urllib.request
 
@@ -23,6 +28,50 @@ if sys.platform == 'win32' and hasattr(sys.stdout, 'buffer'):
     sys.stderr = codecs.getwriter('utf-8')(sys.stderr.buffer, 'strict')
 
 
+LEGACY_FRAME_SIZE = (640, 480)
+
+
+class FrameMeta:
+    """送入模型的帧信息：原请求中的图片下标、帧尺寸、原图 / 帧的缩放比例、去重用的 dHash"""
+
+    __slots__ = ("index", "width", "height", "scale", "dhash")
+
+    def __init__(self, index: int, width: int, height: int, scale: float, dhash: Optional[int] = None):
+        self.index = index
+        self.width = width
+        self.height = height
+        self.scale = scale
+        self.dhash = dhash
+
+
+class MemoryViewFile(io.RawIOBase):
+    """只读、可 seek 的内存视图文件对象：解码器按需读取，不先复制整帧"""
+
+    def __init__(self, buf: Any):
+        self._buf = memoryview(buf).cast("B")
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: len(self._buf)}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def readinto(self, b: Any) -> int:
+        n = max(0, min(len(b), len(self._buf) - self._pos))
+        b[:n] = self._buf[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+
 class YOLOService:
 
     def __init__(self):
@@ -30,10 +79,37 @@ class YOLOService:
         self.confidence = settings.YOLO_CONFIDENCE
         self.device = settings.YOLO_DEVICE
         self.mock_mode = settings.MOCK_MODE
+        self.backend = settings.YOLO_BACKEND
         self.model = None
+        self._model_thread_safe = False
         self._device_auto: str = ""
         self._fail_streak: int = 0
 
+        # 推理在独立线程池中执行，不阻塞事件循环。ultralytics 的预测器不是线程安全的，
+        # 第一个工作线程复用 self.model，其余线程各自加载一份模型；ONNX 会话则全部共享
+        self.workers = max(1, settings.YOLO_WORKERS)
+        self.torch_threads = settings.YOLO_TORCH_THREADS
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="yolo")
+        self._local = threading.local()
+        self._model_lock = threading.Lock()
+        self._primary_claimed = False
+        # 懒加载用的协程锁，绑定创建它的事件循环
+        self._load_lock: Optional[asyncio.Lock] = None
+        self._load_lock_loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self.imgsz = settings.YOLO_IMGSZ
+        # idle -> warming -> ready / failed；未开启预加载时首个请求再懒加载，视为就绪。
+        # 未配置 MOCK_MODE 而模型加载失败（退回模拟模式）时为 failed，实例不应接流量
+        self.state = "ready" if (self.mock_mode or not settings.YOLO_PRELOAD) else "idle"
+        self.warmup_ms = 0.0
+
+        self.dedup = FrameDeduper(
+            enabled=settings.YOLO_DEDUP,
+            threshold=settings.YOLO_DEDUP_THRESHOLD,
+            ttl_ms=settings.YOLO_DEDUP_TTL_MS,
+            history=settings.YOLO_DEDUP_HISTORY,
+        )
+
     def _weights_path(self) -> str:
         return self.model_path
 
@@ -60,6 +136,18 @@ class YOLOService:
     def _load_model(self):
 
         try:
+            if self.backend == "onnx":
+                # ONNX Runtime 路径不导入 torch / ultralytics
+                if not Path(settings.YOLO_ONNX_PATH).exists():
+                    raise RuntimeError(
+                        f"onnx model not found: {settings.YOLO_ONNX_PATH} "
+                        f"(python -m app.services.yolo_backends export {self.model_path})"
+                    )
+                self._device_auto = "cpu"
+                self.model, self._model_thread_safe = create_backend("onnx", settings)
+                print(f"YOLO模型加载成功(onnx): {settings.YOLO_ONNX_PATH}")
+                return
+
             if not self._ensure_weights():
                 raise RuntimeError("weights not available")
 
@@ -75,91 +163,264 @@ class YOLOService:
             else:
                 self._device_auto = auto_dev
 
-            from ultralytics import YOLO
-            self.model = YOLO(self.model_path)
+            self.model, self._model_thread_safe = create_backend("ultralytics", settings)
             print(f"YOLO模型加载成功: {self.model_path}  device={self._device_auto}")
         except Exception as e:
             print(f"YOLO模型加载失败: {e}")
             print("将使用模拟模式")
             self.mock_mode = True
             self.model = None
-    
-    async def detect_batch(self, images_base64: List[str]) -> List[Dict]:
 
+    def ensure_model(self) -> bool:
+        """需要时加载模型，返回是否使用真实模型（False 表示模拟模式）"""
         if (not self.mock_mode) and (self.model is None):
             self._load_model()
-
-        if self.mock_mode:
-            return self._mock_detection(len(images_base64))
-
-        results: List[Dict] = []
-        any_infer_ok: bool = False
-
-        for idx, img_b64 in enumerate(images_base64, 1):
-            temp_file = None
+        return not self.mock_mode
+
+    async def ensure_model_async(self) -> bool:
+        """
+        与 ensure_model 相同，但加载放到线程中执行，不阻塞事件循环；
+        并发请求在锁上等待同一次加载，模型只加载一次
+        """
+        if self.mock_mode or self.model is not None:
+            return not self.mock_mode
+        loop = asyncio.get_running_loop()
+        if self._load_lock is None or self._load_lock_loop is not loop:
+            self._load_lock = asyncio.Lock()
+            self._load_lock_loop = loop
+        async with self._load_lock:
+            await asyncio.to_thread(self.ensure_model)
+        return not self.mock_mode
+
+    async def detect_batch(self, images_base64: List[str], session_id: Optional[str] = None) -> List[Dict]:
+        """session_id 不为空时按会话做帧去重，近似重复的帧复用最近的检测结果"""
+        return await self._detect(images_base64, self._decode_image, session_id)
+
+    async def detect_frames(self, buffers: List[Any], session_id: Optional[str] = None) -> List[Dict]:
+        """与 detect_batch 相同，输入为原始图片字节（bytes / memoryview）"""
+        return await self._detect(buffers, self._decode_bytes, session_id)
+
+    async def _detect(self, items: List[Any], decoder: Callable, session_id: Optional[str] = None) -> List[Dict]:
+        if not await self.ensure_model_async():
+            return self._mock_detection(len(items))
+
+        frames, metas = await self.decode_async(items, decoder)
+        detections = await self.dedup.run(session_id, [m.dhash for m in metas], frames, self.infer_async)
+        return self._build_results(len(items), metas, detections)
+
+    async def decode_async(self, items: List[Any], decoder: Optional[Callable] = None) -> Tuple[List[Any], List[FrameMeta]]:
+        """图片解码放到默认线程池（PIL 解码时会释放 GIL）"""
+        return await asyncio.to_thread(self._decode_all, items, decoder)
+
+    async def infer_async(self, frames: List[Any]) -> List[Any]:
+        """在推理线程池中执行一次模型调用"""
+        if not frames:
+            return []
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._infer, frames)
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    async def warmup(self) -> None:
+        """
+        加载模型（必要时下载权重），并在每个推理线程上用空白帧跑一次推理，
+        让各线程的模型副本与首次推理的初始化都在接流量之前完成。
+        """
+        if self.state != "idle":
+            return
+        self.state = "warming"
+        t0 = time.perf_counter()
+        failed = False
+        try:
+            if await self.ensure_model_async():
+                loop = asyncio.get_running_loop()
+                barrier = threading.Barrier(self.workers)
+                await asyncio.gather(*[
+                    loop.run_in_executor(self._executor, self._warmup_worker, barrier)
+                    for _ in range(self.workers)
+                ])
+        except Exception as e:
+            print(f"[YOLO][WARMUP] failed: {e}")
+            failed = True
+        self.warmup_ms = (time.perf_counter() - t0) * 1000
+        if self.mock_mode and not settings.MOCK_MODE:
+            failed = True
+        self.state = "failed" if failed else "ready"
+        print(f"[YOLO][WARMUP] {self.state} in {self.warmup_ms:.0f}ms workers={self.workers} mock={self.mock_mode}")
+
+    def _warmup_worker(self, barrier: threading.Barrier) -> None:
+        # 每个线程各领一个任务：先到的线程在 barrier 处等其余线程
+        try:
+            barrier.wait(timeout=60)
+        except threading.BrokenBarrierError:
+            pass
+        h = self.imgsz * 3 // 4
+        frame = np.zeros((h, self.imgsz, 3), dtype=np.uint8) if np is not None else Image.new("RGB", (self.imgsz, h))
+        self._infer([frame])
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _thread_model(self) -> Any:
+        if self._model_thread_safe:
+            return self.model
+        model = getattr(self._local, "model", None)
+        if model is None:
+            with self._model_lock:
+                if not self._primary_claimed:
+                    self._primary_claimed = True
+                    model = self.model
+                else:
+                    model, _ = create_backend(self.backend, settings)
+                    print(f"[YOLO] worker {threading.current_thread().name} loaded its own model")
+            self._local.model = model
+            self._apply_torch_threads()
+        return model
+
+    def _apply_torch_threads(self) -> None:
+        """在推理线程内设置 torch 算子内线程数；总并行度约为 workers * torch_threads"""
+        if self.torch_threads <= 0:
+            return
+        try:
+            import torch
+            torch.set_num_threads(self.torch_threads)
+        except Exception:
+            pass
+
+    def _decode_all(self, items: List[Any], decoder: Optional[Callable] = None) -> Tuple[List[Any], List[FrameMeta]]:
+        """解码全部图片，返回 (帧, 帧信息)；解码失败的图片跳过，不影响其余图片"""
+        decoder = decoder or self._decode_image
+        frames: List[Any] = []
+        metas: List[FrameMeta] = []
+        for idx, item in enumerate(items):
             try:
-                b64 = (img_b64 or "").strip()
-
-                if b64.startswith("data:") and "," in b64:
-                    b64 = b64.split(",", 1)[1].strip()
-
-                pad = (-len(b64)) % 4
-                if pad:
-                    b64 = b64 + ("=" * pad)
-
-                img_data = base64.b64decode(b64)
-
-                image = Image.open(io.BytesIO(img_data))
-                image.load()
+                frame, meta = decoder(item, idx)
+                frames.append(frame)
+                metas.append(meta)
+            except Exception as e:
+                print(f"图片 {idx + 1} 解码失败: {e}")
+        return frames, metas
 
-                if image.mode != "RGB":
-                    image = image.convert("RGB")
+    def _build_results(self, count: int, metas: List[FrameMeta], detections: List[Any]) -> List[Dict]:
+        results: List[Dict] = [{"obstacles": []} for _ in range(count)]
+        any_infer_ok: bool = False
 
-                temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".jpg")
-                image.save(temp_file.name, "JPEG")
-                temp_file.close()
+        for meta, det in zip(metas, detections):
+            if det is None:
+                continue
+            obstacles = self._to_obstacles(det, meta)
+            results[meta.index] = {"obstacles": obstacles}
+            any_infer_ok = True
+            print(f"图片 {meta.index + 1} 检测完成: 发现 {len(obstacles)} 个对象")
 
-                detections = self.model(
-                    temp_file.name,
-                    conf=self.confidence,
-                    device=(getattr(self, "_device_auto", "") or None),
-                    verbose=False
-                )[0]
+        if not any_infer_ok:
+            print("本轮 3 张均推理失败 -> fallback mock_detection(本轮)")
+            return self._mock_detection(count)
 
-                obstacles = []
-                if hasattr(detections, "boxes") and len(detections.boxes) > 0:
-                    for det in detections.boxes.data:
-                        x1, y1, x2, y2, conf, cls = det
-                        obstacles.append({
-                            "class": int(cls),
-                            "confidence": float(conf),
-                            "bbox": [float(x1), float(y1), float(x2), float(y2)]
-                        })
+        return results
 
-                results.append({"obstacles": obstacles})
-                any_infer_ok = True
-                print(f"图片 {idx} 检测完成: 发现 {len(obstacles)} 个对象")
+    def _infer(self, frames: List[Any]) -> List[Optional[List[Tuple[float, ...]]]]:
+        """
+        一次模型调用处理一个请求的全部图片，返回与 frames 一一对应的检测框行
+        (x1, y1, x2, y2, conf, cls)。只保留框数据，不持有 Results（其 orig_img 为整帧），
+        去重缓存与批处理队列里因此只有几十字节的元组。
+        整批失败时逐张重试，定位出错的那张，其余图片照常返回；失败的位置为 None。
+        """
+        if not frames:
+            return []
+        model = self._thread_model()
+        kwargs = dict(
+            imgsz=self.imgsz,
+            conf=self.confidence,
+            device=(getattr(self, "_device_auto", "") or None),
+            verbose=False
+        )
+        try:
+            out = list(model(frames, **kwargs))
+            if len(out) == len(frames):
+                return [self._box_rows(r) for r in out]
+            print(f"批量推理结果数量不符: {len(out)} != {len(frames)}，改为逐张推理")
+        except Exception as e:
+            print(f"批量推理失败，改为逐张推理: {e}")
 
+        out = []
+        for i, frame in enumerate(frames, 1):
+            try:
+                out.append(self._box_rows(model(frame, **kwargs)[0]))
             except Exception as e:
-                print(f"图片 {idx} 检测失败: {e}")
+                print(f"图片 {i} 检测失败: {e}")
                 import traceback
                 traceback.print_exc()
-                results.append({"obstacles": []})
-
-            finally:
-                if temp_file and os.path.exists(temp_file.name):
-                    try:
-                        os.unlink(temp_file.name)
-                    except Exception:
-                        pass
+                out.append(None)
+        return out
+
+    def _decode_image(self, img_b64: str, index: int = 0) -> Tuple[Any, FrameMeta]:
+        b64 = (img_b64 or "").strip()
+
+        if b64.startswith("data:") and "," in b64:
+            b64 = b64.split(",", 1)[1].strip()
+
+        pad = (-len(b64)) % 4
+        if pad:
+            b64 = b64 + ("=" * pad)
+
+        return self._decode_bytes(base64.b64decode(b64), index)
+
+    def _decode_bytes(self, img_data: Any, index: int = 0) -> Tuple[Any, FrameMeta]:
+        """
+        图片字节 -> 内存中的帧，直接交给模型，不落盘、不重新编码。
+
+        JPEG 用 draft 模式在解码阶段按 1/2、1/4、1/8 缩小，再一次性缩放到
+        最长边 = imgsz（不放大），之后模型侧的 letterbox 只需填充不再缩放。
+        有 numpy 时返回 HWC uint8 BGR 数组（ultralytics 对 ndarray 的约定），
+        否则返回 RGB 的 PIL 图像（ultralytics 同样接受）。
+        """
+        fp = io.BytesIO(img_data) if isinstance(img_data, bytes) else MemoryViewFile(img_data)
+        image = Image.open(fp)
+        orig_w, orig_h = image.size
+        r = min(1.0, self.imgsz / max(orig_w, orig_h))
+        target = (max(1, round(orig_w * r)), max(1, round(orig_h * r)))
+        if r < 1.0:
+            image.draft("RGB", target)  # 仅对 JPEG 生效，其余格式忽略
+        image.load()
+
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        if image.size != target:
+            image = image.resize(target, Image.BILINEAR)
+
+        meta = FrameMeta(index, target[0], target[1], orig_w / target[0])
+        if self.dedup.enabled:
+            meta.dhash = dhash(image)
+        if np is None:
+            return image, meta
+        return np.ascontiguousarray(np.asarray(image)[:, :, ::-1]), meta
 
-        if not any_infer_ok:
-            print("本轮 3 张均推理失败 -> fallback mock_detection(本轮)")
-            return self._mock_detection(len(images_base64))
+    @staticmethod
+    def _box_rows(result: Any) -> List[Tuple[float, ...]]:
+        """模型结果 -> [(x1, y1, x2, y2, conf, cls)]（帧像素坐标）"""
+        if not hasattr(result, "boxes") or len(result.boxes) == 0:
+            return []
+        return [tuple(float(v) for v in det[:6]) for det in result.boxes.data]
 
-        return results
+    @staticmethod
+    def _to_obstacles(rows: List[Tuple[float, ...]], meta: FrameMeta) -> List[Dict]:
+        """
+        bbox:     原图像素坐标
+        bboxNorm: 相对送入模型的帧归一化到 [0, 1]，距离 / 方位按它计算，与上传分辨率无关
+        """
+        obstacles = []
+        for x1, y1, x2, y2, conf, cls in rows:
+            obstacles.append({
+                "class": int(cls),
+                "confidence": conf,
+                "bbox": [v * meta.scale for v in (x1, y1, x2, y2)],
+                "bboxNorm": [x1 / meta.width, y1 / meta.height, x2 / meta.width, y2 / meta.height]
+            })
+        return obstacles
 
-    
     def _mock_detection(self, count: int) -> List[Dict]:
         return [
             {
@@ -179,22 +440,31 @@ class YOLOService:
             for _ in range(count)
         ]
     
-    def aggregate_obstacles(self, detections: List[Dict]) -> List[ObstacleInfo]:
-
-        all_obs: List[ObstacleInfo] = []
+    def observe(self, detections: List[Dict]) -> List[List[Tuple[ObstacleInfo, List[float]]]]:
+        """检测结果 -> 每帧一组 (障碍物, 归一化 bbox)，未去重；供 aggregate_obstacles 与障碍物跟踪使用"""
+        frames: List[List[Tuple[ObstacleInfo, List[float]]]] = []
 
         for detection in detections:
+            observations: List[Tuple[ObstacleInfo, List[float]]] = []
+            frames.append(observations)
             for obs in detection.get("obstacles", []):
                 obstacle_type = self._map_class_to_type(obs["class"])
-                distance = self._estimate_distance(obs["bbox"])
-                direction = self._estimate_direction(obs["bbox"])
+                bbox = obs.get("bboxNorm") or self._normalize_bbox(obs["bbox"])
+                distance = self._estimate_distance(bbox)
+                direction = self._estimate_direction(bbox)
 
-                all_obs.append(ObstacleInfo(
+                observations.append((ObstacleInfo(
                     type=obstacle_type,
                     distance=distance,
                     direction=direction,
                     confidence=obs["confidence"]
-                ))
+                ), bbox))
+
+        return frames
+
+    def aggregate_obstacles(self, detections: List[Dict]) -> List[ObstacleInfo]:
+
+        all_obs = [o for frame in self.observe(detections) for o, _ in frame]
 
         dedup = {}
         for o in all_obs:
@@ -220,25 +490,30 @@ class YOLOService:
         return mapping.get(class_id, "obstacle")
     
     @staticmethod
-    def _estimate_distance(bbox: List[float]) -> float:
-
+    def _normalize_bbox(bbox: List[float], size: Tuple[int, int] = LEGACY_FRAME_SIZE) -> List[float]:
+        """没有 bboxNorm 的旧格式检测结果按 640x480 画面归一化"""
+        w, h = size
         x1, y1, x2, y2 = bbox
-        area = (x2 - x1) * (y2 - y1)
+        return [x1 / w, y1 / h, x2 / w, y2 / h]
 
-        norm_area = area / (640 * 480)
+    @staticmethod
+    def _estimate_distance(bbox: List[float]) -> float:
+        """bbox 为归一化坐标；面积占比越大越近"""
+        x1, y1, x2, y2 = bbox
+        norm_area = (x2 - x1) * (y2 - y1)
 
         distance = 10 / (norm_area * 100 + 0.1)
         return round(distance, 1)
-    
+
     @staticmethod
     def _estimate_direction(bbox: List[float]) -> str:
-
+        """bbox 为归一化坐标；画面横向三等分"""
         x1, y1, x2, y2 = bbox
         center_x = (x1 + x2) / 2
 
-        if center_x < 213:
+        if center_x < 1 / 3:
             return "左前方"
-        elif center_x > 427:
+        elif center_x > 2 / 3:
             return "右前方"
         else:
             return "正前方"
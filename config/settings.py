@@ -2,7 +2,7 @@
 系统配置管理
 """
 import os
-from pydantic import Field
+from pydantic import Field, field_validator
 from pydantic_settings import BaseSettings
 from functools import lru_cache
 
@@ -32,22 +32,71 @@ class Settings(BaseSettings):
 
     YOLO_CONFIDENCE: float = float(os.getenv("YOLO_CONFIDENCE", "0.5"))
     YOLO_DEVICE: str = os.getenv("YOLO_DEVICE", "cpu")
+    YOLO_BACKEND: str = os.getenv("YOLO_BACKEND", "ultralytics")  # ultralytics / onnx
+    YOLO_ONNX_PATH: str = os.getenv("YOLO_ONNX_PATH", "weights/yolov8n.onnx")  # 可指向 INT8 量化模型
+    YOLO_ONNX_THREADS: int = int(os.getenv("YOLO_ONNX_THREADS", "0"))  # 每个会话的算子内线程数，0 为默认
+    YOLO_ONNX_PROVIDERS: str = os.getenv("YOLO_ONNX_PROVIDERS", "CPUExecutionProvider")  # 逗号分隔，如 OpenVINOExecutionProvider,CPUExecutionProvider
+    YOLO_IOU: float = float(os.getenv("YOLO_IOU", "0.7"))  # ONNX 后端 NMS 阈值（与 ultralytics 默认一致）
+    YOLO_IMGSZ: int = int(os.getenv("YOLO_IMGSZ", "640"))  # 推理输入尺寸
+    YOLO_PRELOAD: bool = os.getenv("YOLO_PRELOAD", "False") == "True"  # 启动时预加载并预热模型，完成前 /ready 返回 503
+    YOLO_WORKERS: int = int(os.getenv("YOLO_WORKERS", "1"))  # 推理线程数（每个线程一份模型）
+    YOLO_TORCH_THREADS: int = int(os.getenv("YOLO_TORCH_THREADS", "0"))  # torch 算子内线程数，0 为 torch 默认
+    YOLO_MICRO_BATCH: bool = os.getenv("YOLO_MICRO_BATCH", "True") == "True"  # 跨请求合批推理
+    YOLO_MAX_BATCH: int = int(os.getenv("YOLO_MAX_BATCH", "8"))  # 每次模型调用最多帧数
+    YOLO_MAX_WAIT_MS: float = float(os.getenv("YOLO_MAX_WAIT_MS", "10"))  # 凑批最长等待
+    YOLO_MAX_QUEUE: int = int(os.getenv("YOLO_MAX_QUEUE", "64"))  # 排队帧数上限，超出返回 503
+    YOLO_DEDUP: bool = os.getenv("YOLO_DEDUP", "True") == "True"  # 按会话跳过近似重复帧的推理
+    YOLO_DEDUP_THRESHOLD: int = int(os.getenv("YOLO_DEDUP_THRESHOLD", "5"))  # dHash 汉明距离阈值（0-64）
+    YOLO_DEDUP_TTL_MS: float = float(os.getenv("YOLO_DEDUP_TTL_MS", "2000"))  # 复用检测结果的有效期
+    YOLO_DEDUP_HISTORY: int = int(os.getenv("YOLO_DEDUP_HISTORY", "8"))  # 每会话保留的已推理帧数
+    PERCEPTION_MAX_FRAME_BYTES: int = int(os.getenv("PERCEPTION_MAX_FRAME_BYTES", str(4 * 1024 * 1024)))  # 二进制上传单帧上限
+    PERCEPTION_GUIDANCE_TIMEOUT_MS: int = int(os.getenv("PERCEPTION_GUIDANCE_TIMEOUT_MS", "1500"))  # 响应等待LLM指路的上限
+    PERCEPTION_TTS_TIMEOUT_MS: int = int(os.getenv("PERCEPTION_TTS_TIMEOUT_MS", "800"))  # 响应等待提醒语音的上限
+    PERCEPTION_UPLOAD_INTERVAL_MS: int = int(os.getenv("PERCEPTION_UPLOAD_INTERVAL_MS", "3000"))  # 客户端感知上传的预期间隔（最慢的客户端）
     
     # TTS配置
     TTS_PROVIDER: str = Field(default="mock", env="TTS_PROVIDER")
     TTS_API_KEY: str = os.getenv("TTS_API_KEY", "")
     TTS_REGION: str = os.getenv("TTS_REGION", "eastus")
     TTS_VOICE: str = os.getenv("TTS_VOICE", "zh-CN-XiaoxiaoNeural")
+    TTS_CACHE_MAX_MB: int = int(os.getenv("TTS_CACHE_MAX_MB", "2048"))  # 音频缓存总大小上限，0 为不限
+    TTS_CACHE_MAX_FILES: int = int(os.getenv("TTS_CACHE_MAX_FILES", "50000"))  # 音频文件数上限，0 为不限
+    TTS_CACHE_MAX_AGE_HOURS: int = int(os.getenv("TTS_CACHE_MAX_AGE_HOURS", "720"))  # 超过该时长未访问则淘汰，0 为不限
+    TTS_CACHE_COMPACT_INTERVAL: int = int(os.getenv("TTS_CACHE_COMPACT_INTERVAL", "300"))  # 后台压缩周期（秒）
+    TTS_PREFETCH_CONCURRENCY: int = int(os.getenv("TTS_PREFETCH_CONCURRENCY", "4"))  # 路线指令预合成并发数
+    
+    # 外部HTTP调用（共享连接池）
+    HTTP2: bool = os.getenv("HTTP2", "True") == "True"  # 需要安装 h2，未安装时自动使用 HTTP/1.1
+    HTTP_MAX_CONNECTIONS: int = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+    HTTP_MAX_KEEPALIVE: int = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+    HTTP_KEEPALIVE_EXPIRY: float = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))  # 空闲连接保留秒数
+    HTTP_TIMEOUT: float = float(os.getenv("HTTP_TIMEOUT", "10"))  # 默认超时（秒）
+    AMAP_ROUTE_TIMEOUT: float = float(os.getenv("AMAP_ROUTE_TIMEOUT", "8"))  # 步行路径规划超时（秒）
+    AMAP_POI_TIMEOUT: float = float(os.getenv("AMAP_POI_TIMEOUT", "5"))  # POI 搜索超时（秒）
     
     # Redis配置（可选）
     REDIS_HOST: str = os.getenv("REDIS_HOST", "localhost")
     REDIS_PORT: int = int(os.getenv("REDIS_PORT", "6379"))
     REDIS_DB: int = int(os.getenv("REDIS_DB", "0"))
+    REDIS_SOCKET_TIMEOUT: float = float(os.getenv("REDIS_SOCKET_TIMEOUT", "0.5"))  # 秒，超时即退回本地缓存
+    REDIS_CONNECT_TIMEOUT: float = float(os.getenv("REDIS_CONNECT_TIMEOUT", "0.5"))  # 秒
+    
+    # 路线规划缓存
+    ROUTE_CACHE_GRID_M: float = float(os.getenv("ROUTE_CACHE_GRID_M", "10"))  # 起终点量化网格（米）
+    ROUTE_CACHE_TTL: int = int(os.getenv("ROUTE_CACHE_TTL", "600"))  # 秒
+    ROUTE_CACHE_MAX_ENTRIES: int = int(os.getenv("ROUTE_CACHE_MAX_ENTRIES", "1000"))
+    ROUTE_CACHE_REDIS: bool = os.getenv("ROUTE_CACHE_REDIS", "False") == "True"  # 额外使用 Redis 作为共享缓存层
     
     # 导航参数
     NAV_UPDATE_INTERVAL: int = int(os.getenv("NAV_UPDATE_INTERVAL", "5"))  # 秒
     NAV_DEVIATION_THRESHOLD: int = int(os.getenv("NAV_DEVIATION_THRESHOLD", "20"))  # 米
     NAV_ARRIVAL_THRESHOLD: int = int(os.getenv("NAV_ARRIVAL_THRESHOLD", "10"))  # 米
+    NAV_MATCH_WINDOW: int = int(os.getenv("NAV_MATCH_WINDOW", "40"))  # 地图匹配游标窗口（线段数）
+    NAV_ENGINE_MODE: str = os.getenv("NAV_ENGINE_MODE", "event")  # event: 定位事件驱动 / batch: 集中批量调度
+    NAV_TICK_INTERVAL_MS: int = int(os.getenv("NAV_TICK_INTERVAL_MS", "1000"))  # batch 模式调度周期
+    NAV_OBSTACLE_TRACKING: bool = os.getenv("NAV_OBSTACLE_TRACKING", "True") == "True"  # 跨批次跟踪障碍物，只提醒新出现 / 接近的
+    NAV_OBSTACLE_APPROACH_M: float = float(os.getenv("NAV_OBSTACLE_APPROACH_M", "1.0"))  # 距上次提醒又接近多少米再次提醒
+    NAV_OBSTACLE_MAX_AGE_MS: int = int(os.getenv("NAV_OBSTACLE_MAX_AGE_MS", "0"))  # 轨迹多久未出现即丢弃，0 为按感知上传间隔的 3 倍
     
     # WebSocket配置
     WS_HEARTBEAT_INTERVAL: int = int(os.getenv("WS_HEARTBEAT_INTERVAL", "30"))  # 秒
@@ -57,6 +106,13 @@ class Settings(BaseSettings):
     AUDIO_OUTPUT_DIR: str = os.getenv("AUDIO_OUTPUT_DIR", "./audio_output")
     ROUTE_OUTPUT_DIR: str = os.getenv("ROUTE_OUTPUT_DIR", "./route_output")
     
+    @field_validator("TTS_PROVIDER")
+    @classmethod
+    def _check_tts_provider(cls, v: str) -> str:
+        if v == "aliyun":
+            raise ValueError("TTS_PROVIDER=aliyun 尚未实现，请使用 edge / azure / local / mock")
+        return v
+
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -1,6 +1,7 @@
 """
 无障碍老年人导航后端系统 - 主程序入口
 """
+import asyncio
 import time
 import uvicorn
 from fastapi import FastAPI, Request
@@ -11,6 +12,9 @@ from contextlib import asynccontextmanager
 from config.settings import settings
 from app.api import voice_routes, nav_routes
 from app.core.session_manager import session_manager
+from app.core.http_client import http_client
+from app.services.route_cache import route_cache
+from app.services.tts_cache import tts_cache
 from fastapi import Request
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
@@ -23,9 +27,23 @@ async def lifespan(app: FastAPI):
     print("系统启动中...")
     print(f"运行模式: {'模拟模式' if settings.MOCK_MODE else '生产模式'}")
     print(f"调试模式: {settings.DEBUG}")
+    if settings.NAV_ENGINE_MODE == "batch":
+        nav_routes.nav_scheduler.start()
+    loaded = await asyncio.to_thread(tts_cache.load)
+    print(f"TTS音频缓存: {loaded} 个文件")
+    tts_cache.start_compaction()
+    await http_client.start()
+    # 预热放在后台，/health 立即可用，/ready 在预热完成后才返回 200
+    warmup_task = asyncio.create_task(nav_routes.yolo_service.warmup())
     yield
 
     print("系统关闭中...")
+    await nav_routes.nav_scheduler.stop()
+    warmup_task.cancel()
+    await tts_cache.stop_compaction()
+    await http_client.close()
+    await route_cache.close()
+    nav_routes.yolo_service.shutdown()
     session_manager.clear_all()
 
 
@@ -80,6 +98,21 @@ async def health_check():
     }
 
 
+@app.get("/ready")
+async def readiness_check():
+    """就绪探针：模型预热完成前或加载失败时返回 503，负载均衡只把流量导向已预热的实例"""
+    yolo = nav_routes.yolo_service
+    body = {
+        "ready": yolo.ready,
+        "yolo": {
+            "state": yolo.state,
+            "mock": yolo.mock_mode,
+            "warmupMs": round(yolo.warmup_ms, 1),
+        },
+    }
+    return JSONResponse(status_code=200 if yolo.ready else 503, content=body)
+
+
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
@@ -0,0 +1,115 @@
+"""
+路线几何内核微基准
+
+对比 100 / 1k / 10k 点路线上：
+  - baseline: 旧版逐点 math.haversine 循环
+  - python:   geo 内核纯 Python 回退
+  - numpy:    geo 内核 NumPy 批量实现
+
+运行: python tests/bench_geo.py
+"""
+import math
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core import geo
+
+
+SIZES = [100, 1000, 10000]
+
+
+def _make_route(n):
+    lats = [39.9 + 0.00005 * i + 0.00002 * math.sin(i / 7) for i in range(n)]
+    lngs = [116.4 + 0.00004 * i for i in range(n)]
+    return lats, lngs
+
+
+def _baseline_haversine(lat1, lng1, lat2, lng2):
+    R = 6371000.0
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = math.radians(lat2 - lat1)
+    dl = math.radians(lng2 - lng1)
+    a = (math.sin(dphi / 2) ** 2 +
+         math.cos(phi1) * math.cos(phi2) * (math.sin(dl / 2) ** 2))
+    return R * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def _baseline_nearest(lat, lng, lats, lngs):
+    best_i, best_d = 0, float("inf")
+    for i in range(len(lats)):
+        d = _baseline_haversine(lat, lng, lats[i], lngs[i])
+        if d < best_d:
+            best_d, best_i = d, i
+    return best_i
+
+
+def _baseline_remaining(lats, lngs):
+    total = 0.0
+    for i in range(len(lats) - 1):
+        total += _baseline_haversine(lats[i], lngs[i], lats[i + 1], lngs[i + 1])
+    return total
+
+
+def _kernel_nearest(lat, lng, lats, lngs):
+    d = geo.haversine_many(lat, lng, lats, lngs)
+    if geo.np is not None:
+        return int(geo.np.argmin(d))
+    return min(range(len(d)), key=d.__getitem__)
+
+
+def _time(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=3)) / number * 1e6  # us
+
+
+def bench(n):
+    lats, lngs = _make_route(n)
+    qlat, qlng = lats[n // 2] + 0.0001, lngs[n // 2]
+    number = max(3, 20000 // n)
+
+    np_mod = geo.np
+    rows = {}
+    for kernel in ["baseline", "python", "numpy"]:
+        if kernel == "numpy" and np_mod is None:
+            continue
+        geo.np = np_mod if kernel == "numpy" else None
+        la = geo.to_array(lats)
+        ln = geo.to_array(lngs)
+
+        if kernel == "baseline":
+            fns = {
+                "nearest": lambda: _baseline_nearest(qlat, qlng, lats, lngs),
+                "cumulative": lambda: _baseline_remaining(lats, lngs),
+                "point_to_polyline": None,
+            }
+        else:
+            fns = {
+                "nearest": lambda: _kernel_nearest(qlat, qlng, la, ln),
+                "cumulative": lambda: geo.cumulative_lengths(la, ln),
+                "point_to_polyline": lambda: geo.point_to_polyline(qlat, qlng, la, ln),
+            }
+        rows[kernel] = {k: (_time(f, number) if f else None) for k, f in fns.items()}
+    geo.np = np_mod
+    return rows
+
+
+def main():
+    print(f"numpy: {'yes ' + geo.np.__version__ if geo.np is not None else 'no'}")
+    print(f"{'points':>7} {'op':<18} {'baseline(us)':>13} {'python(us)':>11} {'numpy(us)':>10} {'speedup':>8}")
+    for n in SIZES:
+        rows = bench(n)
+        for op in ["nearest", "cumulative", "point_to_polyline"]:
+            base = rows["baseline"][op]
+            py = rows["python"][op]
+            npv = rows.get("numpy", {}).get(op)
+            ref = base if base is not None else py
+            speedup = f"{ref / npv:.1f}x" if (npv and ref) else "-"
+            fmt = lambda v: f"{v:.1f}" if v is not None else "-"
+            print(f"{n:>7} {op:<18} {fmt(base):>13} {fmt(py):>11} {fmt(npv):>10} {speedup:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+TTS 磁盘 / 缓存 / 静态服务链路压测（离线 local 后端，不访问网络）
+
+  1. cold:   N 条不同文本首次合成（写真实 WAV + 原子改名 + 入缓存索引）
+  2. warm:   同样 N 条再请求一次（全部命中缓存）
+  3. serve:  通过 /audio 静态路由把 N 个文件读回来
+
+运行: python tests/bench_tts.py [N] [并发数]
+"""
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmp = tempfile.mkdtemp(prefix="bench_tts_")
+os.environ["AUDIO_OUTPUT_DIR"] = _tmp
+os.environ["TTS_PROVIDER"] = "local"
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.services.tts_service import TTSService  # noqa: E402
+from main import app  # noqa: E402
+
+
+def _texts(n):
+    return [f"前方{i}米处向{'左右'[i % 2]}转，请沿盲道继续前进" for i in range(n)]
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    service = TTSService()
+    texts = _texts(n)
+    print(f"backend={service.backend.name} n={n} concurrency={concurrency} dir={_tmp}")
+
+    t0 = time.perf_counter()
+    urls = list(asyncio.run(service.prefetch(texts, "bench", {}, concurrency=concurrency)).values())
+    cold = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    asyncio.run(service.prefetch(texts, "bench", {}, concurrency=concurrency))
+    warm = time.perf_counter() - t0
+
+    total_bytes = 0
+    with TestClient(app) as client:
+        t0 = time.perf_counter()
+        for url in urls:
+            r = client.get(url)
+            assert r.status_code == 200, (url, r.status_code)
+            total_bytes += len(r.content)
+        serve = time.perf_counter() - t0
+
+    mb = total_bytes / 1024 / 1024
+    print(f"{'phase':<6} {'total(s)':>9} {'per item(ms)':>13} {'items/s':>9}")
+    for name, dt in [("cold", cold), ("warm", warm), ("serve", serve)]:
+        print(f"{name:<6} {dt:>9.3f} {dt / n * 1000:>13.2f} {n / dt:>9.1f}")
+    print(f"served {mb:.1f} MB ({mb / serve:.1f} MB/s)")
+    print(service.cache.stats())
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    finally:
+        shutil.rmtree(_tmp, ignore_errors=True)
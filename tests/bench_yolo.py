@@ -0,0 +1,68 @@
+"""
+YOLO 逐张推理 vs 整批推理基准（CPU）
+
+对 batch = 1 / 3 / 8 张 640x480 图像：
+  - per-image: 旧版逐张调用 model(frame)
+  - batched:   一次调用 model([frame, ...])
+
+需要 ultralytics 与权重文件（YOLO_MODEL_PATH）。
+运行: python tests/bench_yolo.py [重复次数]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from app.services.yolo_service import YOLOService
+
+
+BATCH_SIZES = [1, 3, 8]
+
+
+def _frames(n, seed=0):
+    rng = np.random.default_rng(seed)
+    # 平滑渐变 + 噪声，比纯随机图更接近真实画面的解码/推理开销
+    base = np.linspace(0, 255, 640, dtype=np.float32)[None, :, None]
+    frames = []
+    for _ in range(n):
+        noise = rng.normal(0, 20, (480, 640, 3)).astype(np.float32)
+        frames.append(np.clip(base + noise, 0, 255).astype(np.uint8))
+    return frames
+
+
+def _time(fn, repeat):
+    fn()  # 预热
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    service = YOLOService()
+    service.mock_mode = False
+    service.device = "cpu"
+    service._load_model()
+    if service.model is None:
+        print("YOLO模型不可用（需要 ultralytics 与权重文件），跳过基准")
+        return
+
+    kwargs = dict(conf=service.confidence, device="cpu", verbose=False)
+    print(f"model={service.model_path} repeat={repeat}")
+    print(f"{'batch':>5} {'per-image(ms)':>14} {'batched(ms)':>12} {'ms/img':>8} {'speedup':>8}")
+    for n in BATCH_SIZES:
+        frames = _frames(n)
+        per_image = _time(lambda: [service.model(f, **kwargs) for f in frames], repeat)
+        batched = _time(lambda: service.model(frames, **kwargs), repeat)
+        print(f"{n:>5} {per_image:>14.1f} {batched:>12.1f} {batched / n:>8.1f} {per_image / batched:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
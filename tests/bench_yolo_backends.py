@@ -0,0 +1,106 @@
+"""
+YOLO 推理后端对比：ultralytics(PyTorch) vs ONNX Runtime
+
+每个后端在独立子进程中测量，互不影响导入时间与内存：
+  - load:       导入 + 加载模型耗时
+  - latency:    单帧推理延迟（p50 / p95）
+  - throughput: batch=8 时每秒帧数
+  - rss:        测完后的常驻内存（VmRSS）
+
+需要 ultralytics + 权重（YOLO_MODEL_PATH）与 onnxruntime + ONNX 模型（YOLO_ONNX_PATH）；
+缺哪个就跳过哪个。INT8 模型可通过 YOLO_ONNX_PATH 指向 *.int8.onnx 对比。
+
+运行: python tests/bench_yolo_backends.py [重复次数]
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BACKENDS = ["ultralytics", "onnx"]
+
+
+def _rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _worker(kind, repeat):
+    import numpy as np
+
+    t0 = time.perf_counter()
+    from config.settings import settings
+    from app.services.yolo_backends import create_backend
+
+    if kind == "onnx" and not os.path.exists(settings.YOLO_ONNX_PATH):
+        return {"backend": kind, "skipped": f"missing {settings.YOLO_ONNX_PATH}"}
+    if kind == "ultralytics" and not os.path.exists(settings.YOLO_MODEL_PATH):
+        return {"backend": kind, "skipped": f"missing {settings.YOLO_MODEL_PATH}"}
+    try:
+        model, _ = create_backend(kind, settings)
+    except ImportError as e:
+        return {"backend": kind, "skipped": str(e)}
+    load_ms = (time.perf_counter() - t0) * 1000
+
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 255, (480, 640, 3), dtype=np.uint8) for _ in range(8)]
+    kwargs = dict(imgsz=settings.YOLO_IMGSZ, conf=settings.YOLO_CONFIDENCE, device="cpu", verbose=False)
+
+    model(frames[0], **kwargs)  # 预热
+    lat = []
+    for i in range(repeat * 4):
+        t = time.perf_counter()
+        model(frames[i % 8], **kwargs)
+        lat.append((time.perf_counter() - t) * 1000)
+    lat.sort()
+
+    t = time.perf_counter()
+    for _ in range(repeat):
+        model(frames, **kwargs)
+    fps = repeat * len(frames) / (time.perf_counter() - t)
+
+    return {
+        "backend": kind,
+        "loadMs": round(load_ms, 1),
+        "p50Ms": round(lat[len(lat) // 2], 1),
+        "p95Ms": round(lat[int(len(lat) * 0.95) - 1], 1),
+        "fps": round(fps, 1),
+        "rssMb": round(_rss_mb(), 1),
+    }
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    rows = []
+    for kind in BACKENDS:
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker", kind, str(repeat)],
+            cwd=ROOT, capture_output=True, text=True
+        )
+        line = next((l for l in reversed(proc.stdout.splitlines()) if l.startswith("{")), None)
+        rows.append(json.loads(line) if line else {"backend": kind, "skipped": proc.stderr.strip()[-200:]})
+
+    print(f"{'backend':<12} {'load(ms)':>9} {'p50(ms)':>8} {'p95(ms)':>8} {'fps@8':>7} {'rss(MB)':>8}")
+    for r in rows:
+        if "skipped" in r:
+            print(f"{r['backend']:<12} skipped: {r['skipped']}")
+            continue
+        print(f"{r['backend']:<12} {r['loadMs']:>9} {r['p50Ms']:>8} {r['p95Ms']:>8} {r['fps']:>7} {r['rssMb']:>8}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--worker":
+        print(json.dumps(_worker(sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else 5)))
+    else:
+        main()
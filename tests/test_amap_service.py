@@ -0,0 +1,130 @@
+"""
+高德服务测试（共享 httpx 客户端，使用 MockTransport，不访问网络）
+"""
+import asyncio
+
+import httpx
+import pytest
+
+from app.core.http_client import HTTPClient, http_client
+from app.services.amap_service import AmapService
+from app.services.route_cache import route_cache
+
+
+ORIGIN = {"lat": 39.9165, "lng": 116.3971}
+DEST = {"lat": 39.9200, "lng": 116.4000}
+
+ROUTE_JSON = {
+    "status": "1",
+    "route": {"paths": [{
+        "distance": "500", "duration": "400", "polyline": "116.3971,39.9165;116.4000,39.9200",
+        "steps": [{"instruction": "向北步行500米", "distance": "500", "duration": "400", "polyline": ""}],
+    }]},
+}
+
+
+def _patch_transport(monkeypatch, handler):
+    def _create(self):
+        self._loop = asyncio.get_running_loop()
+        return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(HTTPClient, "_create", _create)
+    http_client._client = None
+    route_cache.clear()
+
+
+def _service():
+    svc = AmapService()
+    svc.mock_mode = False
+    svc.api_key = "k"
+    return svc
+
+
+def test_route_and_poi_share_one_async_client(monkeypatch):
+    seen = []
+
+    def handler(request):
+        seen.append(request)
+        if request.url.path.endswith("/direction/walking"):
+            return httpx.Response(200, json=ROUTE_JSON)
+        return httpx.Response(200, json={"status": "1", "pois": [{"name": "天安门", "location": "116.39,39.91"}]})
+
+    _patch_transport(monkeypatch, handler)
+    svc = _service()
+
+    async def run():
+        routes = await svc.plan_walking_route(ORIGIN, DEST)
+        client = http_client.client
+        poi = await svc.search_poi_text("天安门")
+        assert http_client.client is client
+        await http_client.close()
+        return routes, poi
+
+    routes, poi = asyncio.run(run())
+    assert routes[0]["distance"] == 500 and routes[0]["steps"][0]["instruction"] == "向北步行500米"
+    assert poi["success"] and poi["poi"]["lat"] == 39.91
+    assert seen[0].url.params["origin"] == "116.3971,39.9165"
+    assert seen[0].extensions["timeout"]["read"] == 8.0
+    assert seen[1].extensions["timeout"]["read"] == 5.0
+
+
+def test_route_timeout_falls_back_to_mock(monkeypatch):
+    def handler(request):
+        raise httpx.ReadTimeout("slow", request=request)
+
+    _patch_transport(monkeypatch, handler)
+    svc = _service()
+
+    async def run():
+        try:
+            return await svc.plan_walking_route(ORIGIN, DEST), await svc.search_poi_text("x")
+        finally:
+            await http_client.close()
+
+    routes, poi = asyncio.run(run())
+    assert routes[0]["routeId"] == "route_0" and routes[0]["polyline"]
+    assert poi["success"] is False
+
+
+def test_llm_tool_and_nav_start_share_one_route_request(monkeypatch):
+    seen = []
+
+    def handler(request):
+        seen.append(request)
+        return httpx.Response(200, json=ROUTE_JSON)
+
+    _patch_transport(monkeypatch, handler)
+
+    async def run():
+        try:
+            # 两个独立的 AmapService 实例（LLM 工具与导航路由各持一个）
+            return await asyncio.gather(
+                _service().plan_walking_route(ORIGIN, DEST),
+                _service().plan_walking_route(dict(ORIGIN), DEST),
+            )
+        finally:
+            await http_client.close()
+
+    a, b = asyncio.run(run())
+    assert len(seen) == 1
+    assert a == b and a is not b
+
+
+def test_client_bound_to_one_event_loop(monkeypatch):
+    _patch_transport(monkeypatch, lambda request: httpx.Response(200, json=ROUTE_JSON))
+
+    async def use_and_close():
+        client = http_client.client
+        await http_client.close()
+        return client
+
+    a, b = asyncio.run(use_and_close()), asyncio.run(use_and_close())
+    assert a is not b and a.is_closed and b.is_closed
+
+    async def use():
+        return http_client.client
+
+    unclosed = asyncio.run(use())  # 未 close 就结束了事件循环
+    with pytest.raises(RuntimeError):
+        asyncio.run(use())
+    assert http_client._client is unclosed  # 没有被悄悄替换、丢下连接池
+    http_client._client = None
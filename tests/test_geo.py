@@ -0,0 +1,54 @@
+"""
+地理计算内核测试（NumPy 与纯 Python 回退结果一致）
+"""
+import math
+import pytest
+
+from app.core import geo
+
+
+LATS = [39.9165 + 0.0003 * math.sin(i / 5) for i in range(40)]
+LNGS = [116.3971 + 0.0002 * i for i in range(40)]
+
+
+@pytest.fixture(params=["numpy", "python"])
+def kernel(request, monkeypatch):
+    if request.param == "numpy":
+        if geo.np is None:
+            pytest.skip("numpy not installed")
+    else:
+        monkeypatch.setattr(geo, "np", None)
+    return request.param
+
+
+def test_haversine_many(kernel):
+    d = geo.haversine_many(39.9165, 116.3971, LATS, LNGS)
+    for i in (0, 7, 39):
+        assert abs(d[i] - geo.haversine_m(39.9165, 116.3971, LATS[i], LNGS[i])) < 1e-6
+
+
+def test_cumulative_and_remaining(kernel):
+    cum = geo.cumulative_lengths(LATS, LNGS)
+    rem = geo.remaining_lengths(LATS, LNGS)
+    seg = geo.segment_lengths(LATS, LNGS)
+
+    assert len(cum) == len(rem) == len(LATS)
+    assert cum[0] == 0.0 and rem[-1] == 0.0
+    assert abs(cum[-1] - sum(seg)) < 1e-6
+    assert abs(rem[0] - cum[-1]) < 1e-6
+
+
+def test_point_to_polyline(kernel):
+    # 线段中点正北约 11m
+    lat = (LATS[10] + LATS[11]) / 2 + 0.0001
+    lng = (LNGS[10] + LNGS[11]) / 2
+    d, seg, t = geo.point_to_polyline(lat, lng, LATS, LNGS)
+    assert seg == 10
+    assert 0.0 < t < 1.0
+    assert abs(d - 11.1) < 1.0
+
+
+def test_point_to_polyline_degenerate(kernel):
+    assert geo.point_to_polyline(39.9, 116.4, [], [])[0] == float("inf")
+    d, seg, _ = geo.point_to_polyline(39.9, 116.4, [39.9], [116.4])
+    assert seg == 0 and d == 0.0
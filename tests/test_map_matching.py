@@ -0,0 +1,75 @@
+"""
+地图匹配测试
+"""
+from app.core.route_geometry import RouteGeometry
+from app.core.map_matching import MapMatcher
+
+
+LAT0, LNG0 = 39.916527, 116.397128
+# 约 111m * 0.001 的方格：向东 -> 向北 -> 向西（U 形回环，首尾两条腿相距约 30m）
+U_POINTS = (
+    [{"lat": LAT0, "lng": LNG0 + i * 0.0005} for i in range(5)]
+    + [{"lat": LAT0 + 0.00027, "lng": LNG0 + 0.002}]
+    + [{"lat": LAT0 + 0.00027, "lng": LNG0 + 0.002 - i * 0.0005} for i in range(1, 5)]
+)
+
+
+def test_sub_vertex_remaining():
+    geo = RouteGeometry([{"lat": LAT0, "lng": LNG0}, {"lat": LAT0, "lng": LNG0 + 0.002}])
+    m = MapMatcher(geo, window=5, max_offset=20)
+
+    r = m.match({"lat": LAT0 + 0.00001, "lng": LNG0 + 0.001})
+    assert r is not None
+    assert abs(r.remaining - geo.total_length / 2) < 1.0
+    assert r.distance < 2.0
+
+
+def test_cursor_stays_on_current_leg_of_loop():
+    geo = RouteGeometry(U_POINTS)
+    m = MapMatcher(geo, window=3, max_offset=20)
+
+    # 沿去程行走，去程与回程只隔约 30m，游标保证不会吸附到回程
+    for i in range(4):
+        r = m.match({"lat": LAT0 + 0.0001, "lng": LNG0 + i * 0.0005 + 0.0002})
+        assert r.seg_idx == i
+    assert r.windowed
+
+
+def test_full_search_fallback_after_jump():
+    geo = RouteGeometry(U_POINTS)
+    m = MapMatcher(geo, window=2, max_offset=20)
+
+    m.match({"lat": LAT0, "lng": LNG0 + 0.0002})
+    r = m.match({"lat": LAT0 + 0.00027, "lng": LNG0 + 0.0003})
+    assert r.seg_idx == len(U_POINTS) - 2
+    assert not r.windowed
+
+
+def test_empty_route():
+    m = MapMatcher(RouteGeometry([]), window=5, max_offset=20)
+    assert m.match({"lat": LAT0, "lng": LNG0}) is None
+
+
+def test_batch_match_agrees_with_single():
+    import random
+    from app.core.map_matching import batch_match
+
+    rnd = random.Random(3)
+    pairs = []
+    for _ in range(30):
+        geo = RouteGeometry(U_POINTS)
+        single = MapMatcher(geo, window=3, max_offset=20)
+        batched = MapMatcher(geo, window=3, max_offset=20)
+        pairs.append((single, batched))
+
+    for _ in range(6):
+        locs = [
+            {"lat": LAT0 + rnd.uniform(-0.0001, 0.0004), "lng": LNG0 + rnd.uniform(0.0, 0.002)}
+            for _ in pairs
+        ]
+        results = batch_match([(b, loc) for (_, b), loc in zip(pairs, locs)])
+        for (single, batched), loc, r in zip(pairs, locs, results):
+            s = single.match(loc)
+            assert (s.seg_idx, s.windowed) == (r.seg_idx, r.windowed)
+            assert abs(s.remaining - r.remaining) < 1e-6
+            assert single.cursor == batched.cursor
@@ -0,0 +1,70 @@
+"""
+感知上传路由测试：二进制帧解析与请求体大小限制
+"""
+import asyncio
+
+import pytest
+from starlette.requests import Request
+
+from app.api import nav_routes
+from app.api.nav_routes import split_length_prefixed
+
+
+@pytest.mark.parametrize("body", [b"", b"\x00\x00", b"\x00\x00\x00\x09abc", b"\x00\x00\x00\x00"])
+def test_split_length_prefixed_rejects_malformed(body):
+    with pytest.raises(ValueError):
+        split_length_prefixed(body)
+
+
+def test_split_length_prefixed_limits():
+    frame = b"\x00\x00\x00\x02ab"
+    assert len(split_length_prefixed(frame * 3)) == 3
+    with pytest.raises(ValueError):
+        split_length_prefixed(frame * 4)
+    with pytest.raises(ValueError):
+        split_length_prefixed(frame, max_frame_bytes=1)
+
+
+def _binary_request(chunks, headers):
+    received = []
+
+    async def receive():
+        received.append(1)
+        i = len(received) - 1
+        return {"type": "http.request", "body": chunks[i], "more_body": i + 1 < len(chunks)}
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/v1/nav/perception/frames",
+        "query_string": b"navSessionId=s&lat=1&lng=2",
+        "headers": [(k.encode(), v.encode()) for k, v in headers.items()],
+    }
+    return Request(scope, receive), received
+
+
+@pytest.mark.parametrize("content_type", ["application/octet-stream", "multipart/form-data; boundary=x"])
+def test_oversized_binary_upload_rejected_before_reading(monkeypatch, content_type):
+    monkeypatch.setattr(nav_routes.settings, "PERCEPTION_MAX_FRAME_BYTES", 16)
+    req, received = _binary_request([b"x" * 10], {"content-type": content_type, "content-length": str(10 ** 9)})
+
+    with pytest.raises(nav_routes.BodyTooLarge):
+        asyncio.run(nav_routes._read_binary_perception(req))
+    assert received == []
+
+
+def test_chunked_binary_upload_stops_at_limit(monkeypatch):
+    monkeypatch.setattr(nav_routes.settings, "PERCEPTION_MAX_FRAME_BYTES", 16)
+    chunks = [b"\x00" * 40] * 10  # 上限 3 * (4 + 16) = 60 字节
+    req, received = _binary_request(chunks, {"content-type": "application/octet-stream"})
+
+    with pytest.raises(nav_routes.BodyTooLarge):
+        asyncio.run(nav_routes._read_binary_perception(req))
+    assert len(received) == 2
+
+    frame = b"\x00\x00\x00\x02ab"
+    req, _ = _binary_request([frame, frame], {"content-type": "application/octet-stream"})
+    nav_session_id, location, frames = asyncio.run(nav_routes._read_binary_perception(req))
+    assert nav_session_id == "s" and location == {"lat": 1.0, "lng": 2.0}
+    assert [bytes(f) for f in frames] == [b"ab", b"ab"]
+    assert all(isinstance(f.obj, bytearray) for f in frames)  # 切片指向读取缓冲区，未再复制
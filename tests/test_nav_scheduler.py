@@ -0,0 +1,93 @@
+"""
+批量导航调度器测试
+"""
+import asyncio
+
+from app.core.map_matching import MatchResult
+from app.core.nav_scheduler import NavTickScheduler
+from app.core.session_manager import session_manager
+from app.models.schemas import NavState
+
+
+ROUTE = {
+    "distance": 850,
+    "steps": [{"instruction": "向东直行", "distance": 850, "polyline": "116.4,39.9;116.41,39.9"}],
+    "polyline": "116.4,39.9;116.41,39.9",
+}
+
+
+class _FakeEngine:
+    """记录 trigger 调用；每次返回一个耗时 delay 秒的推送任务"""
+
+    def __init__(self, delay=0.0):
+        self.sessions = {}
+        self.triggered = []
+        self.delay = delay
+
+    def trigger(self, sid, matched=None):
+        self.triggered.append((sid, matched))
+        return asyncio.create_task(asyncio.sleep(self.delay))
+
+
+def _navigating(sid, loc):
+    nav = session_manager.create_navigation(sid, "u", None, None)
+    nav.state = NavState.NAVIGATING
+    nav.currentLocation = loc
+    nav.routeData = {"activeRoute": ROUTE}
+    return nav
+
+
+def test_tick_matches_changed_locations_and_fans_out():
+    sids = ["sched_a", "sched_b", "sched_idle"]
+    engine = _FakeEngine()
+    engine.sessions = {"sched_a": object(), "sched_b": object()}  # sched_idle 未连接 WebSocket
+    scheduler = NavTickScheduler(engine, interval=0.5)
+
+    async def run():
+        a = _navigating("sched_a", {"lat": 39.9, "lng": 116.402})
+        _navigating("sched_b", {"lat": 39.9, "lng": 116.405})
+        _navigating("sched_idle", {"lat": 39.9, "lng": 116.405})
+        try:
+            await scheduler.tick()
+            first = list(engine.triggered)
+
+            engine.triggered.clear()
+            await scheduler.tick()  # 定位未变化，不再匹配
+            unchanged = list(engine.triggered)
+
+            a.currentLocation = {"lat": 39.9, "lng": 116.408}
+            await scheduler.tick()
+            return first, unchanged, list(engine.triggered)
+        finally:
+            for sid in sids:
+                session_manager.navigation_sessions.pop(sid, None)
+
+    first, unchanged, moved = asyncio.run(run())
+
+    assert sorted(sid for sid, _ in first) == ["sched_a", "sched_b"]
+    assert all(isinstance(m, MatchResult) for _, m in first)
+    assert unchanged == []
+    assert [sid for sid, _ in moved] == ["sched_a"]
+    assert moved[0][1].remaining < dict(first)["sched_a"].remaining  # 向东走了约 500 米
+
+
+def test_stats_separate_tick_and_drain_time():
+    engine = _FakeEngine(delay=0.05)
+    engine.sessions = {"sched_drain": object()}
+    scheduler = NavTickScheduler(engine, interval=1.0)
+
+    async def run():
+        _navigating("sched_drain", {"lat": 39.9, "lng": 116.402})
+        try:
+            await scheduler.tick()
+        finally:
+            session_manager.navigation_sessions.pop("sched_drain", None)
+
+    asyncio.run(run())
+    stats = scheduler.stats()
+
+    assert stats["ticks"] == 1 and stats["lastMatched"] == 1 and stats["lastSessions"] == 1
+    assert stats["running"] is False and stats["intervalMs"] == 1000
+    assert stats["lastTickMs"] < 40  # 收集 + 匹配，不含推送
+    assert stats["lastDrainMs"] >= 40
+    assert stats["maxDrainMs"] == stats["lastDrainMs"] == stats["avgDrainMs"]
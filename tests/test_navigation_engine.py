@@ -0,0 +1,277 @@
+"""
+事件驱动导航引擎测试
+"""
+import asyncio
+
+from app.core.navigation_engine import NavigationEngine, TimerWheel, build_route_cache, NO_LOCATION_TEXT
+from app.services.tts_service import TTSService
+from app.core.session_manager import session_manager
+from app.core.websocket_manager import websocket_manager
+from app.models.schemas import NavState
+
+
+class _FakeWS:
+    def __init__(self):
+        self.sent = []
+
+    async def send_json(self, data):
+        self.sent.append(data)
+
+
+class _FakeTTS:
+    async def text_to_speech(self, text, session_id):
+        return f"/audio/{abs(hash(text))}.mp3"
+
+
+def test_timer_wheel_fires_and_cancels():
+    async def run():
+        wheel = TimerWheel(tick=0.01, slots=8)
+        fired = []
+        wheel.schedule("a", 0.03, lambda: fired.append("a"))
+        wheel.schedule("b", 0.12, lambda: fired.append("b"))  # 超过一圈
+        wheel.schedule("c", 0.02, lambda: fired.append("c"))
+        wheel.cancel("c")
+        await asyncio.sleep(0.2)
+        return fired, len(wheel), wheel._task
+
+    fired, pending, task = asyncio.run(run())
+    assert fired == ["a", "b"]
+    assert pending == 0
+    assert task is None
+
+
+def test_engine_recomputes_only_on_events():
+    sid = "nav_engine_test"
+    origin = {"lat": 39.9, "lng": 116.4}
+    dest = {"lat": 39.9, "lng": 116.41}
+    route = {
+        "distance": 850,
+        "steps": [{"instruction": "向东直行", "distance": 850, "polyline": "116.4,39.9;116.41,39.9"}],
+        "polyline": "116.4,39.9;116.41,39.9",
+    }
+
+    async def run():
+        nav = session_manager.create_navigation(sid, "u", origin, dest)
+        nav.state = NavState.NAVIGATING
+        nav.routeData = {"activeRoute": route, "_cache": build_route_cache(route)}
+        ws = _FakeWS()
+        websocket_manager.connections[sid] = ws
+        websocket_manager.sequence_numbers[sid] = 0
+
+        engine = NavigationEngine(_FakeTTS())
+        engine.wheel = TimerWheel(tick=0.01)
+        import app.core.navigation_engine as ne
+        old_interval, ne.REMINDER_INTERVAL = ne.REMINDER_INTERVAL, 0.05
+        try:
+            engine.attach(sid)
+            await asyncio.sleep(0.08)
+            texts = [m["data"]["text"] for m in ws.sent]
+            # 问候 + 至少一次无定位提醒 + 时间轮触发的再次提醒
+            assert texts.count(NO_LOCATION_TEXT) >= 2
+
+            nav.currentLocation = {"lat": 39.9, "lng": 116.402}
+            engine.on_location_update(sid)
+            await asyncio.sleep(0.02)
+            assert ws.sent[-1]["data"]["text"] == "向东直行"
+            assert len(engine.wheel) == 0
+
+            # 没有新事件就不再推送
+            n = len(ws.sent)
+            await asyncio.sleep(0.1)
+            assert len(ws.sent) == n
+
+            nav.currentLocation = dict(dest)
+            engine.on_location_update(sid)
+            await asyncio.sleep(0.02)
+            assert nav.state == NavState.ARRIVED
+            assert sid not in engine.sessions
+        finally:
+            ne.REMINDER_INTERVAL = old_interval
+            websocket_manager.disconnect(sid)
+            session_manager.navigation_sessions.pop(sid, None)
+
+    asyncio.run(run())
+
+
+def test_no_location_reminder_is_throttled():
+    sid = "nav_throttle_test"
+    route = {"distance": 100, "steps": [], "polyline": "116.4,39.9;116.401,39.9"}
+
+    async def run():
+        nav = session_manager.create_navigation(sid, "u", None, None)
+        nav.state = NavState.NAVIGATING
+        nav.routeData = {"activeRoute": route}
+        ws = _FakeWS()
+        websocket_manager.connections[sid] = ws
+        websocket_manager.sequence_numbers[sid] = 0
+
+        engine = NavigationEngine(_FakeTTS())
+        engine.wheel = TimerWheel(tick=0.01)
+        import app.core.navigation_engine as ne
+        old_interval, ne.REMINDER_INTERVAL = ne.REMINDER_INTERVAL, 0.3
+        try:
+            engine.attach(sid)
+            for _ in range(10):  # 感知请求频繁触发
+                await asyncio.sleep(0.01)
+                engine.on_perception(sid)
+            await asyncio.sleep(0.05)
+            texts = [m["data"]["text"] for m in ws.sent]
+            assert texts.count(NO_LOCATION_TEXT) == 1
+            assert len(engine.wheel) == 1  # 下次提醒仍由时间轮调度
+
+            await asyncio.sleep(0.3)
+            texts = [m["data"]["text"] for m in ws.sent]
+            assert texts.count(NO_LOCATION_TEXT) == 2
+        finally:
+            ne.REMINDER_INTERVAL = old_interval
+            engine.detach(sid)
+            websocket_manager.disconnect(sid)
+            session_manager.navigation_sessions.pop(sid, None)
+
+    asyncio.run(run())
+
+
+class _SlowTTS(_FakeTTS):
+    async def text_to_speech(self, text, session_id):
+        await asyncio.sleep(0.02)
+        return await super().text_to_speech(text, session_id)
+
+
+def test_drain_task_held_until_done():
+    import gc
+
+    sid = "nav_task_ref_test"
+
+    async def run():
+        nav = session_manager.create_navigation(sid, "u", None, None)
+        nav.state = NavState.NAVIGATING
+        ws = _FakeWS()
+        websocket_manager.connections[sid] = ws
+        websocket_manager.sequence_numbers[sid] = 0
+
+        engine = NavigationEngine(_SlowTTS())
+        engine.wheel = TimerWheel(tick=0.01)
+        try:
+            engine.attach(sid)  # 调用方不保存返回的任务
+            assert len(engine._tasks) == 1
+            await asyncio.sleep(0.005)
+            gc.collect()
+            await asyncio.sleep(0.1)
+            assert ws.sent and ws.sent[0]["type"] == "NAV_INSTRUCTION"
+            assert engine._tasks == set()
+        finally:
+            engine.detach(sid)
+            websocket_manager.disconnect(sid)
+            session_manager.navigation_sessions.pop(sid, None)
+
+    asyncio.run(run())
+
+
+class _PrefetchTTS(_FakeTTS):
+    prefetch = TTSService.prefetch
+    is_fallback_url = staticmethod(TTSService.is_fallback_url)
+    mock_mode = False
+
+    def __init__(self):
+        self.calls = []
+        self.active = 0
+        self.peak = 0
+        self.stored = {}
+
+    def cached_url(self, text):
+        return self.stored.get(text)
+
+    async def text_to_speech(self, text, session_id):
+        self.calls.append(text)
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        self.stored[text] = await super().text_to_speech(text, session_id)
+        return self.stored[text]
+
+
+def test_prefetched_audio_used_without_synthesis():
+    sid = "nav_prefetch_test"
+    route = {
+        "distance": 850,
+        "steps": [
+            {"instruction": f"第{i}步", "distance": 100, "polyline": "116.4,39.9;116.41,39.9"}
+            for i in range(6)
+        ],
+        "polyline": "116.4,39.9;116.41,39.9",
+    }
+
+    async def run():
+        nav = session_manager.create_navigation(sid, "u", {"lat": 39.9, "lng": 116.4}, {"lat": 39.9, "lng": 116.41})
+        nav.state = NavState.NAVIGATING
+        cache = build_route_cache(route)
+        nav.routeData = {"activeRoute": route, "_cache": cache}
+        nav.currentLocation = {"lat": 39.9, "lng": 116.402}
+        ws = _FakeWS()
+        websocket_manager.connections[sid] = ws
+        websocket_manager.sequence_numbers[sid] = 0
+
+        tts = _PrefetchTTS()
+        engine = NavigationEngine(tts)
+        try:
+            await engine.prefetch_audio(sid, route, cache, concurrency=2)
+            assert tts.peak <= 2
+            prefetched = len(tts.calls)
+            assert "第0步" in cache["audioUrls"]
+
+            engine.attach(sid)
+            await asyncio.sleep(0.02)
+            assert len(tts.calls) == prefetched
+            assert ws.sent[-1]["data"]["audioUrl"] == cache["audioUrls"][ws.sent[-1]["data"]["text"]]
+        finally:
+            engine.detach(sid)
+            websocket_manager.disconnect(sid)
+            session_manager.navigation_sessions.pop(sid, None)
+
+    asyncio.run(run())
+
+
+def test_evicted_prefetched_audio_is_resynthesized(tmp_path):
+    import os
+
+    from app.services.tts_backends import LocalTTSBackend
+    from app.services.tts_cache import TTSCache
+
+    sid = "nav_prefetch_evicted_test"
+    route = {
+        "distance": 850,
+        "steps": [{"instruction": "向东直行", "distance": 850, "polyline": "116.4,39.9;116.41,39.9"}],
+        "polyline": "116.4,39.9;116.41,39.9",
+    }
+    tts = TTSService()
+    tts.backend = LocalTTSBackend(tts.voice)
+    tts.mock_mode = False
+    tts.cache = TTSCache(str(tmp_path))
+
+    async def run():
+        nav = session_manager.create_navigation(sid, "u", {"lat": 39.9, "lng": 116.4}, {"lat": 39.9, "lng": 116.41})
+        nav.state = NavState.NAVIGATING
+        cache = build_route_cache(route)
+        nav.routeData = {"activeRoute": route, "_cache": cache}
+        nav.currentLocation = {"lat": 39.9, "lng": 116.402}
+        ws = _FakeWS()
+        websocket_manager.connections[sid] = ws
+        websocket_manager.sequence_numbers[sid] = 0
+
+        engine = NavigationEngine(tts)
+        try:
+            await engine.prefetch_audio(sid, route, cache)
+            os.remove(tts.cache.path_for_url(cache["audioUrls"]["向东直行"]))  # 被缓存淘汰 / 压缩清理
+
+            engine.attach(sid)
+            await asyncio.sleep(0.1)
+            return ws.sent[-1]["data"]
+        finally:
+            engine.detach(sid)
+            websocket_manager.disconnect(sid)
+            session_manager.navigation_sessions.pop(sid, None)
+
+    data = asyncio.run(run())
+    assert data["text"] == "向东直行"
+    assert os.path.exists(tts.cache.path_for_url(data["audioUrl"]))
@@ -0,0 +1,82 @@
+"""
+障碍物时序跟踪测试
+"""
+from app.core.obstacle_tracker import ObstacleTracker, iou
+from app.core.session_manager import OBSTACLE_MAX_AGE_MS, SessionManager
+from app.models.schemas import NavState, ObstacleInfo
+
+
+def _obs(distance, bbox, type_="curb", direction="正前方", confidence=0.8):
+    return ObstacleInfo(type=type_, distance=distance, direction=direction, confidence=confidence), bbox
+
+
+def test_same_obstacle_warns_once():
+    tracker = ObstacleTracker()
+    bbox = [0.4, 0.5, 0.6, 0.7]
+    assert len(tracker.update([[_obs(5.0, bbox)]] * 3, now=0.0)) == 1  # 同批多帧只算一条轨迹
+    for i in range(1, 6):
+        assert tracker.update([[_obs(5.0, [0.41, 0.5, 0.61, 0.7])]], now=i * 0.5) == []
+    assert tracker.stats()["tracks"] == 1 and tracker.stats()["alerts"] == 1
+
+
+def test_approaching_obstacle_warns_again():
+    tracker = ObstacleTracker(approach_m=1.0)
+    tracker.update([[_obs(6.0, [0.4, 0.5, 0.6, 0.7])]], now=0.0)
+    alerts = []
+    for i, d in enumerate([5.5, 5.0, 4.5, 4.0, 3.5], start=1):
+        alerts.append(tracker.update([[_obs(d, [0.4 - i * 0.01, 0.5, 0.6 + i * 0.01, 0.7 + i * 0.01])]], now=i * 0.5))
+    assert any(alerts)
+    warned = [a[0].distance for a in alerts if a]
+    assert all(d < 5.0 for d in warned)
+
+
+def test_new_obstacle_and_expiry():
+    tracker = ObstacleTracker(max_age_ms=1000)
+    tracker.update([[_obs(5.0, [0.4, 0.5, 0.6, 0.7])]], now=0.0)
+    alerts = tracker.update([[
+        _obs(5.0, [0.4, 0.5, 0.6, 0.7]),
+        _obs(3.0, [0.0, 0.5, 0.2, 0.7], type_="stairs", direction="左前方"),
+    ]], now=0.5)
+    assert [a.type for a in alerts] == ["stairs"]
+
+    # 超过 max_age 未出现的轨迹被丢弃，再出现时视为新障碍物
+    assert len(tracker.update([[_obs(5.0, [0.4, 0.5, 0.6, 0.7])]], now=5.0)) == 1
+
+
+def test_adjacent_same_type_obstacles_stay_separate():
+    tracker = ObstacleTracker()
+    left, right = [0.30, 0.5, 0.45, 0.7], [0.42, 0.5, 0.57, 0.7]  # 中心距 0.12，低于中心点阈值
+    frame = [_obs(4.0, left), _obs(4.2, right)]
+
+    assert len(tracker.update([frame, frame], now=0.0)) == 2
+    assert tracker.stats()["tracks"] == 2
+    assert tracker.update([frame], now=0.5) == []
+    assert tracker.stats()["tracks"] == 2
+
+
+def test_trackers_dropped_when_navigation_ends_or_goes_idle():
+    manager = SessionManager()
+    ended = []
+    manager.on_navigation_end(ended.append)
+    manager.create_navigation("done", "u")
+    manager.get_obstacle_tracker("done").update([[_obs(5.0, [0.4, 0.5, 0.6, 0.7])]])
+    manager.update_navigation_state("done", NavState.NAVIGATING)
+    manager.update_navigation_state("done", NavState.ARRIVED)
+    assert "done" not in manager.obstacle_trackers
+    assert ended == ["done"]
+
+    stale = manager.get_obstacle_tracker("stale")
+    stale.last_update -= stale.max_age + 1  # 客户端断开，之后不再上传
+    manager.get_obstacle_tracker("live")
+    assert set(manager.obstacle_trackers) == {"stale", "live"}  # 距上次扫描不足 max_age，不扫描
+
+    manager._last_tracker_sweep -= stale.max_age
+    manager.get_obstacle_tracker("live")
+    assert set(manager.obstacle_trackers) == {"live"}
+    assert stale.max_age == OBSTACLE_MAX_AGE_MS / 1000
+
+
+def test_iou():
+    assert iou([0, 0, 1, 1], [0, 0, 1, 1]) == 1.0
+    assert iou([0, 0, 1, 1], [2, 2, 3, 3]) == 0.0
+    assert abs(iou([0, 0, 2, 1], [1, 0, 3, 1]) - 1 / 3) < 1e-9
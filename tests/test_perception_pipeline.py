@@ -0,0 +1,71 @@
+"""
+感知流程分阶段执行测试：提醒优先推送，LLM / TTS 有截止时间且不阻塞响应
+"""
+import asyncio
+import time
+
+from app.api import nav_routes
+from app.core.session_manager import session_manager
+
+
+class _SlowLLM:
+    def __init__(self, delay):
+        self.delay = delay
+
+    async def generate_guidance(self, obstacles, location):
+        await asyncio.sleep(self.delay)
+        return "慢速指路"
+
+
+class _TTS:
+    async def text_to_speech(self, text, session_id):
+        await asyncio.sleep(0.01)
+        return "/audio/warn.mp3"
+
+
+class _WS:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, nav_session_id, message_type, data):
+        self.sent.append((time.perf_counter(), message_type, data))
+        return True
+
+
+async def _detections():
+    return nav_routes.yolo_service._mock_detection(1)
+
+
+def test_warning_pushed_before_slow_guidance(monkeypatch):
+    ws = _WS()
+    monkeypatch.setattr(nav_routes, "llm_service", _SlowLLM(0.3))
+    monkeypatch.setattr(nav_routes, "tts_service", _TTS())
+    monkeypatch.setattr(nav_routes, "websocket_manager", ws)
+    monkeypatch.setattr(nav_routes.settings, "PERCEPTION_GUIDANCE_TIMEOUT_MS", 50)
+    monkeypatch.setattr(nav_routes.settings, "PERCEPTION_TTS_TIMEOUT_MS", 500)
+    nav = session_manager.create_navigation("pipe", "u")
+
+    async def run():
+        t0 = time.perf_counter()
+        resp = await nav_routes._run_perception("pipe", {"lat": 1.0, "lng": 2.0}, _detections())
+        elapsed = time.perf_counter() - t0
+        await asyncio.gather(*list(nav_routes._background_tasks))
+        return t0, elapsed, resp
+
+    try:
+        t0, elapsed, resp = asyncio.run(run())
+    finally:
+        session_manager.navigation_sessions.pop("pipe", None)
+        session_manager.obstacle_trackers.pop("pipe", None)
+
+    assert elapsed < 0.25  # 不等慢速LLM
+    assert resp.aiGuidance is None and resp.audioUrl == "/audio/warn.mp3"
+    assert resp.obstacles and resp.safetyLevel >= 1
+
+    types = [m for _, m, _ in ws.sent]
+    assert types == ["OBSTACLE_WARNING", "OBSTACLE_AUDIO"]
+    assert ws.sent[0][0] - t0 < 0.05
+    assert ws.sent[1][2]["audioUrl"] == "/audio/warn.mp3"
+    # 后台完成后写回会话
+    assert nav.lastAiGuidance == "慢速指路"
+    assert nav.lastWarningAudioUrl == "/audio/warn.mp3"
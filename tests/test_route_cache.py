@@ -0,0 +1,140 @@
+"""
+路线规划缓存测试
+"""
+import asyncio
+
+from app.services.route_cache import RouteCache, quantize
+
+
+ORIGIN = {"lat": 39.916527, "lng": 116.397128}
+DEST = {"lat": 39.920000, "lng": 116.400000}
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    async def delete(self, key):
+        self.data.pop(key, None)
+
+
+def _fetcher(result=None, delay=0.0):
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return result if result is not None else [{"routeId": "route_0", "steps": [{"instruction": "直行"}]}]
+
+    return fetch, calls
+
+
+def test_quantize_grid_size():
+    a = quantize(39.9, 116.4, 10)
+    assert quantize(39.9 + 5 / 111320, 116.4, 10)[0] - a[0] in (0, 1)
+    assert quantize(39.9 + 25 / 111320, 116.4, 10)[0] - a[0] >= 2
+    # 经度方向按纬度修正：北京约 85 km / 度，30m 应跨过约 3 格
+    assert 2 <= quantize(39.9, 116.4 + 30 / 85000, 10)[1] - a[1] <= 4
+
+
+def test_nearby_points_share_entry_and_results_are_copies():
+    cache = RouteCache(grid_m=10)
+    fetch, calls = _fetcher()
+
+    async def run():
+        first = await cache.get_or_fetch(ORIGIN, DEST, fetch)
+        first[0]["routeId"] = "mutated"
+        near = {"lat": ORIGIN["lat"] + 1e-6, "lng": ORIGIN["lng"] + 1e-6}
+        again = await cache.get_or_fetch(near, DEST, fetch)
+        far = {"lat": ORIGIN["lat"] + 0.001, "lng": ORIGIN["lng"]}
+        await cache.get_or_fetch(far, DEST, fetch)
+        return again
+
+    again = asyncio.run(run())
+    assert again[0]["routeId"] == "route_0"
+    assert len(calls) == 2
+    assert cache.stats()["hits"] == 1
+
+
+def test_concurrent_requests_share_one_upstream_call():
+    cache = RouteCache()
+    fetch, calls = _fetcher(delay=0.05)
+
+    async def run():
+        return await asyncio.gather(*[cache.get_or_fetch(ORIGIN, DEST, fetch) for _ in range(4)])
+
+    results = asyncio.run(run())
+    assert len(calls) == 1 and cache.stats()["joins"] == 3
+    assert all(r == results[0] for r in results)
+    assert len({id(r) for r in results}) == 4
+
+
+def test_ttl_lru_and_failures_not_cached():
+    cache = RouteCache(ttl=0.01, max_entries=1)
+    fetch, calls = _fetcher()
+
+    async def failing():
+        return None
+
+    async def run():
+        assert await cache.get_or_fetch(ORIGIN, DEST, failing) is None
+        await cache.get_or_fetch(ORIGIN, DEST, fetch)
+        await asyncio.sleep(0.02)
+        await cache.get_or_fetch(ORIGIN, DEST, fetch)
+        await cache.get_or_fetch(DEST, ORIGIN, fetch)
+
+    asyncio.run(run())
+    assert len(calls) == 3
+    assert cache.stats()["entries"] == 1
+
+
+def test_redis_tier_survives_local_miss():
+    redis = _FakeRedis()
+    fetch, calls = _fetcher()
+
+    async def run():
+        await RouteCache(redis_client=redis).get_or_fetch(ORIGIN, DEST, fetch)
+        other = RouteCache(redis_client=redis)  # 另一个进程 / 重启后
+        routes = await other.get_or_fetch(ORIGIN, DEST, fetch)
+        return other, routes
+
+    other, routes = asyncio.run(run())
+    assert len(calls) == 1 and routes[0]["routeId"] == "route_0"
+    assert other.stats()["redisHits"] == 1
+
+
+def test_corrupt_redis_value_is_dropped_and_refetched():
+    redis = _FakeRedis()
+    cache = RouteCache(redis_client=redis)
+    key = cache.make_key(ORIGIN, DEST)
+    fetch, calls = _fetcher()
+
+    async def run():
+        redis.data[key] = b"\x00not json"
+        first = await cache.get_or_fetch(ORIGIN, DEST, fetch)
+        cache.clear()
+        redis.data[key] = b'{"foreign": true}'  # 合法 JSON，但不是路线列表
+        second = await cache.get_or_fetch(ORIGIN, DEST, fetch)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert len(calls) == 2
+    assert first[0]["routeId"] == second[0]["routeId"] == "route_0"
+    assert cache.stats()["redisErrors"] == 2
+    assert redis.data[key].startswith("[")  # 坏值已被新结果覆盖
+
+
+def test_redis_client_has_timeouts(monkeypatch):
+    from app.services import route_cache as module
+
+    monkeypatch.setattr(module.settings, "ROUTE_CACHE_REDIS", True)
+    client = module._create_redis()
+    kwargs = client.connection_pool.connection_kwargs
+    assert kwargs["socket_timeout"] == module.settings.REDIS_SOCKET_TIMEOUT
+    assert kwargs["socket_connect_timeout"] == module.settings.REDIS_CONNECT_TIMEOUT
@@ -0,0 +1,40 @@
+"""
+路线几何测试
+"""
+from app.core.geo import haversine_m
+from app.core.route_geometry import RouteGeometry, parse_polyline
+
+
+POLYLINE = ";".join(f"{116.397128 + i * 0.0001:.6f},39.916527" for i in range(50))
+
+
+def _remaining_naive(points, start_idx):
+    total = 0.0
+    for i in range(start_idx, len(points) - 1):
+        p1, p2 = points[i], points[i + 1]
+        total += haversine_m(p1["lat"], p1["lng"], p2["lat"], p2["lng"])
+    return total
+
+
+def test_parse_polyline_skips_bad_segments():
+    pts = parse_polyline("116.1,39.1;bad;;116.2,39.2")
+    assert pts == [{"lat": 39.1, "lng": 116.1}, {"lat": 39.2, "lng": 116.2}]
+
+
+def test_remaining_matches_naive_sum():
+    points = parse_polyline(POLYLINE)
+    geo = RouteGeometry(points)
+
+    assert len(geo) == 50
+    for idx in (0, 10, 48):
+        assert abs(geo.remaining_at(idx, 0.0) - _remaining_naive(points, idx)) < 1e-6
+    assert abs(geo.remaining_at(20, 0.5) - (_remaining_naive(points, 21) + geo.seg_len[20] / 2)) < 1e-6
+    assert geo.remaining_at(48, 1.0) == 0.0
+    assert abs(geo.total_length - _remaining_naive(points, 0)) < 1e-6
+
+
+def test_empty_geometry():
+    geo = RouteGeometry.from_polyline("")
+    assert len(geo) == 0
+    assert geo.total_length == 0.0
+    assert geo.remaining_at(0, 0.0) == 0.0
@@ -0,0 +1,66 @@
+"""
+step 空间索引测试（与逐段暴力搜索结果对比）
+"""
+import math
+import random
+
+from app.core import geo
+from app.core.spatial_index import StepSegmentIndex
+
+
+def _make_steps(n_steps=45, pts_per_step=12, seed=7):
+    rnd = random.Random(seed)
+    lat, lng = 39.9, 116.4
+    heading = 0.0
+    steps = []
+    for _ in range(n_steps):
+        pts = [{"lat": lat, "lng": lng}]
+        heading += rnd.uniform(-1.2, 1.2)
+        for _ in range(pts_per_step - 1):
+            lat += 0.00008 * math.cos(heading)
+            lng += 0.0001 * math.sin(heading)
+            pts.append({"lat": lat, "lng": lng})
+        steps.append(pts)
+    return steps
+
+
+def _brute_force(loc, step_points):
+    best = (float("inf"), -1)
+    for i, pts in enumerate(step_points):
+        if not pts:
+            continue
+        d, _, _ = geo.point_to_polyline(
+            loc["lat"], loc["lng"], [p["lat"] for p in pts], [p["lng"] for p in pts]
+        )
+        best = min(best, (d, i))
+    return best
+
+
+def test_matches_brute_force():
+    steps = _make_steps()
+    index = StepSegmentIndex(steps, cell_size=20.0)
+    rnd = random.Random(1)
+    all_pts = [p for pts in steps for p in pts]
+
+    for _ in range(200):
+        p = rnd.choice(all_pts)
+        loc = {"lat": p["lat"] + rnd.uniform(-0.0004, 0.0004), "lng": p["lng"] + rnd.uniform(-0.0004, 0.0004)}
+        step, d = index.nearest(loc)
+        bd, bstep = _brute_force(loc, steps)
+        assert abs(d - bd) < 0.05
+        if abs(d - bd) < 1e-6:
+            assert step == bstep or abs(_brute_force(loc, [steps[step]])[0] - bd) < 0.05
+
+
+def test_far_away_location():
+    steps = _make_steps(n_steps=5)
+    index = StepSegmentIndex(steps)
+    step, d = index.nearest({"lat": 40.0, "lng": 116.5})
+    bd, bstep = _brute_force({"lat": 40.0, "lng": 116.5}, steps)
+    assert step == bstep
+    assert abs(d - bd) < bd * 0.001  # 局部投影在十公里尺度上的误差
+
+
+def test_steps_without_polyline():
+    index = StepSegmentIndex.from_steps([{"instruction": "a"}, {"instruction": "b", "polyline": ""}])
+    assert index.nearest_step({"lat": 39.9, "lng": 116.4}) == -1
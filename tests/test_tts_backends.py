@@ -0,0 +1,93 @@
+"""
+TTS后端测试（离线后端，不访问网络）
+"""
+import asyncio
+import wave
+
+import pytest
+
+from app.services.tts_backends import EdgeTTSBackend, LocalTTSBackend, TTSBackend, get_backend
+from app.services.tts_cache import TTSCache
+from app.services.tts_service import TTSService
+
+
+@pytest.fixture
+def local_service(tmp_path):
+    service = TTSService()
+    service.provider = "local"
+    service.backend = LocalTTSBackend(service.voice)
+    service.mock_mode = False
+    service.cache = TTSCache(str(tmp_path))
+    return service
+
+
+def test_get_backend_defaults_to_edge():
+    assert isinstance(get_backend("local", "v"), LocalTTSBackend)
+    assert isinstance(get_backend("unknown", "v"), EdgeTTSBackend)
+
+
+def test_local_backend_writes_sized_wav(tmp_path):
+    backend = LocalTTSBackend("v")
+    path = str(tmp_path / "a.wav")
+    text = "前方五十米右转进入人行道"
+    asyncio.run(backend.synthesize(text, path))
+
+    with wave.open(path, "rb") as w:
+        assert w.getframerate() == LocalTTSBackend.SAMPLE_RATE
+        assert w.getnframes() == int(backend.duration(text) * LocalTTSBackend.SAMPLE_RATE)
+
+
+def test_synthesize_many_reports_per_job_errors(tmp_path):
+    jobs = [("一", str(tmp_path / "1.wav")), ("二", str(tmp_path / "2.wav"))]
+    assert asyncio.run(LocalTTSBackend("v").synthesize_many(jobs)) == [None, None]
+
+    class _Broken(TTSBackend):
+        async def synthesize(self, text, path):
+            raise RuntimeError("down")
+
+    errors = asyncio.run(_Broken("v").synthesize_many(jobs))
+    assert all(isinstance(e, RuntimeError) for e in errors)
+
+
+def test_aliyun_provider_rejected_by_settings():
+    from pydantic import ValidationError
+    from config.settings import Settings
+
+    with pytest.raises(ValidationError):
+        Settings(TTS_PROVIDER="aliyun")
+
+
+def test_service_with_local_backend_serves_real_files(local_service):
+    texts = ["向东直行", "前方路口左转", "向东直行"]
+    out = asyncio.run(local_service.prefetch(texts, "nav_1", {}))
+    urls = [out[t] for t in texts]
+
+    assert urls[0] == urls[2]
+    assert all(u.endswith(".wav") and not TTSService.is_fallback_url(u) for u in urls)
+    assert len(local_service.cache) == 2
+    with wave.open(local_service.cache.path_for_url(urls[1]), "rb") as w:
+        assert w.getnframes() > 0
+
+
+def test_non_streaming_backend_stream_reads_file(local_service):
+    async def run():
+        return b"".join([c async for c in local_service.stream_speech("注意台阶", "nav_1")])
+
+    data = asyncio.run(run())
+    assert data[:4] == b"RIFF"
+
+
+def test_stream_endpoint_uses_backend_media_type(local_service, monkeypatch):
+    from fastapi.testclient import TestClient
+    from app.api import voice_routes
+    from main import app
+
+    monkeypatch.setattr(voice_routes, "tts_service", local_service)
+    with TestClient(app) as client:
+        r = client.get("/v1/voice/tts/stream", params={"text": "前方路口左转"})
+        assert r.status_code == 200
+        assert r.headers["content-type"] == "audio/wav"
+        assert r.content[:4] == b"RIFF"
+
+        local_service.mock_mode = True
+        assert client.get("/v1/voice/tts/stream", params={"text": "x"}).status_code == 404
@@ -0,0 +1,219 @@
+"""
+TTS缓存测试（edge-tts 用假实现替代，不访问网络）
+"""
+import asyncio
+import os
+
+import pytest
+
+from app.services.tts_backends import EdgeTTSBackend
+from app.services.tts_cache import TTSCache
+from app.services.tts_service import TTSService
+
+
+class _FakeCommunicate:
+    calls = 0
+
+    def __init__(self, text, voice):
+        self.text = text
+
+    async def stream(self):
+        _FakeCommunicate.calls += 1
+        yield {"type": "audio", "data": b"ID3"}
+        yield {"type": "WordBoundary", "offset": 0}
+        yield {"type": "audio", "data": self.text.encode("utf-8")}
+
+
+@pytest.fixture
+def edge_service(tmp_path, monkeypatch):
+    edge_tts = pytest.importorskip("edge_tts")
+    monkeypatch.setattr(edge_tts, "Communicate", _FakeCommunicate)
+    _FakeCommunicate.calls = 0
+
+    service = TTSService()
+    service.provider = "edge"
+    service.backend = EdgeTTSBackend(service.voice)
+    service.mock_mode = False
+    service.cache = TTSCache(str(tmp_path))
+    return service
+
+
+def test_key_ignores_whitespace_and_width():
+    a = TTSCache.make_key("edge", "v", "请继续沿路线前进。")
+    b = TTSCache.make_key("edge", "v", "  请继续沿路线前进。 ")
+    c = TTSCache.make_key("edge", "other", "请继续沿路线前进。")
+    assert a == b
+    assert a != c
+
+
+def test_same_text_shared_across_sessions(edge_service):
+    async def run():
+        u1 = await edge_service.text_to_speech("请继续沿路线前进。", "nav_1")
+        u2 = await edge_service.text_to_speech("请继续沿路线前进。", "nav_2")
+        return u1, u2
+
+    u1, u2 = asyncio.run(run())
+    assert u1 == u2
+    assert _FakeCommunicate.calls == 1
+
+
+def test_index_rebuilt_from_disk(edge_service, tmp_path):
+    url = asyncio.run(edge_service.text_to_speech("前方50米左转", "nav_1"))
+
+    fresh = TTSCache(str(tmp_path))
+    key = TTSCache.make_key("edge", edge_service.voice, "前方50米左转")
+    assert fresh.get(key) is None  # 构造时不读磁盘
+    assert fresh.load() == 1
+    assert fresh.get(key) == url
+
+
+def test_construct_has_no_disk_side_effects_and_load_keeps_lru_order(tmp_path):
+    root = tmp_path / "audio"
+    cache = TTSCache(str(root))
+    assert not root.exists()
+
+    k1, _, p1 = _store(cache, "一")
+    k2, _, p2 = _store(cache, "二")
+    os.utime(p1, (1000, 1000))
+    os.utime(p2, (2000, 2000))
+
+    fresh = TTSCache(str(root), max_files=1)
+    assert fresh.load() == 2
+    assert fresh.compact() == 1
+    assert fresh.get(k1) is None and fresh.get(k2)
+
+
+def _store(cache, text, size=10):
+    key = TTSCache.make_key("edge", "v", text)
+    filename, path = cache.prepare(key, ".mp3")
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    return key, cache.put(key, filename), path
+
+
+def test_sharded_path(tmp_path):
+    cache = TTSCache(str(tmp_path))
+    key, url, path = _store(cache, "前方路口右转")
+    assert url == f"/audio/{key[:2]}/{key}.mp3"
+    assert path.startswith(str(tmp_path / key[:2]))
+
+
+def test_lru_eviction_by_file_count(tmp_path):
+    cache = TTSCache(str(tmp_path), max_files=2)
+    k1, _, _ = _store(cache, "一")
+    k2, _, _ = _store(cache, "二")
+    assert cache.get(k1)  # 刷新 k1，k2 变为最久未访问
+    k3, _, _ = _store(cache, "三")
+
+    assert len(cache) == 2
+    assert cache.get(k2) is None
+    assert cache.get(k1) and cache.get(k3)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_eviction_by_bytes(tmp_path):
+    cache = TTSCache(str(tmp_path), max_bytes=25)
+    k1, _, _ = _store(cache, "一")
+    _store(cache, "二")
+    _store(cache, "三")
+
+    assert cache.total_bytes <= 25
+    assert cache.get(k1) is None
+    assert not (tmp_path / k1[:2] / f"{k1}.mp3").exists()
+
+
+def test_hit_miss_counters(tmp_path):
+    cache = TTSCache(str(tmp_path))
+    key, _, _ = _store(cache, "一")
+    cache.get(key)
+    cache.get(TTSCache.make_key("edge", "v", "不存在"))
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hitRate"] == 0.5
+
+
+def test_compact_evicts_idle_entries(tmp_path):
+    cache = TTSCache(str(tmp_path), max_age=60)
+    old, _, _ = _store(cache, "旧")
+    new, _, _ = _store(cache, "新")
+    cache._index[old].last_access -= 120
+    cache._index.move_to_end(new)
+
+    assert cache.compact() == 1
+    assert cache.get(old) is None
+    assert cache.get(new)
+    assert not (tmp_path / old[:2] / f"{old}.mp3").exists()
+
+
+class _SlowCommunicate(_FakeCommunicate):
+
+    async def stream(self):
+        await asyncio.sleep(0.05)
+        async for message in super().stream():
+            yield message
+
+
+def test_concurrent_requests_single_flight(edge_service, monkeypatch):
+    import edge_tts
+    monkeypatch.setattr(edge_tts, "Communicate", _SlowCommunicate)
+
+    async def run():
+        return await asyncio.gather(*[
+            edge_service.text_to_speech("注意前方台阶", f"nav_{i}") for i in range(5)
+        ])
+
+    urls = asyncio.run(run())
+    assert len(set(urls)) == 1
+    assert _FakeCommunicate.calls == 1
+    assert not TTSService._inflight
+
+
+class _BrokenCommunicate(_FakeCommunicate):
+
+    async def stream(self):
+        yield {"type": "audio", "data": b"ID3"}
+        raise ConnectionError("stream dropped")
+
+
+def test_failed_synthesis_leaves_no_partial_file(edge_service, monkeypatch, tmp_path):
+    import edge_tts
+    monkeypatch.setattr(edge_tts, "Communicate", _BrokenCommunicate)
+
+    url = asyncio.run(edge_service.text_to_speech("前方路口右转", "nav_1"))
+    assert url.startswith("/audio/mock_")
+    assert len(edge_service.cache) == 0
+    assert not [p for p in tmp_path.rglob("*") if p.is_file()]
+
+
+def test_stream_forwards_chunks_and_fills_cache(edge_service):
+    async def run():
+        chunks = [c async for c in edge_service.stream_speech("前方有台阶", "nav_1")]
+        url = await edge_service.text_to_speech("前方有台阶", "nav_2")
+        cached = [c async for c in edge_service.stream_speech("前方有台阶", "nav_3")]
+        return chunks, url, cached
+
+    chunks, url, cached = asyncio.run(run())
+    assert chunks == [b"ID3", "前方有台阶".encode("utf-8")]
+    assert b"".join(cached) == b"".join(chunks)
+    assert not url.startswith("/audio/mock_")
+    assert _FakeCommunicate.calls == 1
+
+
+def test_stream_joined_by_concurrent_synthesis(edge_service, monkeypatch):
+    import edge_tts
+    monkeypatch.setattr(edge_tts, "Communicate", _SlowCommunicate)
+
+    async def run():
+        async def consume():
+            return b"".join([c async for c in edge_service.stream_speech("注意左侧路沿", "nav_1")])
+
+        stream_task = asyncio.ensure_future(consume())
+        await asyncio.sleep(0.01)
+        url = await edge_service.text_to_speech("注意左侧路沿", "nav_2")
+        return await stream_task, url
+
+    data, url = asyncio.run(run())
+    assert data.startswith(b"ID3")
+    assert not url.startswith("/audio/mock_")
+    assert _FakeCommunicate.calls == 1
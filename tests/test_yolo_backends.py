@@ -0,0 +1,84 @@
+"""
+YOLO推理后端测试（ONNX 会话用假实现替代，不依赖 onnxruntime）
+"""
+import numpy as np
+
+from app.services.yolo_backends import OnnxYOLOBackend, decode_yolov8, letterbox, nms
+
+
+def _pred(boxes, n_cls=3, anchors=20):
+    """构造 YOLOv8 输出 (4 + n_cls, anchors)；boxes: [(cx, cy, w, h, cls, score)]"""
+    out = np.zeros((4 + n_cls, anchors), dtype=np.float32)
+    for i, (cx, cy, w, h, c, s) in enumerate(boxes):
+        out[:4, i] = (cx, cy, w, h)
+        out[4 + c, i] = s
+    return out
+
+
+def test_letterbox_keeps_aspect_and_pads():
+    frame = np.full((480, 1280, 3), 7, dtype=np.uint8)
+    img, r, (left, top) = letterbox(frame, (640, 640))
+    assert img.shape == (640, 640, 3)
+    assert r == 0.5
+    assert (left, top) == (0.0, 200.0)
+    assert img[0, 0, 0] == 114 and img[320, 320, 0] == 7
+
+
+def test_nms_suppresses_overlaps():
+    boxes = np.array([[0, 0, 10, 10], [1, 1, 11, 11], [50, 50, 60, 60]], dtype=np.float32)
+    scores = np.array([0.9, 0.8, 0.7], dtype=np.float32)
+    assert nms(boxes, scores, 0.5) == [0, 2]
+
+
+def test_decode_maps_back_to_original_frame():
+    pred = _pred([
+        (100, 180, 40, 40, 1, 0.9),
+        (102, 182, 40, 40, 1, 0.6),  # 同类重叠，被 NMS 去掉
+        (102, 182, 40, 40, 2, 0.8),  # 不同类别，保留
+        (300, 300, 10, 10, 0, 0.1),  # 低于阈值
+    ])
+    det = decode_yolov8(pred, conf=0.25, iou=0.7, scale=1.0, pad=(0.0, 80.0), shape=(480, 640))
+
+    assert det.shape == (2, 6)
+    np.testing.assert_allclose(det[0], [80, 80, 120, 120, 0.9, 1], atol=1e-4)
+    assert det[1, 5] == 2
+
+
+class _Input:
+    def __init__(self, shape):
+        self.name = "images"
+        self.shape = shape
+
+
+class _FakeSession:
+    def __init__(self, shape):
+        self.shape = shape
+        self.batches = []
+
+    def get_inputs(self):
+        return [_Input(self.shape)]
+
+    def run(self, outputs, feed):
+        x = feed["images"]
+        self.batches.append(x.shape)
+        assert x.dtype == np.float32 and x.max() <= 1.0
+        return [np.stack([_pred([(320, 320, 64, 64, 0, 0.9)]) for _ in range(len(x))])]
+
+
+def test_onnx_backend_dynamic_batch_single_run():
+    session = _FakeSession(["batch", 3, "h", "w"])
+    backend = OnnxYOLOBackend("x.onnx", session=session)
+    frames = [np.zeros((480, 640, 3), dtype=np.uint8) for _ in range(3)]
+
+    results = backend(frames, imgsz=640, conf=0.5)
+    assert session.batches == [(3, 3, 640, 640)]
+    assert [len(r.boxes) for r in results] == [1, 1, 1]
+    x1, y1, x2, y2, conf, cls = results[0].boxes.data[0]
+    assert (x1, y1, x2, y2) == (288, 208, 352, 272)
+
+
+def test_onnx_backend_static_batch_runs_per_frame():
+    session = _FakeSession([1, 3, 320, 320])
+    backend = OnnxYOLOBackend("x.onnx", session=session)
+    backend([np.zeros((240, 320, 3), dtype=np.uint8)] * 2, imgsz=640, conf=0.5)
+    assert session.batches == [(1, 3, 320, 320), (1, 3, 320, 320)]
@@ -0,0 +1,392 @@
+"""
+YOLO服务测试（模型用假实现替代，不依赖 ultralytics）
+"""
+import asyncio
+import base64
+import io
+import time
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.services.yolo_service import YOLOService
+
+
+class _Boxes:
+    def __init__(self, rows):
+        self.data = rows
+
+    def __len__(self):
+        return len(self.data)
+
+
+class _Result:
+    def __init__(self, rows):
+        self.boxes = _Boxes(rows)
+
+
+class _FakeModel:
+    """记录每次调用收到的输入，每张图返回一个框"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, source, **kwargs):
+        self.calls.append(source)
+        frames = source if isinstance(source, list) else [source]
+        return [_Result([[10.0, 20.0, 110.0, 220.0, 0.9, 1.0]]) for _ in frames]
+
+
+def _jpeg_b64(color=(255, 0, 0), size=(64, 48), mode="RGB", data_url=False):
+    buf = io.BytesIO()
+    Image.new(mode, size, color).save(buf, "JPEG" if mode == "RGB" else "PNG")
+    b64 = base64.b64encode(buf.getvalue()).decode()
+    return f"data:image/jpeg;base64,{b64}" if data_url else b64
+
+
+@pytest.fixture
+def service():
+    svc = YOLOService()
+    svc.mock_mode = False
+    svc.model = _FakeModel()
+    return svc
+
+
+def test_decode_returns_bgr_array(service):
+    frame, _ = service._decode_image(_jpeg_b64(color=(255, 0, 0), data_url=True).rstrip("="))
+    assert isinstance(frame, np.ndarray)
+    assert frame.shape == (48, 64, 3) and frame.dtype == np.uint8
+    assert frame.flags["C_CONTIGUOUS"]
+    b, g, r = frame[24, 32]
+    assert r > 200 and b < 50
+
+
+def test_decode_converts_non_rgb(service):
+    frame, _ = service._decode_image(_jpeg_b64(color=(0, 255, 0, 255), mode="RGBA"))
+    assert frame.shape == (48, 64, 3)
+
+
+def test_detect_batch_feeds_arrays_in_memory(service, monkeypatch):
+    import tempfile
+
+    def _no_temp(*args, **kwargs):
+        raise AssertionError("detect_batch should not touch temp files")
+
+    monkeypatch.setattr(tempfile, "NamedTemporaryFile", _no_temp)
+    results = asyncio.run(service.detect_batch([_jpeg_b64(), _jpeg_b64()]))
+
+    assert [len(r["obstacles"]) for r in results] == [1, 1]
+    assert results[0]["obstacles"][0]["class"] == 1
+    frames = [f for call in service.model.calls for f in (call if isinstance(call, list) else [call])]
+    assert all(isinstance(f, np.ndarray) for f in frames)
+
+
+def test_bad_image_does_not_fail_whole_batch(service):
+    results = asyncio.run(service.detect_batch(["not-an-image", _jpeg_b64()]))
+    assert results[0]["obstacles"] == []
+    assert len(results[1]["obstacles"]) == 1
+
+
+def test_one_model_call_per_request(service):
+    results = asyncio.run(service.detect_batch([_jpeg_b64(), "not-an-image", _jpeg_b64()]))
+
+    assert len(service.model.calls) == 1
+    assert isinstance(service.model.calls[0], list) and len(service.model.calls[0]) == 2
+    assert [len(r["obstacles"]) for r in results] == [1, 0, 1]
+
+
+class _BatchFailModel(_FakeModel):
+    """批量调用失败，逐张调用时第 2 张失败"""
+
+    def __call__(self, source, **kwargs):
+        self.calls.append(source)
+        if isinstance(source, list):
+            raise RuntimeError("batch failed")
+        if len(self.calls) == 3:
+            raise RuntimeError("bad frame")
+        return [_Result([[0.0, 0.0, 50.0, 50.0, 0.8, 0.0]])]
+
+
+def test_batch_failure_falls_back_per_image(service):
+    service.model = _BatchFailModel()
+    results = asyncio.run(service.detect_batch([_jpeg_b64(), _jpeg_b64(), _jpeg_b64()]))
+
+    assert len(service.model.calls) == 4
+    assert [len(r["obstacles"]) for r in results] == [1, 0, 1]
+
+
+def test_micro_batcher_merges_concurrent_requests(service):
+    from app.services.yolo_batcher import YOLOBatcher
+
+    batcher = YOLOBatcher(service, max_batch=8, max_wait_ms=20)
+
+    async def run():
+        return await asyncio.gather(*[batcher.detect_batch([_jpeg_b64(), _jpeg_b64()]) for _ in range(3)])
+
+    results = asyncio.run(run())
+    assert len(service.model.calls) == 1
+    assert len(service.model.calls[0]) == 6
+    assert all([len(r["obstacles"]) for r in res] == [1, 1] for res in results)
+    assert batcher.stats()["avgBatchSize"] == 6
+
+
+def test_micro_batcher_splits_at_max_batch(service):
+    from app.services.yolo_batcher import YOLOBatcher
+
+    batcher = YOLOBatcher(service, max_batch=4, max_wait_ms=20)
+
+    async def run():
+        return await asyncio.gather(*[batcher.detect_batch([_jpeg_b64(), _jpeg_b64(), _jpeg_b64()]) for _ in range(2)])
+
+    asyncio.run(run())
+    assert [len(c) for c in service.model.calls] == [4, 2]
+
+
+def test_micro_batcher_sheds_when_queue_full(service):
+    from app.services.yolo_batcher import InferenceOverloaded, YOLOBatcher
+
+    # 未凑满一批，工作协程等满 max_wait 才取帧，期间队列保持 3 帧
+    batcher = YOLOBatcher(service, max_batch=8, max_wait_ms=500, max_queue=8)
+
+    async def run():
+        first = asyncio.ensure_future(batcher.detect_batch([_jpeg_b64()] * 3))
+        while not len(batcher):  # 解码在线程池中，等第一批帧入队
+            await asyncio.sleep(0.001)
+        with pytest.raises(InferenceOverloaded):
+            await batcher.detect_batch([_jpeg_b64()] * 6)
+        return await first
+
+    assert len(asyncio.run(run())) == 3
+    assert batcher.stats()["shedRequests"] == 1
+
+
+class _SlowModel(_FakeModel):
+
+    def __call__(self, source, **kwargs):
+        time.sleep(0.2)
+        return super().__call__(source, **kwargs)
+
+
+def test_inference_does_not_block_event_loop(service):
+    service.model = _SlowModel()
+
+    async def run():
+        ticks = 0
+
+        async def heartbeat():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        hb = asyncio.ensure_future(heartbeat())
+        results = await service.detect_batch([_jpeg_b64()])
+        hb.cancel()
+        return results, ticks
+
+    results, ticks = asyncio.run(run())
+    assert len(results[0]["obstacles"]) == 1
+    assert ticks >= 10
+
+
+def test_lazy_load_runs_once_off_the_event_loop(service, monkeypatch):
+    service.model = None
+    loads = []
+
+    def _slow_load():
+        loads.append(1)
+        time.sleep(0.2)
+        service.model = _FakeModel()
+
+    monkeypatch.setattr(service, "_load_model", _slow_load)
+
+    async def run():
+        ticks = 0
+
+        async def heartbeat():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        hb = asyncio.ensure_future(heartbeat())
+        results = await asyncio.gather(*[service.detect_batch([_jpeg_b64()]) for _ in range(4)])
+        hb.cancel()
+        return results, ticks
+
+    results, ticks = asyncio.run(run())
+    assert loads == [1]
+    assert all(len(r[0]["obstacles"]) == 1 for r in results)
+    assert ticks >= 10
+
+
+def test_warmup_runs_dummy_frame_and_marks_ready(service):
+    service.state = "idle"
+    assert not service.ready
+
+    asyncio.run(service.warmup())
+
+    assert service.ready
+    frame = service.model.calls[0][0]
+    assert frame.shape == (service.imgsz * 3 // 4, service.imgsz, 3)
+
+
+def test_warmup_marks_failed_when_model_cannot_load(service, monkeypatch):
+    from app.services import yolo_service as module
+
+    monkeypatch.setattr(module.settings, "MOCK_MODE", False)
+    monkeypatch.setattr(module.settings, "YOLO_ONNX_PATH", "/nonexistent/yolov8n.onnx")
+    service.backend = "onnx"
+    service.model = None
+    service.state = "idle"
+
+    asyncio.run(service.warmup())
+
+    assert service.state == "failed"
+    assert not service.ready
+    assert service.mock_mode  # 请求仍可退回模拟检测，但 /ready 不再放流量
+
+
+def test_ready_endpoint_returns_503_after_failed_warmup(monkeypatch):
+    import main
+
+    monkeypatch.setattr(main.nav_routes.yolo_service, "state", "failed")
+    response = asyncio.run(main.readiness_check())
+
+    assert response.status_code == 503
+
+
+def test_decode_downscales_large_uploads_once(service, monkeypatch):
+    from PIL import JpegImagePlugin
+
+    drafts = []
+    original = JpegImagePlugin.JpegImageFile.draft
+
+    def _spy(self, mode, size):
+        drafts.append(size)
+        result = original(self, mode, size)
+        drafts.append(self.size)  # draft 之后的解码尺寸
+        return result
+
+    monkeypatch.setattr(JpegImagePlugin.JpegImageFile, "draft", _spy)
+    frame, meta = service._decode_image(_jpeg_b64(size=(4032, 3024)))
+
+    assert drafts == [(640, 480), (1008, 756)]  # 1/4 缩放解码
+    assert frame.shape == (480, 640, 3)
+    assert (meta.width, meta.height) == (640, 480)
+    assert meta.scale == pytest.approx(4032 / 640)
+
+
+def test_small_uploads_are_not_upscaled(service):
+    frame, meta = service._decode_image(_jpeg_b64(size=(320, 240)))
+    assert frame.shape == (240, 320, 3)
+    assert meta.scale == 1.0
+
+
+def test_geometry_independent_of_upload_resolution(service):
+    """同一画面按不同分辨率上传，距离和方位一致；bbox 映射回原图像素"""
+
+    class _RightThirdModel(_FakeModel):
+        def __call__(self, source, **kwargs):
+            frames = source if isinstance(source, list) else [source]
+            out = []
+            for f in frames:
+                h, w = f.shape[:2]
+                out.append(_Result([[0.75 * w, 0.25 * h, 0.95 * w, 0.75 * h, 0.9, 0.0]]))
+            return out
+
+    service.model = _RightThirdModel()
+    small = asyncio.run(service.detect_batch([_jpeg_b64(size=(640, 480))]))
+    large = asyncio.run(service.detect_batch([_jpeg_b64(size=(4000, 3000))]))
+
+    a = service.aggregate_obstacles(small)[0]
+    b = service.aggregate_obstacles(large)[0]
+    assert a.direction == b.direction == "右前方"
+    assert a.distance == b.distance
+    assert large[0]["obstacles"][0]["bbox"][2] == pytest.approx(0.95 * 4000, rel=1e-3)
+
+
+def test_legacy_pixel_bbox_matches_normalized():
+    px = [100, 200, 300, 400]
+    norm = YOLOService._normalize_bbox(px)
+    assert YOLOService._estimate_distance(norm) == round(10 / ((200 * 200) / (640 * 480) * 100 + 0.1), 1)
+    assert YOLOService._estimate_direction(norm) == "左前方"
+
+
+def test_detect_frames_decodes_memoryview_slices(service):
+    from app.api.nav_routes import split_length_prefixed
+    from app.services.yolo_batcher import YOLOBatcher
+
+    jpegs = [base64.b64decode(_jpeg_b64(color=c)) for c in [(255, 0, 0), (0, 0, 255)]]
+    body = b"".join(len(j).to_bytes(4, "big") + j for j in jpegs)
+    views = split_length_prefixed(body)
+    assert [bytes(v) for v in views] == jpegs
+    assert all(v.obj is body for v in views)  # 切片指向原请求体
+
+    results = asyncio.run(service.detect_frames(views))
+    assert [len(r["obstacles"]) for r in results] == [1, 1]
+    assert service.model.calls[0][0][24, 32][2] > 200  # 第一帧为红色（BGR）
+
+    batcher = YOLOBatcher(service, max_batch=8, max_wait_ms=1)
+    assert len(asyncio.run(batcher.detect_frames(views))) == 2
+
+
+def _gradient_b64(flip=False, noise=0, seed=0):
+    row = np.linspace(0, 255, 64)[::-1] if flip else np.linspace(0, 255, 64)
+    img = np.tile(row, (48, 1))
+    img = img + np.random.default_rng(seed).normal(0, noise, img.shape) if noise else img
+    buf = io.BytesIO()
+    Image.fromarray(np.clip(img, 0, 255).astype(np.uint8)).convert("RGB").save(buf, "JPEG")
+    return base64.b64encode(buf.getvalue()).decode()
+
+
+def test_dedup_reuses_detections_for_near_identical_frames(service):
+    async def run():
+        first = await service.detect_batch([_gradient_b64()], session_id="s1")
+        again = await service.detect_batch([_gradient_b64(noise=3, seed=1)], session_id="s1")
+        other = await service.detect_batch([_gradient_b64(flip=True)], session_id="s1")
+        fresh = await service.detect_batch([_gradient_b64()], session_id="s2")
+        return first, again, other, fresh
+
+    first, again, _, _ = asyncio.run(run())
+    assert again == first
+    assert len(service.model.calls) == 3  # again 命中；反向渐变与另一会话都要推理
+    stats = service.dedup.stats()
+    assert stats["hits"] == 1 and stats["lookups"] == 4
+
+
+def test_dedup_within_one_request_and_ttl(service):
+    service.dedup.ttl = 0.0
+    results = asyncio.run(service.detect_batch([_gradient_b64()] * 3, session_id="s"))
+    assert len(service.model.calls) == 1 and len(service.model.calls[0]) == 1
+    assert [len(r["obstacles"]) for r in results] == [1, 1, 1]
+    assert service.dedup.stats()["batchHits"] == 2
+
+    time.sleep(0.01)  # 已过期，不再复用
+    asyncio.run(service.detect_batch([_gradient_b64()], session_id="s"))
+    assert len(service.model.calls) == 2
+
+
+def test_dedup_caches_box_rows_and_sweeps_idle_sessions(service):
+    service.dedup.ttl = 0.05
+    asyncio.run(service.detect_batch([_gradient_b64()], session_id="idle"))
+    cached = service.dedup._sessions["idle"][0][1]
+    assert cached == [(10.0, 20.0, 110.0, 220.0, 0.9, 1.0)]  # 只有框数据，不持有 Results / 原图
+
+    time.sleep(0.06)  # idle 会话不再上传，由其他会话的请求清理
+    asyncio.run(service.detect_batch([_gradient_b64(flip=True)], session_id="active"))
+    assert list(service.dedup._sessions) == ["active"]
+
+
+def test_dedup_through_micro_batcher(service):
+    from app.services.yolo_batcher import YOLOBatcher
+
+    batcher = YOLOBatcher(service, max_batch=8, max_wait_ms=1)
+
+    async def run():
+        await batcher.detect_batch([_gradient_b64(), _gradient_b64(flip=True)], session_id="s")
+        return await batcher.detect_batch([_gradient_b64(flip=True)], session_id="s")
+
+    assert len(asyncio.run(run())[0]["obstacles"]) == 1
+    assert batcher.stats()["frames"] == 2